@@ -1,10 +1,35 @@
 from django.contrib import admin
-from .models import Alert
+from .models import Alert, AlertRule, AlertStatusChange
+
+
+class AlertStatusChangeInline(admin.TabularInline):
+    model = AlertStatusChange
+    fields = ['changed_at', 'old_status', 'new_status', 'changed_by']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        # Append-only: written by the API with each status change
+        return False
 
 
 @admin.register(Alert)
 class AlertAdmin(admin.ModelAdmin):
     list_display = ['title', 'severity', 'status', 'event', 'created_at']
+    # The event is nullable, so the admin's default select_related() would not follow it
+    list_select_related = ['event']
     list_filter = ['severity', 'status', 'created_at']
-    search_fields = ['title', 'description', 'event__event_type', 'event__source_name']
+    # Descriptions are stored compressed and cannot be searched with LIKE
+    search_fields = ['title', 'event__event_type', 'event__source_name']
+    readonly_fields = ['created_at', 'updated_at', 'acknowledged_at', 'resolved_at']
+    inlines = [AlertStatusChangeInline]
+
+
+@admin.register(AlertRule)
+class AlertRuleAdmin(admin.ModelAdmin):
+    list_display = ['name', 'is_active', 'severities', 'source_name', 'event_type', 'event_type_pattern',
+                    'description_contains', 'indicator_match', 'threshold', 'window_seconds', 'updated_at']
+    list_filter = ['is_active', 'indicator_match']
+    search_fields = ['name', 'source_name', 'event_type', 'description_contains']
     readonly_fields = ['created_at', 'updated_at']
@@ -0,0 +1,64 @@
+"""
+Aho-Corasick automaton for multi-substring search.
+
+``Automaton(needles)`` finds which of any number of needles occur in a text
+in one pass over the text, whatever the number of needles: the cost is
+O(len(text) + matches) instead of O(len(text) x needles) for repeated
+``in`` checks. Matching is case-insensitive (needles and text are
+casefolded).
+"""
+from collections import deque
+
+
+class Automaton:
+    __slots__ = ('_goto', '_fail', '_outputs', 'needles')
+
+    def __init__(self, needles):
+        self.needles = sorted({needle.casefold() for needle in needles if needle})
+        goto = [{}]
+        outputs = [()]
+        for index, needle in enumerate(self.needles):
+            state = 0
+            for char in needle:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    outputs.append(())
+                state = next_state
+            outputs[state] = (index,)
+
+        # Breadth-first: a state's failure link is the longest proper suffix
+        # of its path that is also a path; outputs inherit the link's outputs
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                link = fail[state]
+                while link and char not in goto[link]:
+                    link = fail[link]
+                target = goto[link].get(char, 0)
+                fail[next_state] = target if target != next_state else 0
+                if outputs[fail[next_state]]:
+                    outputs[next_state] = outputs[next_state] + outputs[fail[next_state]]
+        self._goto, self._fail, self._outputs = goto, fail, outputs
+
+    def __bool__(self):
+        return bool(self.needles)
+
+    def search(self, text):
+        """Indexes (into ``self.needles``) of the needles occurring in ``text``"""
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        root = goto[0]
+        found = set()
+        state = 0
+        for char in text.casefold():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0) if state else root.get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
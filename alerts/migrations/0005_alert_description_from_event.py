@@ -0,0 +1,74 @@
+from django.db import migrations, models
+
+import events.fields
+
+BATCH_SIZE = 2000
+
+
+def keep_differing_descriptions(apps, schema_editor):
+    """Keep an alert's description only where it differs from its event's"""
+    Alert = apps.get_model('alerts', 'Alert')
+    last_pk = 0
+    while True:
+        batch = list(
+            Alert.objects.filter(pk__gt=last_pk).order_by('pk')
+            .select_related('event').only('pk', 'description', 'event__description')[:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        changed = []
+        for alert in batch:
+            if alert.event is None or alert.description != alert.event.description:
+                alert.description_override = alert.description
+                changed.append(alert)
+        Alert.objects.bulk_update(changed, ['description_override'])
+        last_pk = batch[-1].pk
+
+
+def restore_descriptions(apps, schema_editor):
+    Alert = apps.get_model('alerts', 'Alert')
+    last_pk = 0
+    while True:
+        batch = list(
+            Alert.objects.filter(pk__gt=last_pk).order_by('pk')
+            .select_related('event').only('pk', 'description_override', 'event__description')[:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        for alert in batch:
+            if alert.description_override is not None:
+                alert.description = alert.description_override
+            else:
+                alert.description = alert.event.description if alert.event is not None else ''
+        Alert.objects.bulk_update(batch, ['description'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    """
+    Stop storing a copy of the event description on every alert; Alert.description
+    now reads the event's text unless an override is stored.
+    """
+
+    dependencies = [
+        ('alerts', '0004_alert_unique_alert_per_event'),
+        ('events', '0003_compress_event_description'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='description_override',
+            field=events.fields.CompressedTextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='alert',
+            name='description',
+            field=models.TextField(null=True),
+        ),
+        migrations.RunPython(keep_differing_descriptions, restore_descriptions),
+        migrations.RemoveField(
+            model_name='alert',
+            name='description',
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.1 on 2026-10-19 07:47
+
+from django.db import migrations, models
+
+DEFAULT_RULE = 'High and critical events'
+
+
+def create_default_rule(apps, schema_editor):
+    """Keep the previous behaviour: every HIGH or CRITICAL event raises an alert"""
+    AlertRule = apps.get_model('alerts', 'AlertRule')
+    AlertRule.objects.get_or_create(name=DEFAULT_RULE, defaults={'severities': 'HIGH,CRITICAL'})
+
+
+def delete_default_rule(apps, schema_editor):
+    apps.get_model('alerts', 'AlertRule').objects.filter(name=DEFAULT_RULE).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0005_alert_description_from_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('severities', models.CharField(blank=True, help_text='Comma-separated severities, e.g. "HIGH,CRITICAL"', max_length=50)),
+                ('source_name', models.CharField(blank=True, help_text='Exact source name', max_length=200)),
+                ('event_type', models.CharField(blank=True, help_text='Exact event type', max_length=200)),
+                ('event_type_pattern', models.CharField(blank=True, help_text='Regular expression searched in the event type', max_length=500)),
+                ('description_contains', models.CharField(blank=True, help_text='Text the description contains (case-insensitive)', max_length=500)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_default_rule, delete_default_rule),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.1 on 2026-10-19 07:52
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0006_alert_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alertrule',
+            name='threshold',
+            field=models.PositiveIntegerField(default=1, help_text='Matching events from one source and type needed within the window (1: every event)', validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddField(
+            model_name='alertrule',
+            name='window_seconds',
+            field=models.PositiveIntegerField(default=60, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.1 on 2026-10-19 07:57
+
+from django.db import migrations, models
+
+WATCHLIST_RULE = 'Watchlist indicators'
+
+
+def create_watchlist_rule(apps, schema_editor):
+    """Events mentioning a watchlist indicator raise an alert"""
+    AlertRule = apps.get_model('alerts', 'AlertRule')
+    AlertRule.objects.get_or_create(name=WATCHLIST_RULE, defaults={'indicator_match': True})
+
+
+def delete_watchlist_rule(apps, schema_editor):
+    apps.get_model('alerts', 'AlertRule').objects.filter(name=WATCHLIST_RULE).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0007_alert_rule_threshold'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alertrule',
+            name='indicator_match',
+            field=models.BooleanField(default=False, help_text='The description contains a watchlist indicator (see indicators)'),
+        ),
+        migrations.RunPython(create_watchlist_rule, delete_watchlist_rule),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.1 on 2026-10-19 08:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def stamp_existing_alerts(apps, schema_editor):
+    """
+    Alerts changed before the history existed: their last update is the best
+    known time. They are not counted in the response times, but stamping them
+    keeps later changes from being counted as their first acknowledgement or
+    resolution.
+    """
+    Alert = apps.get_model('alerts', 'Alert')
+    Alert.objects.exclude(status='OPEN').update(acknowledged_at=models.F('updated_at'))
+    Alert.objects.filter(status='RESOLVED').update(resolved_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+    """Add alert status history and response-time aggregates"""
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('alerts', '0008_alert_rule_indicator_match'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertResponseTime',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField()),
+                ('severity', models.CharField(max_length=50)),
+                ('metric', models.CharField(choices=[('ACKNOWLEDGE', 'Time to acknowledge'), ('RESOLVE', 'Time to resolve')], max_length=20)),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('total_seconds', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='acknowledged_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='resolved_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='AlertStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_status', models.CharField(choices=[('OPEN', 'Open'), ('ACKNOWLEDGED', 'Acknowledged'), ('RESOLVED', 'Resolved')], max_length=20)),
+                ('new_status', models.CharField(choices=[('OPEN', 'Open'), ('ACKNOWLEDGED', 'Acknowledged'), ('RESOLVED', 'Resolved')], max_length=20)),
+                ('changed_at', models.DateTimeField()),
+                ('alert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='alerts.alert')),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['changed_at', 'id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='alertresponsetime',
+            constraint=models.UniqueConstraint(fields=('period_start', 'severity', 'metric', 'bucket'), name='unique_alert_response_time_bucket'),
+        ),
+        migrations.AddIndex(
+            model_name='alertstatuschange',
+            index=models.Index(fields=['alert', 'changed_at'], name='alert_status_change_timeline'),
+        ),
+        migrations.RunPython(stamp_existing_alerts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.1 on 2026-10-19 08:25
+
+from django.db import migrations, models
+
+# alerts.models.SEVERITY_RANKS when this migration was written
+SEVERITY_RANKS = {'LOW': 1, 'MEDIUM': 2, 'HIGH': 3, 'CRITICAL': 4}
+
+
+def rank_existing_alerts(apps, schema_editor):
+    """One UPDATE over the alerts, before the index on the rank is built"""
+    Alert = apps.get_model('alerts', 'Alert')
+    Alert.objects.update(severity_rank=models.Case(
+        *[models.When(severity=severity, then=models.Value(rank)) for severity, rank in SEVERITY_RANKS.items()],
+        default=models.Value(0),
+    ))
+
+
+class Migration(migrations.Migration):
+    """Store a severity rank on alerts and index the triage order"""
+
+    dependencies = [
+        ('alerts', '0009_alert_status_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='severity_rank',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(rank_existing_alerts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['status', '-severity_rank', 'created_at'], name='alert_triage_queue'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.1 on 2026-10-19 08:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    """Keep the windows of threshold rules in the database, shared by all processes"""
+
+    dependencies = [
+        ('alerts', '0010_alert_severity_rank'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThresholdWindow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_name', models.CharField(max_length=200)),
+                ('event_type', models.CharField(max_length=200)),
+                ('width', models.FloatField(help_text='Seconds of event time per bucket')),
+                ('head', models.BigIntegerField(help_text='Event time // width of the newest bucket', null=True)),
+                ('counts', models.TextField(blank=True, help_text='Comma-separated bucket counts')),
+                ('expires', models.FloatField(help_text='Event time (Unix) from which every bucket has left the window')),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='threshold_windows', to='alerts.alertrule')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires'], name='threshold_window_expires')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='thresholdwindow',
+            constraint=models.UniqueConstraint(fields=('rule', 'source_name', 'event_type'), name='unique_threshold_window'),
+        ),
+    ]
@@ -1,5 +1,25 @@
+import re
+
+from django.conf import settings
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+from events.fields import CompressedTextField
+
+# Triage order: higher is more urgent; severities outside the list rank 0
+SEVERITY_RANKS = {'LOW': 1, 'MEDIUM': 2, 'HIGH': 3, 'CRITICAL': 4}
+
+
+def severity_rank(severity):
+    return SEVERITY_RANKS.get(severity, 0)
+
+
+class AlertManager(models.Manager):
+    def get_queryset(self):
+        # Alert.description reads the event's: without the join each alert would cost a query.
+        # Querysets that need no event drop it with select_related(None).
+        return super().get_queryset().select_related('event')
 
 
 class Alert(models.Model):
@@ -10,12 +30,21 @@ class Alert(models.Model):
     ]
 
     title = models.CharField(max_length=200)
-    description = models.TextField()
+    # Alerts show their event's description; a text is stored here only when
+    # it differs from the event's (or there is no event). See `description`.
+    description_override = CompressedTextField(null=True, blank=True)
     severity = models.CharField(max_length=50)
+    # severity_rank(severity), kept so that the triage queue is an index range
+    severity_rank = models.PositiveSmallIntegerField(default=0, editable=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='OPEN')
     event = models.ForeignKey('events.Event', on_delete=models.CASCADE, related_name='alerts', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # First time the alert left OPEN / became RESOLVED (alerts/history.py)
+    acknowledged_at = models.DateTimeField(null=True, blank=True, editable=False)
+    resolved_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = AlertManager()
 
     class Meta:
         # Database-level constraint: exactly one alert per event
@@ -28,6 +57,10 @@ class Alert(models.Model):
         ]
         # Keep unique_together for backward compatibility and Django admin
         unique_together = [['event']]
+        indexes = [
+            # Triage queue: a status's alerts, most severe first, then oldest
+            models.Index(fields=['status', '-severity_rank', 'created_at'], name='alert_triage_queue'),
+        ]
 
     def clean(self):
         """Application-level validation to prevent duplicate alerts"""
@@ -41,8 +74,176 @@ class Alert(models.Model):
 
     def save(self, *args, **kwargs):
         """Override save to enforce validation"""
+        self.severity_rank = severity_rank(self.severity)
         self.full_clean()
         super().save(*args, **kwargs)
 
+    @property
+    def description(self):
+        if self.description_override is not None:
+            return self.description_override
+        return self.event.description if self.event_id is not None else ''
+
+    @description.setter
+    def description(self, value):
+        if self.event_id is not None and value == self.event.description:
+            self.description_override = None
+        else:
+            self.description_override = value
+
+    def __str__(self):
+        return self.title
+
+
+class AlertStatusChange(models.Model):
+    """One status transition of an alert; rows are only ever added (alerts/history.py)"""
+    alert = models.ForeignKey(Alert, on_delete=models.CASCADE, related_name='status_changes')
+    old_status = models.CharField(max_length=20, choices=Alert.STATUS_CHOICES)
+    new_status = models.CharField(max_length=20, choices=Alert.STATUS_CHOICES)
+    changed_at = models.DateTimeField()
+    changed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='+')
+
+    class Meta:
+        ordering = ['changed_at', 'id']
+        # An alert's timeline is one range scan
+        indexes = [models.Index(fields=['alert', 'changed_at'], name='alert_status_change_timeline')]
+
+    def __str__(self):
+        return f"{self.alert_id}: {self.old_status} -> {self.new_status}"
+
+
+class AlertResponseTime(models.Model):
+    """
+    Histogram of acknowledge or resolve latencies of one severity's alerts,
+    per hour of the acknowledgement or resolution: ``count`` latencies fell in
+    ``bucket`` (see alerts/history.py), adding up to ``total_seconds``.
+    Incremented as alerts change status.
+    """
+    ACKNOWLEDGE = 'ACKNOWLEDGE'
+    RESOLVE = 'RESOLVE'
+    METRIC_CHOICES = [(ACKNOWLEDGE, 'Time to acknowledge'), (RESOLVE, 'Time to resolve')]
+
+    period_start = models.DateTimeField()
+    severity = models.CharField(max_length=50)
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    bucket = models.PositiveSmallIntegerField()
+    count = models.PositiveBigIntegerField(default=0)
+    total_seconds = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index of the range queries, which filter on period_start
+            models.UniqueConstraint(fields=['period_start', 'severity', 'metric', 'bucket'],
+                                    name='unique_alert_response_time_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.metric} {self.severity} {self.period_start:%Y-%m-%d %H:00} #{self.bucket}"
+
+
+class AlertRuleQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """Also stamp updated_at (auto_now only applies to save()): other processes notice rule changes by it"""
+        kwargs.setdefault('updated_at', timezone.now())
+        return super().update(**kwargs)
+
+
+class AlertRule(models.Model):
+    """
+    Condition under which a new event raises an alert. Every condition that
+    is set must hold (blank ones match anything); an event raises an alert
+    when any active rule matches. See alerts/rules.py.
+
+    With a ``threshold`` above 1 the rule counts its matching events per
+    (source_name, event_type) instead, and raises an alert on the event that
+    brings the count within ``window_seconds`` to the threshold (see
+    alerts/thresholds.py).
+    """
+
+    SEVERITY_CHOICES = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+
+    name = models.CharField(max_length=100, unique=True)
+    is_active = models.BooleanField(default=True)
+    severities = models.CharField(
+        max_length=50, blank=True, help_text='Comma-separated severities, e.g. "HIGH,CRITICAL"',
+    )
+    source_name = models.CharField(max_length=200, blank=True, help_text='Exact source name')
+    event_type = models.CharField(max_length=200, blank=True, help_text='Exact event type')
+    event_type_pattern = models.CharField(
+        max_length=500, blank=True, help_text='Regular expression searched in the event type',
+    )
+    description_contains = models.CharField(
+        max_length=500, blank=True, help_text='Text the description contains (case-insensitive)',
+    )
+    indicator_match = models.BooleanField(
+        default=False, help_text='The description contains a watchlist indicator (see indicators)',
+    )
+    threshold = models.PositiveIntegerField(
+        default=1, validators=[MinValueValidator(1)],
+        help_text='Matching events from one source and type needed within the window (1: every event)',
+    )
+    window_seconds = models.PositiveIntegerField(default=60, validators=[MinValueValidator(1)])
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = AlertRuleQuerySet.as_manager()
+
+    def severity_list(self):
+        return [value.strip().upper() for value in self.severities.split(',') if value.strip()]
+
+    @property
+    def title_suffix(self):
+        """Appended to the title of the alerts raised by threshold and indicator rules"""
+        if self.threshold > 1:
+            return f' ({self.threshold} in {self.window_seconds}s)'
+        return ' (watchlist match)' if self.indicator_match else ''
+
+    def clean(self):
+        errors = {}
+        invalid = [value for value in self.severity_list() if value not in self.SEVERITY_CHOICES]
+        if invalid:
+            errors['severities'] = f'Unknown severity: {", ".join(invalid)}. Use {", ".join(self.SEVERITY_CHOICES)}.'
+        if self.event_type_pattern:
+            try:
+                re.compile(self.event_type_pattern)
+            except re.error as exc:
+                errors['event_type_pattern'] = f'Invalid regular expression: {exc}'
+        conditions = [self.severities, self.source_name, self.event_type, self.event_type_pattern,
+                      self.description_contains]
+        if not self.indicator_match and not any(condition.strip() for condition in conditions):
+            errors['__all__'] = 'A rule needs at least one condition.'
+        if errors:
+            raise ValidationError(errors)
+
+    def save(self, *args, **kwargs):
+        """Override save to enforce validation"""
+        self.full_clean()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.name
+
+
+class ThresholdWindow(models.Model):
+    """
+    Sliding-window count of a threshold rule's events from one source and
+    event type, shared by all processes (see alerts/thresholds.py): the
+    bucket counts of a ring buffer whose newest bucket is ``head``.
+    """
+    rule = models.ForeignKey(AlertRule, on_delete=models.CASCADE, related_name='threshold_windows')
+    source_name = models.CharField(max_length=200)
+    event_type = models.CharField(max_length=200)
+    width = models.FloatField(help_text='Seconds of event time per bucket')
+    head = models.BigIntegerField(null=True, help_text='Event time // width of the newest bucket')
+    counts = models.TextField(blank=True, help_text='Comma-separated bucket counts')
+    expires = models.FloatField(help_text='Event time (Unix) from which every bucket has left the window')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['rule', 'source_name', 'event_type'], name='unique_threshold_window'),
+        ]
+        indexes = [models.Index(fields=['expires'], name='threshold_window_expires')]
+
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return f"{self.rule_id}: {self.source_name} / {self.event_type}"
@@ -0,0 +1,194 @@
+"""
+Compiled matcher for alert rules.
+
+``RuleMatcher`` evaluates any number of ``AlertRule`` conditions against an
+event without looping over the rules:
+
+- severity, source_name and event_type conditions are looked up in one
+  dict per field (value -> rules);
+- event_type patterns are combined into one regex that rejects the types
+  matching none of them, and the rules matching each event type are
+  memoized (there are few distinct types);
+- description substrings are found in one pass over the description by an
+  Aho-Corasick automaton (alerts/automaton.py);
+- whether the description contains a watchlist indicator is worked out by
+  the caller (indicators/matching.py) and passed in.
+
+Each condition an event satisfies counts towards its rule, and a rule
+matches when all of its conditions have counted, so the work per event
+grows with the rules it hits, not with the rules there are.
+
+``trigger`` decides whether an event raises an alert: any matching rule
+with a threshold of 1 does, and a matching threshold rule does when its
+sliding window (alerts/thresholds.py) reaches the threshold.
+
+``get_matcher`` caches the matcher for the active rules per process and
+recompiles it only when the rules change: saving or deleting a rule drops
+the cache in that process, and after settings.ALERT_RULES_CACHE_TTL seconds
+one query (count and latest update of the rules) notices changes made by
+other processes.
+"""
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .automaton import Automaton
+from .models import AlertRule
+from .thresholds import get_tracker
+
+logger = logging.getLogger('alerts')
+
+# Distinct event types whose pattern hits are remembered
+PATTERN_MEMO_SIZE = 10000
+
+
+class RuleMatcher:
+    def __init__(self, rules):
+        self.rules = []
+        self._needed = []
+        self._by_severity = defaultdict(list)
+        self._by_source = defaultdict(list)
+        self._by_type = defaultdict(list)
+        self._patterns = []
+        self._by_indicator = []
+        needle_rules = defaultdict(list)
+        for rule in rules:
+            try:
+                pattern = re.compile(rule.event_type_pattern) if rule.event_type_pattern else None
+            except re.error:
+                logger.warning('Skipping alert rule with an invalid pattern', extra={'rule': rule.name})
+                continue
+            index = len(self.rules)
+            needed = 0
+            for severity in set(rule.severity_list()):
+                self._by_severity[severity].append(index)
+            if rule.severity_list():
+                needed += 1
+            if rule.source_name:
+                self._by_source[rule.source_name].append(index)
+                needed += 1
+            if rule.event_type:
+                self._by_type[rule.event_type].append(index)
+                needed += 1
+            if pattern is not None:
+                self._patterns.append((index, pattern))
+                needed += 1
+            if rule.description_contains:
+                needle_rules[rule.description_contains.casefold()].append(index)
+                needed += 1
+            if rule.indicator_match:
+                self._by_indicator.append(index)
+                needed += 1
+            if needed:
+                self.rules.append(rule)
+                self._needed.append(needed)
+        self.has_thresholds = any(rule.threshold > 1 for rule in self.rules)
+
+        self._combined = None
+        if self._patterns:
+            try:
+                self._combined = re.compile('|'.join(f'(?:{pattern.pattern})' for _, pattern in self._patterns))
+            except re.error:
+                pass  # Inline flags or group references: each type is tested pattern by pattern once
+        self._pattern_memo = {}
+        self._automaton = Automaton(needle_rules)
+        self._needle_rules = [needle_rules[needle] for needle in self._automaton.needles]
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    @property
+    def needs_description(self):
+        """Whether any rule looks at the description (batch paths skip reading it otherwise)"""
+        return bool(self._automaton)
+
+    def _pattern_hits(self, event_type):
+        hits = self._pattern_memo.get(event_type)
+        if hits is None:
+            if self._combined is not None and not self._combined.search(event_type):
+                hits = ()
+            else:
+                hits = tuple(index for index, pattern in self._patterns if pattern.search(event_type))
+            if len(self._pattern_memo) >= PATTERN_MEMO_SIZE:
+                self._pattern_memo.clear()
+            self._pattern_memo[event_type] = hits
+        return hits
+
+    def match(self, source_name, event_type, severity, description='', indicator=False):
+        """The rules matching an event (``indicator``: its description contains a watchlist indicator)"""
+        counts = {}
+        for indexes in (
+            self._by_severity.get(severity, ()),
+            self._by_source.get(source_name, ()),
+            self._by_type.get(event_type, ()),
+            self._pattern_hits(event_type) if self._patterns else (),
+            self._by_indicator if indicator else (),
+        ):
+            for index in indexes:
+                counts[index] = counts.get(index, 0) + 1
+        if self._automaton and description:
+            for needle in self._automaton.search(description):
+                for index in self._needle_rules[needle]:
+                    counts[index] = counts.get(index, 0) + 1
+        needed = self._needed
+        return [self.rules[index] for index, count in counts.items() if count == needed[index]]
+
+    def matches(self, source_name, event_type, severity, description=''):
+        """Whether an event raises an alert by itself (threshold rules are not counted)"""
+        return any(rule.threshold <= 1 for rule in self.match(source_name, event_type, severity, description))
+
+    def trigger(self, source_name, event_type, severity, description, timestamp, indicator=False):
+        """
+        The rule an event (``timestamp`` in Unix time) raises an alert for, or
+        None. The event counts towards every threshold rule it matches.
+        """
+        fired = None
+        for rule in self.match(source_name, event_type, severity, description, indicator):
+            if rule.threshold <= 1:
+                if fired is None or fired.threshold > 1:
+                    fired = rule
+            elif get_tracker().hit((rule.pk, source_name, event_type), rule.threshold, rule.window_seconds,
+                                   timestamp) and fired is None:
+                fired = rule
+        return fired
+
+    def trigger_event(self, event, indicator=False):
+        return self.trigger(event.source_name, event.event_type, event.severity, event.description,
+                            event.timestamp.timestamp(), indicator)
+
+
+_lock = threading.Lock()
+_cache = {'matcher': None, 'fingerprint': None, 'expires': 0.0}
+
+
+def _fingerprint():
+    summary = AlertRule.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+    return summary['count'], summary['updated']
+
+
+def get_matcher():
+    """The compiled matcher for the active rules (cached, see the module docstring)"""
+    now = time.monotonic()
+    matcher = _cache['matcher']
+    if matcher is not None and now < _cache['expires']:
+        return matcher
+    with _lock:
+        if _cache['matcher'] is not None and now < _cache['expires']:
+            return _cache['matcher']
+        # Read before the rules, so a change made meanwhile shows up at the next check
+        fingerprint = _fingerprint()
+        if _cache['matcher'] is None or fingerprint != _cache['fingerprint']:
+            _cache['matcher'] = RuleMatcher(AlertRule.objects.filter(is_active=True).order_by('id'))
+            _cache['fingerprint'] = fingerprint
+        _cache['expires'] = now + settings.ALERT_RULES_CACHE_TTL
+        return _cache['matcher']
+
+
+def clear_matcher_cache():
+    with _lock:
+        _cache['matcher'] = None
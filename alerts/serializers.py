@@ -1,8 +1,31 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Alert
+from events.models import Event
+from .models import Alert, AlertStatusChange
+
+
+class TruncatedCharField(serializers.CharField):
+    """Read-only text cut to ``max_chars`` characters, ending in an ellipsis when cut"""
+
+    def __init__(self, max_chars, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self.max_chars = max_chars
+
+    def to_representation(self, value):
+        value = super().to_representation(value)
+        if len(value) > self.max_chars:
+            value = value[:self.max_chars - 1] + '…'
+        return value
 
 
 class AlertSerializer(serializers.ModelSerializer):
+    """
+    Alert representation. ``fields`` limits the output to a subset of
+    Meta.fields (sparse fieldsets) and ``description_max`` truncates the
+    description; pair ``fields`` with ``optimize_queryset`` so only the
+    needed columns are read.
+    """
     # Derived fields from related Event (not in Alert model, but useful for API consumers)
     event_id = serializers.IntegerField(source='event.id', read_only=True)
     event_type = serializers.CharField(source='event.event_type', read_only=True)
@@ -22,6 +45,45 @@ class AlertSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'title', 'description', 'severity', 'created_at', 'updated_at']
 
+    # Database columns (``.only()`` paths) each output field reads
+    FIELD_COLUMNS = {
+        'id': ['id'],
+        'title': ['title'],
+        'description': ['description_override', 'event__description'],
+        'severity': ['severity'],
+        'status': ['status'],
+        'created_at': ['created_at'],
+        'updated_at': ['updated_at'],
+        'event_id': ['event__id'],
+        'event_type': ['event__event_type'],
+    }
+
+    def __init__(self, *args, fields=None, description_max=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        if description_max is not None and 'description' in self.fields:
+            self.fields['description'] = TruncatedCharField(description_max)
+
+    @classmethod
+    def optimize_queryset(cls, queryset, fields=None, description_max=None):
+        """
+        Restrict ``queryset`` to the columns the requested ``fields`` read
+        and drop the event join when no event field is requested.
+        ``description_max`` does not narrow the read (it only shrinks the
+        response): descriptions are stored compressed, so SQL cannot cut
+        them and they are truncated after decompression.
+        """
+        if fields is None:
+            return queryset
+        columns = [column for name in fields for column in cls.FIELD_COLUMNS[name]]
+        if any(column.startswith('event__') for column in columns):
+            columns.append('event')
+        else:
+            queryset = queryset.select_related(None)
+        return queryset.only(*columns)
+
 
 class AlertStatusUpdateSerializer(serializers.ModelSerializer):
     """Serializer for updating alert status - Admin only"""
@@ -61,3 +123,83 @@ class AlertStatusUpdateSerializer(serializers.ModelSerializer):
         
         # Return normalized value only after all validation passes
         return value_upper
+
+
+class UpperChoiceField(serializers.ChoiceField):
+    """Choice field that accepts choices in any case"""
+
+    def to_internal_value(self, data):
+        return super().to_internal_value(data.upper() if isinstance(data, str) else data)
+
+
+class AlertBulkFilterSerializer(serializers.Serializer):
+    """Alerts selected by a bulk status update; every condition given must hold"""
+    status = UpperChoiceField(choices=Alert.STATUS_CHOICES, required=False)
+    severity = UpperChoiceField(choices=Event.SEVERITY_CHOICES, required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+
+
+class AlertBulkStatusSerializer(serializers.Serializer):
+    """Bulk status update - Admin only. Exactly one of ``ids`` and ``filter``."""
+    status = serializers.CharField()
+    filter = AlertBulkFilterSerializer(required=False)
+
+    # Same transitions as a single update
+    validate_status = AlertStatusUpdateSerializer.validate_status
+
+    def __init__(self, *args, max_alerts=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['ids'] = serializers.ListField(
+            child=serializers.IntegerField(min_value=1), required=False, allow_empty=False,
+            max_length=max_alerts or settings.ALERT_BULK_UPDATE_MAX,
+        )
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError('Give either "ids" or "filter".')
+        return attrs
+
+
+class AlertBulkStatusResultSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    result = serializers.ChoiceField(choices=['updated', 'unchanged', 'not_found'])
+    previous_status = serializers.ChoiceField(choices=Alert.STATUS_CHOICES, required=False,
+                                              help_text='Only for updated alerts')
+
+
+class AlertBulkStatusResponseSerializer(serializers.Serializer):
+    """Response of a bulk status update (schema only)"""
+    status = serializers.ChoiceField(choices=Alert.STATUS_CHOICES)
+    updated = serializers.IntegerField()
+    truncated = serializers.BooleanField(help_text='More alerts match the filter: repeat the request')
+    results = AlertBulkStatusResultSerializer(many=True)
+
+
+class AlertStatusChangeSerializer(serializers.ModelSerializer):
+    """One entry of an alert's status history"""
+    changed_by = serializers.SlugRelatedField(slug_field='username', read_only=True)
+
+    class Meta:
+        model = AlertStatusChange
+        fields = ['old_status', 'new_status', 'changed_at', 'changed_by']
+
+
+class ResponseTimeSummarySerializer(serializers.Serializer):
+    count = serializers.IntegerField()
+    mean_seconds = serializers.FloatField(allow_null=True)
+    p50_seconds = serializers.FloatField(allow_null=True)
+    p90_seconds = serializers.FloatField(allow_null=True)
+    p99_seconds = serializers.FloatField(allow_null=True)
+
+
+class SeverityResponseTimesSerializer(serializers.Serializer):
+    acknowledge = ResponseTimeSummarySerializer()
+    resolve = ResponseTimeSummarySerializer()
+
+
+class AlertResponseTimesSerializer(serializers.Serializer):
+    """Response times per severity (alerts/history.py); ``until`` is exclusive"""
+    since = serializers.DateTimeField()
+    until = serializers.DateTimeField()
+    severities = serializers.DictField(child=SeverityResponseTimesSerializer())
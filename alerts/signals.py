@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .rules import clear_matcher_cache
+
+
+@receiver(post_save, sender='alerts.AlertRule')
+@receiver(post_delete, sender='alerts.AlertRule')
+def recompile_alert_rules(sender, **kwargs):
+    """Recompile the rule matcher now and again once the change is committed"""
+    clear_matcher_cache()
+    # A concurrent compile may have read the rules before this commit
+    transaction.on_commit(clear_matcher_cache)
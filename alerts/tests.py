@@ -1,10 +1,24 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User, Group
 from rest_framework.test import APIClient
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from events.models import Event
-from .models import Alert
+from . import history
+from .models import Alert, AlertResponseTime, AlertRule, AlertStatusChange, ThresholdWindow
+from .rules import clear_matcher_cache
+from .thresholds import ThresholdTracker, reset_tracker
 
 
 class AlertStatusUpdatePermissionTest(TestCase):
@@ -91,3 +105,631 @@ class AlertStatusUpdatePermissionTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.alert.refresh_from_db()
         self.assertEqual(self.alert.status, 'RESOLVED')
+
+
+class AlertBulkStatusTest(TestCase):
+    """Test POST /api/alerts/bulk-status/"""
+
+    def setUp(self):
+        """Set up an Admin client and three HIGH alerts"""
+        admin_group, _ = Group.objects.get_or_create(name='Admin')
+        user = User.objects.create_user(username='admin', password='adminpass123')
+        user.groups.add(admin_group)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        self.alerts = [
+            Alert.objects.get(event=Event.objects.create(
+                source_name='IDS', event_type='Port Scan', severity='HIGH', description='x',
+            ))
+            for _ in range(3)
+        ]
+
+    def _post(self, data):
+        return self.client.post('/api/alerts/bulk-status/', data, format='json')
+
+    def test_ids_are_updated_with_one_update(self):
+        """Test that listed alerts change with one UPDATE and every id gets a result"""
+        first, second, third = self.alerts
+        Alert.objects.filter(pk=second.pk).update(status='ACKNOWLEDGED')
+        missing = third.pk + 100
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self._post({'status': 'acknowledged', 'ids': [first.pk, second.pk, missing, first.pk]})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {
+            'status': 'ACKNOWLEDGED', 'updated': 1, 'truncated': False, 'results': [
+                {'id': first.pk, 'result': 'updated', 'previous_status': 'OPEN'},
+                {'id': second.pk, 'result': 'unchanged'},
+                {'id': missing, 'result': 'not_found'},
+            ],
+        })
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        first_after = Alert.objects.get(pk=first.pk)
+        self.assertEqual(first_after.status, 'ACKNOWLEDGED')
+        self.assertGreater(first_after.updated_at, first.updated_at)
+        self.assertEqual(Alert.objects.get(pk=third.pk).status, 'OPEN')
+
+    @override_settings(ALERT_BULK_UPDATE_MAX=2)
+    def test_filter_is_applied_in_batches(self):
+        """Test that a filter matching more alerts than allowed updates the oldest and says so"""
+        data = {'status': 'RESOLVED', 'filter': {'status': 'open', 'severity': 'HIGH'}}
+
+        response = self._post(data).json()
+        self.assertEqual((response['updated'], response['truncated']), (2, True))
+        self.assertEqual([result['id'] for result in response['results']], [alert.pk for alert in self.alerts[:2]])
+        response = self._post(data).json()
+        self.assertEqual((response['updated'], response['truncated']), (1, False))
+        self.assertEqual(self._post(data).json()['results'], [])
+        self.assertEqual(set(Alert.objects.values_list('status', flat=True)), {'RESOLVED'})
+
+        data = {'status': 'ACKNOWLEDGED', 'filter': {'created_before': '2000-01-01T00:00:00Z'}}
+        self.assertEqual(self._post(data).json()['updated'], 0)
+
+    def test_invalid_requests(self):
+        """Test that the transition and the selection are validated and Analysts are refused"""
+        alert_id = self.alerts[0].pk
+        for data in [
+            {'status': 'OPEN', 'ids': [alert_id]},
+            {'status': 'RESOLVED'},
+            {'status': 'RESOLVED', 'ids': [alert_id], 'filter': {}},
+            {'status': 'RESOLVED', 'ids': []},
+            {'status': 'RESOLVED', 'filter': {'severity': 'URGENT'}},
+            {'status': 'RESOLVED', 'ids': list(range(1, 502))},
+        ]:
+            with self.subTest(data=data):
+                self.assertEqual(self._post(data).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Alert.objects.get(pk=alert_id).status, 'OPEN')
+
+        analyst_group, _ = Group.objects.get_or_create(name='Analyst')
+        analyst = User.objects.create_user(username='analyst', password='analystpass123')
+        analyst.groups.add(analyst_group)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(analyst).access_token}')
+        self.assertEqual(self._post({'status': 'RESOLVED', 'ids': [alert_id]}).status_code,
+                         status.HTTP_403_FORBIDDEN)
+
+
+class AlertStatusHistoryTest(TestCase):
+    """Test the alert status history and response times (alerts.history)"""
+
+    def setUp(self):
+        """Set up Admin and Analyst clients and two alerts created a minute ago"""
+        admin_group, _ = Group.objects.get_or_create(name='Admin')
+        self.admin = User.objects.create_user(username='admin', password='adminpass123')
+        self.admin.groups.add(admin_group)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.admin).access_token}')
+        analyst_group, _ = Group.objects.get_or_create(name='Analyst')
+        analyst = User.objects.create_user(username='analyst', password='analystpass123')
+        analyst.groups.add(analyst_group)
+        self.analyst_client = APIClient()
+        self.analyst_client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(analyst).access_token}')
+        self.alerts = []
+        for severity in ('HIGH', 'CRITICAL'):
+            alert = Alert.objects.get(event=Event.objects.create(
+                source_name='IDS', event_type='Port Scan', severity=severity, description='x',
+            ))
+            Alert.objects.filter(pk=alert.pk).update(created_at=alert.created_at - timedelta(seconds=60))
+            self.alerts.append(Alert.objects.get(pk=alert.pk))
+
+    def _latencies(self):
+        return sorted(AlertResponseTime.objects.values_list('severity', 'metric', 'count'))
+
+    def test_patch_records_change_and_first_acknowledgement(self):
+        """Test that a PATCH writes a history row and counts only the first acknowledgement"""
+        alert = self.alerts[0]
+        url = f'/api/alerts/{alert.pk}/'
+        self.client.patch(url, {'status': 'ACKNOWLEDGED'}, format='json')
+        alert.refresh_from_db()
+        acknowledged_at = alert.acknowledged_at
+        self.assertIsNotNone(acknowledged_at)
+        self.assertIsNone(alert.resolved_at)
+        self.assertEqual(self._latencies(), [('HIGH', 'ACKNOWLEDGE', 1)])
+
+        self.client.patch(url, {'status': 'ACKNOWLEDGED'}, format='json')
+        self.client.patch(url, {'status': 'RESOLVED'}, format='json')
+        alert.refresh_from_db()
+        self.assertEqual(alert.acknowledged_at, acknowledged_at)
+        self.assertIsNotNone(alert.resolved_at)
+        self.assertEqual(self._latencies(), [('HIGH', 'ACKNOWLEDGE', 1), ('HIGH', 'RESOLVE', 1)])
+        self.assertEqual(
+            list(alert.status_changes.values_list('old_status', 'new_status', 'changed_by__username')),
+            [('OPEN', 'ACKNOWLEDGED', 'admin'), ('ACKNOWLEDGED', 'RESOLVED', 'admin')],
+        )
+        seconds = AlertResponseTime.objects.get(metric='ACKNOWLEDGE').total_seconds
+        self.assertAlmostEqual(seconds, 60, delta=5)
+
+    def test_bulk_update_records_history_in_batches(self):
+        """Test that a bulk update adds its history with one INSERT and one upsert"""
+        first, second = self.alerts
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/alerts/bulk-status/', {
+                'status': 'RESOLVED', 'ids': [first.pk, second.pk],
+            }, format='json')
+        self.assertEqual(response.json()['updated'], 2)
+        # executemany() is logged as "N times: INSERT ..."
+        inserts = [query['sql'] for query in queries if 'INSERT' in query['sql'].split(' (', 1)[0]]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(self._latencies(), [
+            ('CRITICAL', 'ACKNOWLEDGE', 1), ('CRITICAL', 'RESOLVE', 1),
+            ('HIGH', 'ACKNOWLEDGE', 1), ('HIGH', 'RESOLVE', 1),
+        ])
+        self.assertEqual(AlertStatusChange.objects.filter(new_status='RESOLVED').count(), 2)
+        first.refresh_from_db()
+        self.assertEqual(first.acknowledged_at, first.resolved_at)
+
+        self.client.post('/api/alerts/bulk-status/', {'status': 'RESOLVED', 'ids': [first.pk]}, format='json')
+        self.assertEqual(AlertStatusChange.objects.count(), 2)
+
+    def test_timeline_and_response_times_endpoints(self):
+        """Test that Analysts can read an alert's timeline and the response-time percentiles"""
+        alert = self.alerts[1]
+        self.client.patch(f'/api/alerts/{alert.pk}/', {'status': 'ACKNOWLEDGED'}, format='json')
+
+        response = self.analyst_client.get(f'/api/alerts/{alert.pk}/history/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(change['old_status'], change['new_status'], change['changed_by'])
+                          for change in response.json()], [('OPEN', 'ACKNOWLEDGED', 'admin')])
+
+        response = self.analyst_client.get('/api/alerts/response-times/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        severities = response.json()['severities']
+        self.assertEqual(list(severities), ['CRITICAL'])
+        acknowledge = severities['CRITICAL']['acknowledge']
+        self.assertEqual(acknowledge['count'], 1)
+        self.assertAlmostEqual(acknowledge['p50_seconds'], 60, delta=60 * 0.1)
+        self.assertEqual(severities['CRITICAL']['resolve']['count'], 0)
+
+        response = self.analyst_client.get('/api/alerts/response-times/', {'until': '2000-01-01T00:00:00Z'})
+        self.assertEqual(response.json()['severities'], {})
+        for params in [{'since': 'yesterday'}, {'since': '2030-01-01T00:00:00Z', 'until': '2029-01-01T00:00:00Z'}]:
+            with self.subTest(params=params):
+                response = self.analyst_client.get('/api/alerts/response-times/', params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_percentiles_are_within_bucket_error(self):
+        """Test that bucketed percentiles are within 9% of the exact values"""
+        latencies = [1.5 ** power for power in range(40)]
+        histogram = {}
+        for seconds in latencies:
+            count, total = histogram.get(history.bucket_of(seconds), (0, 0.0))
+            histogram[history.bucket_of(seconds)] = (count + 1, total + seconds)
+        summary = history.summarize(histogram)
+        self.assertEqual(summary['count'], 40)
+        self.assertAlmostEqual(summary['mean_seconds'], sum(latencies) / 40, delta=0.1)
+        for percentile, exact in ((50, latencies[19]), (90, latencies[35]), (99, latencies[39])):
+            self.assertAlmostEqual(summary[f'p{percentile}_seconds'] / exact, 1, delta=0.09)
+        self.assertIsNone(history.summarize({})['p50_seconds'])
+
+
+class AlertTriageQueueTest(TestCase):
+    """Test GET /api/alerts/triage/ and Alert.severity_rank"""
+
+    def setUp(self):
+        """Set up an Analyst client and alerts of mixed severity and status"""
+        analyst_group, _ = Group.objects.get_or_create(name='Analyst')
+        analyst = User.objects.create_user(username='analyst', password='analystpass123')
+        analyst.groups.add(analyst_group)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(analyst).access_token}')
+        clear_matcher_cache()
+        self.addCleanup(clear_matcher_cache)
+        AlertRule.objects.create(name='All severities', severities='LOW,MEDIUM,HIGH,CRITICAL')
+        self.alerts = {}
+        for name, severity in [('low', 'LOW'), ('high-old', 'HIGH'), ('critical', 'CRITICAL'), ('high-new', 'HIGH'),
+                               ('critical-resolved', 'CRITICAL')]:
+            self.alerts[name] = Alert.objects.get(event=Event.objects.create(
+                source_name='IDS', event_type='Port Scan', severity=severity, description=name,
+            ))
+        Alert.objects.filter(pk=self.alerts['critical-resolved'].pk).update(status='RESOLVED')
+
+    def _ids(self, names):
+        return [self.alerts[name].pk for name in names]
+
+    def test_rank_is_stored(self):
+        """Test that saving an alert ranks its severity, unknown severities last"""
+        self.assertEqual(self.alerts['critical'].severity_rank, 4)
+        self.assertEqual(self.alerts['low'].severity_rank, 1)
+        alert = self.alerts['low']
+        alert.severity = 'Informational'
+        alert.save()
+        self.assertEqual(Alert.objects.get(pk=alert.pk).severity_rank, 0)
+
+    def test_queue_order(self):
+        """Test that the queue lists most severe first, then oldest, for the status asked"""
+        response = self.client.get('/api/alerts/triage/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([alert['id'] for alert in response.json()],
+                         self._ids(['critical', 'high-old', 'high-new', 'low']))
+
+        response = self.client.get('/api/alerts/triage/', {'limit': 2, 'fields': 'id,severity'})
+        self.assertEqual(response.json(), [{'id': self.alerts['critical'].pk, 'severity': 'CRITICAL'},
+                                           {'id': self.alerts['high-old'].pk, 'severity': 'HIGH'}])
+        response = self.client.get('/api/alerts/triage/', {'status': 'resolved'})
+        self.assertEqual([alert['id'] for alert in response.json()], self._ids(['critical-resolved']))
+
+        response = self.client.get('/api/alerts/', {'ordering': '-severity_rank,created_at'})
+        self.assertEqual([alert['id'] for alert in response.json()['results']][:2],
+                         self._ids(['critical', 'critical-resolved']))
+
+    def test_invalid_parameters(self):
+        """Test that an unknown status or an out-of-range limit is rejected"""
+        for params in [{'status': 'CLOSED'}, {'limit': 0}, {'limit': 201}, {'limit': 'ten'}]:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/alerts/triage/', params).status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+
+    def test_queue_reads_index_range(self):
+        """Test that the queue is read from the triage index without sorting"""
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN is SQLite syntax')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/alerts/triage/', {'limit': 5})
+        sql = next(query['sql'] for query in queries if 'ORDER BY' in query['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('alert_triage_queue', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_bulk_created_alerts_and_backfill_are_ranked(self):
+        """Test that bulk-created alerts and the migration's backfill store the rank"""
+        from importlib import import_module
+        from django.apps import apps
+        from events.bulk import create_alerts
+
+        event = Event.objects.create(source_name='IDS', event_type='Port Scan', severity='MEDIUM', description='x')
+        Alert.objects.filter(event=event).delete()
+        create_alerts([event.pk])
+        self.assertEqual(Alert.objects.get(event=event).severity_rank, 2)
+
+        Alert.objects.update(severity_rank=0)
+        import_module('alerts.migrations.0010_alert_severity_rank').rank_existing_alerts(apps, None)
+        self.assertEqual(Alert.objects.get(pk=self.alerts['high-new'].pk).severity_rank, 3)
+        self.assertEqual(Alert.objects.get(event=event).severity_rank, 2)
+
+
+class AlertListCompressionTest(TestCase):
+    """Test gzip compression of alert list responses"""
+
+    def setUp(self):
+        """Set up an Analyst client and alerts"""
+        analyst_group, _ = Group.objects.get_or_create(name='Analyst')
+        user = User.objects.create_user(username='analyst', password='analystpass123')
+        user.groups.add(analyst_group)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        for index in range(60):
+            Event.objects.create(
+                source_name='IDS', event_type='Port Scan', severity='HIGH',
+                description=f'Scan number {index} from 10.0.0.{index}',
+            )
+
+    def test_large_list_is_gzipped(self):
+        """Test that large pages are gzipped for clients that accept it"""
+        response = self.client.get('/api/alerts/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['count'], 60)
+
+        response = self.client.get('/api/alerts/')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    @override_settings(GZIP_MIN_RESPONSE_SIZE=1024 * 1024)
+    def test_small_response_is_not_gzipped(self):
+        """Test that responses below GZIP_MIN_RESPONSE_SIZE are sent as is"""
+        response = self.client.get('/api/alerts/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.json()['count'], 60)
+
+
+class AlertSparseFieldsetTest(TestCase):
+    """Test ?fields= projection and ?description_max= truncation"""
+
+    def setUp(self):
+        """Set up an Analyst client and an alert with a long description"""
+        analyst_group, _ = Group.objects.get_or_create(name='Analyst')
+        user = User.objects.create_user(username='analyst', password='analystpass123')
+        user.groups.add(analyst_group)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        self.event = Event.objects.create(
+            source_name='IDS', event_type='Port Scan', severity='HIGH', description='x' * 5000,
+        )
+        self.alert = Alert.objects.get(event=self.event)
+
+    def _alert_select(self, queries):
+        return next(q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'FROM "alerts_alert"' in q['sql']
+                    and 'COUNT(' not in q['sql'])
+
+    def test_fields_limit_keys_and_columns(self):
+        """Test that only the requested keys are returned and only their columns are read"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/alerts/?fields=id,title,status,bogus')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'], [{'id': self.alert.id, 'title': 'Alert: Port Scan', 'status': 'OPEN'}])
+        sql = self._alert_select(queries)
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('JOIN', sql)
+
+        response = self.client.get(f'/api/alerts/{self.alert.id}/?fields=event_type,event_id')
+        self.assertEqual(response.json(), {'event_id': self.event.id, 'event_type': 'Port Scan'})
+
+    def test_description_max_truncates(self):
+        """Test that descriptions are cut to description_max characters with an ellipsis"""
+        response = self.client.get('/api/alerts/?description_max=20')
+        result = response.json()['results'][0]
+        self.assertEqual(result['description'], 'x' * 19 + '…')
+        self.assertEqual(result['event_type'], 'Port Scan')
+
+        response = self.client.get('/api/alerts/?fields=description&description_max=5000')
+        self.assertEqual(response.json()['results'][0], {'description': 'x' * 5000})
+
+    def test_invalid_options_are_ignored(self):
+        """Test that unknown fields and invalid limits return the full representation"""
+        for query in ['?fields=bogus', '?description_max=-1', '?description_max=abc', '?fields=']:
+            with self.subTest(query=query):
+                result = self.client.get(f'/api/alerts/{query}').json()['results'][0]
+                self.assertEqual(result['description'], 'x' * 5000)
+                self.assertIn('updated_at', result)
+
+
+class AlertDescriptionTest(TestCase):
+    """Test that alerts read their description from the event instead of copying it"""
+
+    def setUp(self):
+        """Set up a HIGH event and its auto-created alert"""
+        self.event = Event.objects.create(
+            source_name='IDS', event_type='Port Scan', severity='HIGH', description='Scan from 10.0.0.1',
+        )
+        self.alert = Alert.objects.get(event=self.event)
+
+    def test_description_comes_from_event(self):
+        """Test that the auto-created alert stores no copy of the description"""
+        self.assertIsNone(self.alert.description_override)
+        self.assertEqual(self.alert.description, 'Scan from 10.0.0.1')
+
+        self.alert.description = 'Scan from 10.0.0.1'
+        self.assertIsNone(self.alert.description_override)
+
+    def test_differing_description_is_stored(self):
+        """Test that a description different from the event's is kept as an override"""
+        self.alert.description = 'Triaged: scanner is the internal vulnerability scanner'
+        self.alert.save()
+        alert = Alert.objects.get(pk=self.alert.pk)
+        self.assertEqual(alert.description_override, 'Triaged: scanner is the internal vulnerability scanner')
+        self.assertEqual(alert.description, alert.description_override)
+
+        orphan = Alert.objects.create(title='Manual', severity='LOW', description='No event')
+        self.assertEqual(Alert.objects.get(pk=orphan.pk).description, 'No event')
+
+    def test_descriptions_cost_no_query_per_alert(self):
+        """Test that alerts read through Alert.objects or the admin list need no query each for their event"""
+        for index in range(3):
+            Event.objects.create(source_name='IDS', event_type='Port Scan', severity='HIGH',
+                                 description=f'Scan {index}')
+        with self.assertNumQueries(1):
+            self.assertEqual(len([alert.description for alert in Alert.objects.all()]), 4)
+
+        admin_user = User.objects.create_superuser(username='root', password='rootpass123')
+        self.client.force_login(admin_user)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get('/admin/alerts/alert/')
+        events = Event.objects.bulk_create([
+            Event(source_name='IDS', event_type='Port Scan', severity='HIGH', description=f'More {index}')
+            for index in range(5)
+        ])
+        Alert.objects.bulk_create([Alert(title='Alert: Port Scan', severity='HIGH', event=event) for event in events])
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get('/admin/alerts/alert/')
+        self.assertContains(response, 'Port Scan - HIGH (IDS)', count=9)
+        self.assertEqual(len(many.captured_queries), len(few.captured_queries))
+
+    def test_api_output_is_unchanged(self):
+        """Test that the API still returns the description"""
+        analyst_group, _ = Group.objects.get_or_create(name='Analyst')
+        user = User.objects.create_user(username='analyst', password='analystpass123')
+        user.groups.add(analyst_group)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        response = client.get(f'/api/alerts/{self.alert.id}/')
+        self.assertEqual(response.json()['description'], 'Scan from 10.0.0.1')
+        response = client.get(f'/api/alerts/{self.alert.id}/?fields=id,description')
+        self.assertEqual(response.json(), {'id': self.alert.id, 'description': 'Scan from 10.0.0.1'})
+
+
+class AlertRuleTest(TestCase):
+    """Test that alerts are raised by the configured rules"""
+
+    def setUp(self):
+        clear_matcher_cache()
+        self.addCleanup(clear_matcher_cache)
+
+    def _event(self, severity='LOW', source_name='web-01', event_type='Login', description='ok'):
+        return Event.objects.create(
+            source_name=source_name, event_type=event_type, severity=severity, description=description,
+        )
+
+    def test_default_rule_keeps_high_and_critical(self):
+        """Test that the seeded rule raises alerts for HIGH and CRITICAL events only"""
+        self.assertEqual(AlertRule.objects.get(name='High and critical events').severity_list(), ['HIGH', 'CRITICAL'])
+        for severity in ('LOW', 'MEDIUM', 'HIGH', 'CRITICAL'):
+            self._event(severity=severity)
+        self.assertEqual(sorted(Alert.objects.values_list('severity', flat=True)), ['CRITICAL', 'HIGH'])
+
+    def test_conditions_are_combined(self):
+        """Test that a rule matches only when all of its conditions hold"""
+        AlertRule.objects.create(name='Medium on the DC', severities='MEDIUM', source_name='dc-01')
+        self._event(severity='MEDIUM', source_name='dc-01')
+        self._event(severity='MEDIUM', source_name='web-01')
+        self._event(severity='LOW', source_name='dc-01')
+        self.assertEqual(list(Alert.objects.values_list('event__source_name', 'severity')), [('dc-01', 'MEDIUM')])
+
+    def test_event_type_pattern_and_description(self):
+        """Test regex event types and case-insensitive description substrings"""
+        AlertRule.objects.create(name='Ransomware', event_type_pattern=r'^(Ransom|Crypto)\w*')
+        AlertRule.objects.create(name='Mimikatz', description_contains='MimiKatz')
+        AlertRule.objects.create(name='Both', event_type='Process', description_contains='lsass')
+
+        self._event(event_type='Ransomware Detected')
+        self._event(event_type='CryptoLocker')
+        self._event(event_type='Detected Ransomware')
+        self._event(event_type='Process', description='ran mimikatz.exe')
+        self._event(event_type='Login', description='read LSASS memory')
+        self._event(event_type='Process', description='dumped lsass memory')
+        self.assertEqual(
+            list(Alert.objects.order_by('id').values_list('event__event_type', flat=True)),
+            ['Ransomware Detected', 'CryptoLocker', 'Process', 'Process'],
+        )
+
+    def test_rule_changes_recompile(self):
+        """Test that saving, disabling and deleting rules take effect at once"""
+        rule = AlertRule.objects.create(name='Logins', event_type='Login')
+        self._event()
+        rule.is_active = False
+        rule.save()
+        self._event()
+        AlertRule.objects.all().delete()
+        self._event(severity='CRITICAL')
+        self.assertEqual(Alert.objects.count(), 1)
+
+    @override_settings(ALERT_RULES_CACHE_TTL=0)
+    def test_bulk_updates_are_noticed(self):
+        """Test that rules changed with QuerySet.update() (no save signal) are picked up by the cache check"""
+        AlertRule.objects.create(name='Logins', event_type='Login')
+        self._event()
+        AlertRule.objects.filter(name='Logins').update(is_active=False)
+        self._event()
+        self.assertEqual(Alert.objects.count(), 1)
+
+    def test_matcher_is_cached(self):
+        """Test that matching does not query the rules for each event"""
+        self._event()
+        with CaptureQueriesContext(connection) as ctx:
+            self._event(severity='HIGH')
+        self.assertFalse([query for query in ctx.captured_queries if 'alerts_alertrule' in query['sql']])
+
+    def test_validation(self):
+        """Test that rules need valid severities, a valid pattern and at least one condition"""
+        for fields in (
+            {'severities': 'HIGH,URGENT'},
+            {'event_type_pattern': '(unclosed'},
+            {},
+        ):
+            with self.subTest(fields=fields), self.assertRaises(ValidationError):
+                AlertRule.objects.create(name='Invalid', **fields)
+        rule = AlertRule.objects.create(name='Normalized', severities=' high , Critical')
+        self.assertEqual(rule.severity_list(), ['HIGH', 'CRITICAL'])
+
+    def test_bulk_import_uses_rules(self):
+        """Test that import_events raises alerts with the same rules"""
+        AlertRule.objects.create(name='Scans', event_type_pattern='Scan', description_contains='10.0.0.')
+        records = [
+            {'source_name': 'ids', 'event_type': 'Port Scan', 'severity': 'LOW',
+             'description': 'from 10.0.0.7', 'timestamp': '2025-01-01T00:00:00Z'},
+            {'source_name': 'ids', 'event_type': 'Port Scan', 'severity': 'LOW',
+             'description': 'from 192.168.0.7', 'timestamp': '2025-01-01T00:00:00Z'},
+            {'source_name': 'ids', 'event_type': 'Login', 'severity': 'CRITICAL',
+             'description': 'root', 'timestamp': '2025-01-01T00:00:00Z'},
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as handle:
+            handle.write('\n'.join(json.dumps(record) for record in records))
+        self.addCleanup(os.unlink, handle.name)
+
+        call_command('import_events', handle.name, workers=1, stdout=StringIO())
+
+        self.assertEqual(
+            sorted(Alert.objects.values_list('event__description', flat=True)), ['from 10.0.0.7', 'root'],
+        )
+
+
+class ThresholdRuleTest(TestCase):
+    """Test that threshold rules raise alerts on event rates"""
+
+    def setUp(self):
+        clear_matcher_cache()
+        reset_tracker()
+        self.addCleanup(clear_matcher_cache)
+        self.addCleanup(reset_tracker)
+        self.rule = AlertRule.objects.create(
+            name='Brute force', event_type='Failed Login', severities='LOW', threshold=5, window_seconds=60,
+        )
+
+    def _login(self, source_name='10.0.0.1'):
+        return Event.objects.create(
+            source_name=source_name, event_type='Failed Login', severity='LOW', description='bad password',
+        )
+
+    def test_rate_crossing_raises_one_alert(self):
+        """Test that the event reaching the threshold raises an alert, once per threshold events"""
+        for _ in range(4):
+            self._login()
+        self._login(source_name='10.0.0.2')
+        self.assertFalse(Alert.objects.exists())
+
+        fifth = self._login()
+        alert = Alert.objects.get()
+        self.assertEqual(alert.event, fifth)
+        self.assertEqual((alert.title, alert.severity), ('Alert: Failed Login (5 in 60s)', 'LOW'))
+
+        for _ in range(4):
+            self._login()
+        self.assertEqual(Alert.objects.count(), 1)
+        self._login()
+        self.assertEqual(Alert.objects.count(), 2)
+
+    def test_windows_are_shared_between_processes(self):
+        """Test that trackers in different processes count into the same window, with two statements a hit"""
+        key = (self.rule.pk, 'fw', 'Port Scan')
+        first, second = ThresholdTracker(buckets=12), ThresholdTracker(buckets=12)
+        self.assertFalse(first.hit(key, 3, 60, 0))
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertFalse(second.hit(key, 3, 60, 1))
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertTrue(first.hit(key, 3, 60, 2))
+        self.assertFalse(second.hit(key, 3, 60, 3))  # The window started again
+
+    def test_window_slides(self):
+        """Test that events leave the count once they are older than the window"""
+        tracker = ThresholdTracker(buckets=12)
+        key = (self.rule.pk, 'fw', 'Port Scan')
+        self.assertFalse(tracker.hit(key, 3, 60, 0))
+        self.assertFalse(tracker.hit(key, 3, 60, 30))
+        self.assertFalse(tracker.hit(key, 3, 60, 100))  # The first two have left the window
+        self.assertFalse(tracker.hit(key, 3, 60, 20))  # Too old to count
+        self.assertFalse(tracker.hit(key, 3, 60, 110))
+        self.assertTrue(tracker.hit(key, 3, 60, 120))
+
+    def test_idle_windows_are_deleted(self):
+        """Test that windows idle for longer than their window are swept"""
+        tracker = ThresholdTracker(buckets=12, sweep_every=2)
+        tracker.hit((self.rule.pk, 'a', 'Port Scan'), 10, 60, 0)
+        tracker.hit((self.rule.pk, 'b', 'Port Scan'), 10, 60, 1000)
+        # 'a' was idle for longer than its window
+        self.assertEqual(list(ThresholdWindow.objects.values_list('source_name', flat=True)), ['b'])
+
+    def test_changed_window_starts_again(self):
+        """Test that a window whose rule changed its window_seconds is not reused"""
+        tracker = ThresholdTracker(buckets=12)
+        key = (self.rule.pk, 'fw', 'Port Scan')
+        tracker.hit(key, 2, 60, 0)
+        self.assertFalse(tracker.hit(key, 2, 120, 1))
+        self.assertTrue(tracker.hit(key, 2, 120, 2))
+
+    def test_bulk_import_counts_rates(self):
+        """Test that import_events applies threshold rules in event time"""
+        records = [
+            {'source_name': '10.0.0.1', 'event_type': 'Failed Login', 'severity': 'LOW',
+             'description': 'bad password', 'timestamp': f'2025-01-01T00:{minute:02d}:00Z'}
+            for minute in (0, 0, 0, 0, 2, 2, 2, 2, 2)
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as handle:
+            handle.write('\n'.join(json.dumps(record) for record in records))
+        self.addCleanup(os.unlink, handle.name)
+
+        call_command('import_events', handle.name, workers=1, stdout=StringIO())
+
+        alert = Alert.objects.get()
+        self.assertEqual(alert.title, 'Alert: Failed Login (5 in 60s)')
+        self.assertEqual(alert.event_id, Event.objects.order_by('id').values_list('id', flat=True)[8])
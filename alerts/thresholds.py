@@ -0,0 +1,130 @@
+"""
+Sliding-window event counters for threshold alert rules.
+
+``ThresholdTracker`` keeps one ring buffer of ``buckets`` counts per
+(rule, source_name, event_type) key; each bucket covers window/buckets
+seconds of event time, so a window is a fixed-size row whatever the rate.
+When the count over the window reaches the rule's threshold the hit fires
+and the window starts again from zero, so a sustained rate raises one alert
+per ``threshold`` events. Events older than the window (late or historical)
+are not counted.
+
+Windows are ``ThresholdWindow`` rows, so every ingesting process (API
+workers, the syslog listener, imports) counts into the same windows and
+they survive restarts. A hit is two statements in the caller's transaction:
+an upsert that creates the row if needed and returns it locked (``INSERT
+... ON CONFLICT DO UPDATE ... RETURNING``, SQLite 3.35+ and PostgreSQL; the
+lock serializes concurrent hits on the same key), and an UPDATE with the new
+counts. Every ``sweep_every`` hits a process deletes the windows that have
+been idle for longer than their window.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import ThresholdWindow
+
+# Hits between two deletions of idle windows (per process)
+SWEEP_EVERY = 1000
+
+
+class Window:
+    __slots__ = ('width', 'head', 'total', 'counts')
+
+    def __init__(self, width, buckets):
+        self.width = width
+        self.head = None  # Absolute index (event time // width) of the newest bucket
+        self.total = 0
+        self.counts = [0] * buckets
+
+    def add(self, timestamp):
+        """Count one event; returns the count over the window, or None when too old"""
+        counts = self.counts
+        size = len(counts)
+        bucket = int(timestamp // self.width)
+        if self.head is None:
+            self.head = bucket
+        elif bucket > self.head:
+            if bucket - self.head >= size:
+                counts[:] = [0] * size
+                self.total = 0
+            else:
+                for index in range(self.head + 1, bucket + 1):
+                    self.total -= counts[index % size]
+                    counts[index % size] = 0
+            self.head = bucket
+        elif bucket <= self.head - size:
+            return None
+        counts[bucket % size] += 1
+        self.total += 1
+        return self.total
+
+    def reset(self):
+        self.counts[:] = [0] * len(self.counts)
+        self.total = 0
+
+
+class ThresholdTracker:
+    def __init__(self, buckets=12, sweep_every=SWEEP_EVERY):
+        self.buckets = buckets
+        self.sweep_every = sweep_every
+        self._hits = 0
+
+    def hit(self, key, threshold, window_seconds, timestamp):
+        """
+        Count an event (Unix time) for ``key``, a (rule id, source_name,
+        event_type) tuple; True when it reaches the threshold.
+        """
+        width = window_seconds / self.buckets
+        with transaction.atomic(savepoint=False):
+            pk, stored_width, head, counts = self._lock_window(key, width, timestamp)
+            window = Window(width, self.buckets)
+            counts = [int(count) for count in counts.split(',')] if counts else []
+            if stored_width == width and len(counts) == self.buckets:  # Not new, and the rule's window is unchanged
+                window.head, window.counts, window.total = head, counts, sum(counts)
+            count = window.add(timestamp)
+            if count is None:
+                return False
+            fired = count >= threshold
+            if fired:
+                window.reset()
+            ThresholdWindow.objects.filter(pk=pk).update(
+                width=width, head=window.head, counts=','.join(map(str, window.counts)),
+                expires=(window.head + 1) * width + window_seconds,
+            )
+        self._hits += 1
+        if self._hits % self.sweep_every == 0:
+            ThresholdWindow.objects.filter(expires__lte=timestamp).delete()
+        return fired
+
+    def _lock_window(self, key, width, timestamp):
+        """``(pk, width, head, counts)`` of the window row for ``key``, created if missing and locked"""
+        quote = connection.ops.quote_name
+        table = quote(ThresholdWindow._meta.db_table)
+        key_columns = ', '.join(quote(name) for name in ('rule_id', 'source_name', 'event_type'))
+        # The no-op update makes the conflicting row lock and return like an inserted one
+        sql = (
+            f'INSERT INTO {table} ({key_columns}, {quote("width")}, {quote("counts")}, {quote("expires")}) '
+            f"VALUES (%s, %s, %s, %s, '', %s) "
+            f'ON CONFLICT ({key_columns}) DO UPDATE SET {quote("width")} = {table}.{quote("width")} '
+            f'RETURNING {quote("id")}, {quote("width")}, {quote("head")}, {quote("counts")}'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*key, width, timestamp])
+            return cursor.fetchone()
+
+
+_tracker = None
+
+
+def get_tracker():
+    """This process's tracker (the windows themselves are shared)"""
+    global _tracker
+    if _tracker is None:
+        _tracker = ThresholdTracker(buckets=settings.ALERT_THRESHOLD_BUCKETS)
+    return _tracker
+
+
+def reset_tracker():
+    """Drop this process's tracker (tests); the next hit creates a new one"""
+    global _tracker
+    _tracker = None
@@ -1,13 +1,31 @@
 import logging
+from copy import copy
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import DateTimeField, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from rest_framework import viewsets, filters, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiParameter
+from monitoring import metrics
+from threat_monitor.query_params import datetime_param
+from . import history
 from .models import Alert
-from .serializers import AlertSerializer, AlertStatusUpdateSerializer
+from .serializers import (
+    AlertBulkStatusResponseSerializer, AlertBulkStatusSerializer, AlertResponseTimesSerializer, AlertSerializer,
+    AlertStatusChangeSerializer, AlertStatusUpdateSerializer,
+)
 from .permissions import AlertPermission
 
 logger = logging.getLogger('alerts')
 
+TRIAGE_MAX = 200  # Alerts per triage queue request
+
 
 class AlertViewSet(viewsets.ModelViewSet):
     # Base queryset - get_queryset() will override with optimizations
@@ -15,7 +33,7 @@ class AlertViewSet(viewsets.ModelViewSet):
     serializer_class = AlertSerializer
     permission_classes = [AlertPermission]
     filter_backends = [filters.OrderingFilter]
-    ordering_fields = ['created_at', 'status']
+    ordering_fields = ['created_at', 'status', 'severity_rank']
     ordering = ['-created_at']  # Default ordering: newest first
 
     @extend_schema(
@@ -24,13 +42,48 @@ class AlertViewSet(viewsets.ModelViewSet):
         parameters=[
             OpenApiParameter('status', description='Filter by alert status', required=False, type=str),
             OpenApiParameter('severity', description='Filter by event severity', required=False, type=str),
-            OpenApiParameter('ordering', description='Order by field (created_at, status)', required=False, type=str),
+            OpenApiParameter('ordering', description='Order by field (created_at, status, severity_rank)',
+                             required=False, type=str),
+            OpenApiParameter(
+                'fields', required=False, type=str,
+                description='Comma-separated fields to return, e.g. id,title,status (default: all)',
+            ),
+            OpenApiParameter(
+                'description_max', required=False, type=int,
+                description='Truncate descriptions to this many characters',
+            ),
         ],
         tags=['Alerts'],
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    def _read_options(self):
+        """
+        Parse ``?fields=`` and ``?description_max=`` for list/retrieve.
+        Unknown field names and invalid limits are ignored, like the filters.
+        """
+        if not hasattr(self, '_options'):
+            fields = description_max = None
+            request = getattr(self, 'request', None)
+            if request is not None and self.action in ('list', 'retrieve', 'triage'):
+                requested = request.query_params.get('fields')
+                if requested:
+                    names = {name.strip() for name in requested.split(',')}
+                    fields = [name for name in AlertSerializer.Meta.fields if name in names] or None
+                limit = request.query_params.get('description_max')
+                if limit is not None and limit.isdigit() and int(limit) > 0:
+                    description_max = int(limit)
+            self._options = (fields, description_max)
+        return self._options
+
+    def get_serializer(self, *args, **kwargs):
+        fields, description_max = self._read_options()
+        if fields is not None or description_max is not None:
+            kwargs.setdefault('fields', fields)
+            kwargs.setdefault('description_max', description_max)
+        return super().get_serializer(*args, **kwargs)
+
     def get_queryset(self):
         """
         Optimized queryset with select_related to prevent N+1 queries.
@@ -68,7 +121,8 @@ class AlertViewSet(viewsets.ModelViewSet):
                 queryset = queryset.filter(event__severity=severity_param.upper())
             # Silently ignore invalid severity values (security: don't reveal valid choices)
         
-        return queryset
+        # Sparse fieldsets: read only the columns the requested fields need
+        return AlertSerializer.optimize_queryset(queryset, *self._read_options())
 
     @extend_schema(
         summary='Update alert status',
@@ -88,17 +142,200 @@ class AlertViewSet(viewsets.ModelViewSet):
         serializer = AlertStatusUpdateSerializer(instance, data=request.data, partial=True)
         
         if serializer.is_valid(raise_exception=False):
-            serializer.save()
-            new_status = instance.status
+            new_status = serializer.validated_data.get('status', old_status)
+            previous, now = copy(instance), timezone.now()
+            # The change and its history (alerts/history.py) are written together
+            with transaction.atomic():
+                stamps = history.first_response_fields(instance, new_status, now) if new_status != old_status else {}
+                serializer.save(**stamps)
+                history.record([(previous, new_status)], request.user, now)
+            metrics.alert_status_updates.inc(status=new_status)
             logger.info(
-                f'Alert status updated: id={instance.id}, '
-                f'old_status={old_status}, new_status={new_status}, '
-                f'user={request.user.username}'
+                'Alert status updated',
+                extra={
+                    'alert_id': instance.id,
+                    'old_status': old_status,
+                    'new_status': new_status,
+                    'user': request.user.username,
+                },
             )
             return Response(serializer.data, status=status.HTTP_200_OK)
         
         logger.warning(
-            f'Alert status update failed: id={instance.id}, '
-            f'validation_errors={serializer.errors}, user={request.user.username}'
+            'Alert status update failed',
+            extra={
+                'alert_id': instance.id,
+                'error_fields': sorted(serializer.errors),
+                'user': request.user.username,
+            },
         )
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @extend_schema(
+        summary='Update the status of many alerts',
+        description=(
+            'Admin-only. Set the status (ACKNOWLEDGED or RESOLVED) of the alerts listed in "ids", or of '
+            'those matching "filter" (status, severity, created_after, created_before), with one UPDATE. '
+            'Returns a result per alert: updated (with its previous status), unchanged or not_found. '
+            'A filter matching more alerts than allowed per request updates the oldest; "truncated" '
+            'then asks to repeat the request.'
+        ),
+        request=AlertBulkStatusSerializer,
+        responses={200: AlertBulkStatusResponseSerializer, 400: None, 403: None},
+        tags=['Alerts'],
+    )
+    @action(detail=False, methods=['post'], url_path='bulk-status')
+    def bulk_status(self, request):
+        """
+        POST endpoint to change the status of many alerts at once.
+        Admin-only access, like PATCH. The request is validated once, the
+        alerts' current statuses are read and the ones that change are
+        updated with a single UPDATE (which also sets updated_at), in one
+        transaction, with their history (alerts/history.py). Alert.save() is
+        not called: only the status and its timestamps are written, which
+        cannot break the one-alert-per-event rule.
+        """
+        # Ids go into an IN list: stay under the backend's parameter limit
+        max_alerts = min(settings.ALERT_BULK_UPDATE_MAX, (connection.features.max_query_params or 2000) - 10)
+        serializer = AlertBulkStatusSerializer(data=request.data, max_alerts=max_alerts)
+        if not serializer.is_valid():
+            logger.warning(
+                'Bulk alert status update failed',
+                extra={'error_fields': sorted(serializer.errors), 'user': request.user.username},
+            )
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        new_status = data['status']
+
+        truncated = False
+        now = timezone.now()
+        columns = ['pk', 'status', 'severity', 'created_at', 'acknowledged_at', 'resolved_at']
+        with transaction.atomic():
+            if 'ids' in data:
+                requested = list(dict.fromkeys(data['ids']))
+                current = {
+                    alert.pk: alert
+                    for alert in Alert.objects.select_for_update().filter(pk__in=requested).values_list(
+                        *columns, named=True,
+                    )
+                }
+            else:
+                conditions = data['filter']
+                queryset = Alert.objects.select_for_update().order_by('pk').values_list(*columns, named=True)
+                if 'status' in conditions:
+                    queryset = queryset.filter(status=conditions['status'])
+                if 'severity' in conditions:
+                    # The alert's own copy of its event's severity: no join
+                    queryset = queryset.filter(severity=conditions['severity'])
+                if 'created_after' in conditions:
+                    queryset = queryset.filter(created_at__gte=conditions['created_after'])
+                if 'created_before' in conditions:
+                    queryset = queryset.filter(created_at__lt=conditions['created_before'])
+                alerts = list(queryset[:max_alerts + 1])
+                truncated = len(alerts) > max_alerts
+                current = {alert.pk: alert for alert in alerts[:max_alerts]}
+                requested = list(current)
+            changed = [pk for pk, alert in current.items() if alert.status != new_status]
+            if changed:
+                # First acknowledgement/resolution times are kept (COALESCE)
+                stamp = Value(now, output_field=DateTimeField())
+                fields = {'status': new_status, 'updated_at': now, 'acknowledged_at': Coalesce('acknowledged_at', stamp)}
+                if new_status == 'RESOLVED':
+                    fields['resolved_at'] = Coalesce('resolved_at', stamp)
+                Alert.objects.filter(pk__in=changed).update(**fields)
+                history.record([(current[pk], new_status) for pk in changed], request.user, now)
+
+        results = []
+        for pk in requested:
+            alert = current.get(pk)
+            if alert is None:
+                results.append({'id': pk, 'result': 'not_found'})
+            elif alert.status == new_status:
+                results.append({'id': pk, 'result': 'unchanged'})
+            else:
+                results.append({'id': pk, 'result': 'updated', 'previous_status': alert.status})
+        if changed:
+            metrics.alert_status_updates.inc(len(changed), status=new_status)
+        logger.info(
+            'Alert statuses updated in bulk',
+            extra={'new_status': new_status, 'updated': len(changed), 'requested': len(requested),
+                   'user': request.user.username},
+        )
+        return Response({'status': new_status, 'updated': len(changed), 'truncated': truncated, 'results': results})
+
+    @extend_schema(
+        summary='Alert triage queue',
+        description=(
+            'The next alerts to handle: alerts in a status (default: OPEN), most severe first, then oldest. '
+            'Read from the (status, severity rank, created_at) index, so only the alerts returned are visited. '
+            'Supports fields and description_max like the list.'
+        ),
+        parameters=[
+            OpenApiParameter('status', description='Alert status (default: OPEN)', required=False, type=str),
+            OpenApiParameter('limit', description=f'Alerts returned (default: 20, max: {TRIAGE_MAX})',
+                             required=False, type=int),
+            OpenApiParameter('fields', description='Comma-separated fields to return', required=False, type=str),
+            OpenApiParameter('description_max', description='Truncate descriptions to this many characters',
+                             required=False, type=int),
+        ],
+        responses={200: AlertSerializer(many=True), 400: None},
+        tags=['Alerts'],
+    )
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def triage(self, request):
+        """GET endpoint for the next alerts in priority order (Alert.severity_rank)"""
+        params = request.query_params
+        alert_status = params.get('status', 'OPEN').upper()
+        if alert_status not in {choice[0] for choice in Alert.STATUS_CHOICES}:
+            raise ValidationError({'status': [f'Expected one of: {", ".join(c[0] for c in Alert.STATUS_CHOICES)}.']})
+        limit = params.get('limit', '20')
+        if not limit.isdigit() or not 1 <= int(limit) <= TRIAGE_MAX:
+            raise ValidationError({'limit': [f'Expected a whole number from 1 to {TRIAGE_MAX}. Received: "{limit}".']})
+        # The ORDER BY matches the alert_triage_queue index (the rowid/id ends every index entry)
+        queryset = Alert.objects.select_related('event').filter(status=alert_status).order_by(
+            '-severity_rank', 'created_at', 'id',
+        )
+        queryset = AlertSerializer.optimize_queryset(queryset, *self._read_options())
+        return Response(self.get_serializer(queryset[:int(limit)], many=True).data)
+
+    @extend_schema(
+        summary='Alert status history',
+        description='The status changes of an alert, oldest first, with who made them.',
+        responses={200: AlertStatusChangeSerializer(many=True), 404: None},
+        tags=['Alerts'],
+    )
+    @action(detail=True, methods=['get'], url_path='history', pagination_class=None)
+    def status_history(self, request, pk=None):
+        """GET endpoint for an alert's timeline (one range scan of the (alert, changed_at) index)"""
+        alert = self.get_object()
+        changes = alert.status_changes.select_related('changed_by').order_by('changed_at', 'id')
+        return Response(AlertStatusChangeSerializer(changes, many=True).data)
+
+    @extend_schema(
+        summary='Alert response times',
+        description=(
+            'Time to acknowledge and time to resolve (count, mean and 50th/90th/99th percentiles in seconds) '
+            'per severity, for the alerts acknowledged or resolved in a time range (default: the last 7 days), '
+            'in whole hours. Computed from hourly histograms kept as alerts change status; percentiles are '
+            'within about 9%.'
+        ),
+        parameters=[
+            OpenApiParameter('since', description='ISO 8601 start (default: 7 days before until)', required=False,
+                             type=str),
+            OpenApiParameter('until', description='ISO 8601 end (default: now)', required=False, type=str),
+        ],
+        responses={200: AlertResponseTimesSerializer, 400: None},
+        tags=['Alerts'],
+    )
+    @action(detail=False, methods=['get'], url_path='response-times', pagination_class=None)
+    def response_times(self, request):
+        """GET endpoint for MTTA/MTTR per severity (alerts/history.py)"""
+        until = datetime_param(request, 'until') or timezone.now()
+        since = datetime_param(request, 'since') or until - timedelta(days=7)
+        if since >= until:
+            raise ValidationError({'since': ['Must be before until.']})
+        return Response(AlertResponseTimesSerializer({
+            'since': history.period_of(since),
+            'until': history.period_of(until) + timedelta(hours=1),
+            'severities': history.response_times(since, until),
+        }).data)
@@ -1,10 +1,21 @@
 from django.contrib import admin
-from .models import Event
+from .models import Event, SourceHealth
 
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
     list_display = ['event_type', 'source_name', 'severity', 'timestamp']
     list_filter = ['severity', 'timestamp', 'event_type']
-    search_fields = ['source_name', 'event_type', 'description']
+    # No LIKE scans over description; use GET /api/events/search/ to investigate
+    search_fields = ['source_name', 'event_type']
     readonly_fields = ['timestamp']
+    # Skip the unfiltered COUNT(*) over the whole table on every page
+    show_full_result_count = False
+
+
+@admin.register(SourceHealth)
+class SourceHealthAdmin(admin.ModelAdmin):
+    list_display = ['source_name', 'last_seen', 'last_event_type', 'high_count', 'critical_count']
+    search_fields = ['source_name']
+    # Maintained by ingestion (events/health.py)
+    readonly_fields = [field.name for field in SourceHealth._meta.fields]
@@ -0,0 +1,175 @@
+"""
+Bulk write helpers for high-volume paths (dataset generation, imports,
+syslog ingestion).
+
+Rows are written with ``cursor.executemany``, so no model instances are
+built and no model signals fire. Callers either give explicit primary keys
+(reserving id ranges with ``next_id`` and calling ``reset_sequences``
+afterwards), so they know the ids of related rows without reading them back,
+or leave ids to the database and have ``insert_rows`` return them.
+"""
+import functools
+
+from django.core.management.color import no_style
+from django.db import NotSupportedError, connection, models, transaction
+from django.db.models.functions import Concat
+
+from .fields import CompressedTextField
+from .models import Event
+
+
+def next_id(model):
+    """First unused primary key of ``model`` (ids above it are free to reserve)"""
+    return (model.objects.aggregate(max_id=models.Max('pk'))['max_id'] or 0) + 1
+
+
+def _column_adapters(model, field_names):
+    adapters = []
+    for name in field_names:
+        field = model._meta.get_field(name)
+        if isinstance(field, models.DateTimeField):
+            adapters.append(connection.ops.adapt_datetimefield_value)
+        elif isinstance(field, CompressedTextField):
+            # The real wrapper, not the ``connection`` proxy: this runs once per row
+            adapters.append(functools.partial(field.get_db_prep_value, connection=transaction.get_connection()))
+        else:
+            adapters.append(None)
+    return adapters
+
+
+def id_chunks(ids):
+    """Sorted ``ids`` in lists that fit in an IN clause on this backend"""
+    ids = sorted(ids)
+    chunk_size = min(connection.features.max_query_params or 2000, 2000) - 10
+    return [ids[start:start + chunk_size] for start in range(0, len(ids), chunk_size)]
+
+
+def insert_rows(model, field_names, rows, return_ids=False):
+    """
+    INSERT ``rows`` (tuples ordered like ``field_names``) into ``model``'s table
+    in one executemany, in a single transaction. Datetimes and compressed text
+    are converted to their column format; otherwise values are written as
+    given: auto_now/auto_now_add fields are not filled in.
+
+    With ``return_ids``, returns the ids the database gave the rows: the rows
+    are then written with multi-row INSERT ... RETURNING statements. Ids are
+    not assumed to be consecutive, since concurrent inserts (e.g. the API's)
+    can take ids in between.
+    """
+    meta = model._meta
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(meta.get_field(name).column) for name in field_names)
+    row_placeholders = f"({', '.join(['%s'] * len(field_names))})"
+    insert = f'INSERT INTO {quote(meta.db_table)} ({columns}) VALUES '
+
+    adapters = _column_adapters(model, field_names)
+    if any(adapters):
+        rows = [
+            tuple(adapt(value) if adapt and value is not None else value for adapt, value in zip(adapters, row))
+            for row in rows
+        ]
+    if not return_ids:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(insert + row_placeholders, rows)
+        return None
+
+    rows = list(rows)
+    ids = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.features.can_return_rows_from_bulk_insert:
+            batch_size = min(connection.ops.bulk_batch_size(field_names, rows), 1000)
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                values = ', '.join([row_placeholders] * len(batch))
+                cursor.execute(f'{insert}{values} RETURNING {quote(meta.pk.column)}',
+                               [value for row in batch for value in row])
+                ids.extend(row[0] for row in cursor.fetchall())
+        elif connection.vendor == 'sqlite':
+            # SQLite before 3.35 has no RETURNING, but it serializes writers: the
+            # rows of one transaction take consecutive ids
+            cursor.executemany(insert + row_placeholders, rows)
+            cursor.execute('SELECT last_insert_rowid()')  # cursor.lastrowid is not set by executemany()
+            last_id = cursor.fetchone()[0]
+            ids = list(range(last_id - len(rows) + 1, last_id + 1))
+        else:
+            raise NotSupportedError(f'{connection.display_name} cannot return the ids of inserted rows')
+    return ids
+
+
+def reset_sequences(*models_to_reset):
+    """Move auto-increment sequences past explicitly inserted ids (no-op on SQLite)"""
+    statements = connection.ops.sequence_reset_sql(no_style(), list(models_to_reset))
+    if statements:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+def create_alerts(event_ids, status='OPEN'):
+    """
+    Create the alerts for the events with ids in ``event_ids`` (the ones a
+    batch inserted, as returned by insert_rows) that trigger an active
+    alert rule and have none yet (as the post_save signal would), dated like
+    their event, after recording the watchlist indicators found in their
+    descriptions. New events are read back in chunks, in id
+    order, and matched with the compiled rules (counting threshold rules);
+    each chunk's alerts are written with one INSERT ... SELECT per severity
+    and title. Returns ``{severity: alerts created}``.
+
+    Only these ids are read: events saved meanwhile through the ORM (the API)
+    were already matched by the post_save signal, and sweeping them again
+    would record their indicators and count them in threshold windows twice.
+    """
+    from alerts.models import Alert, severity_rank  # alerts depends on events
+    from alerts.rules import get_matcher
+    from indicators.matching import get_matcher as get_indicator_matcher, record_matches
+
+    matcher = get_matcher()
+    indicator_matcher = get_indicator_matcher()
+    if not matcher and not indicator_matcher:
+        return {}
+    fields = ['pk', 'timestamp', 'source_name', 'event_type', 'severity']
+    if matcher.needs_description or indicator_matcher:
+        fields.append('description')  # Decompressed only when it is looked at
+
+    quote = connection.ops.quote_name
+    # Model fields first, then annotations: the order of the SELECT columns
+    columns = ', '.join(
+        quote(Alert._meta.get_field(name).column)
+        for name in ['severity', 'event', 'title', 'status', 'created_at', 'updated_at', 'severity_rank']
+    )
+    created = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Read and matched ids go into IN lists: stay under the backend's parameter limit
+        for chunk in id_chunks(event_ids):
+            rows = Event.objects.filter(pk__in=chunk).order_by('pk').values_list(*fields)
+            matched = {}
+            indicator_matches = []
+            for pk, timestamp, source_name, event_type, severity, *description in rows:
+                description = description[0] if description else ''
+                indicators = indicator_matcher.scan(description) if indicator_matcher else {}
+                if indicators:
+                    indicator_matches.append((pk, indicators))
+                rule = matcher.trigger(source_name, event_type, severity, description, timestamp.timestamp(),
+                                       bool(indicators))
+                if rule is not None:
+                    matched.setdefault((severity, rule.title_suffix), []).append(pk)
+            record_matches(indicator_matches)
+            for (severity, title_suffix), ids in matched.items():
+                selected = Event.objects.filter(pk__in=ids).exclude(
+                    models.Exists(Alert.objects.filter(event=models.OuterRef('pk'))),
+                ).order_by().annotate(
+                    alert_title=Concat(
+                        models.Value('Alert: '), 'event_type', models.Value(title_suffix),
+                        output_field=models.CharField(),
+                    ),
+                    alert_status=models.Value(status, output_field=models.CharField()),
+                    alert_created_at=models.F('timestamp'),
+                    alert_updated_at=models.F('timestamp'),
+                    alert_severity_rank=models.Value(severity_rank(severity), output_field=models.IntegerField()),
+                ).values_list('severity', 'pk', 'alert_title', 'alert_status', 'alert_created_at', 'alert_updated_at',
+                              'alert_severity_rank')
+                select_sql, params = selected.query.sql_with_params()
+                cursor.execute(f'INSERT INTO {quote(Alert._meta.db_table)} ({columns}) {select_sql}', params)
+                created[severity] = created.get(severity, 0) + cursor.rowcount
+    return created
@@ -0,0 +1,79 @@
+"""
+Model fields for large text columns.
+
+``CompressedTextField`` stores text in a binary column behind a one-byte
+marker: zlib-compressed when the UTF-8 text is at least
+settings.TEXT_COMPRESSION_MIN_BYTES long and compression actually saves
+space, raw UTF-8 otherwise. Models see plain ``str`` values. The stored
+bytes are opaque to SQL, so the column cannot be searched with LIKE or
+sliced with SUBSTR.
+"""
+import zlib
+
+from django import forms
+from django.conf import settings
+from django.core import validators
+from django.db import models
+
+RAW = b'\x00'
+ZLIB = b'\x01'
+COMPRESSION_LEVEL = 6
+
+
+def compress_text(text):
+    data = text.encode('utf-8')
+    min_bytes = getattr(settings, 'TEXT_COMPRESSION_MIN_BYTES', None)
+    if min_bytes is not None and len(data) >= min_bytes:
+        compressed = zlib.compress(data, COMPRESSION_LEVEL)
+        if len(compressed) < len(data):
+            return ZLIB + compressed
+    return RAW + data
+
+
+def decompress_text(value):
+    if isinstance(value, str):
+        return value  # Not written by this field (e.g. a raw SQL insert)
+    value = bytes(value)
+    if value[:1] == ZLIB:
+        return zlib.decompress(value[1:]).decode('utf-8')
+    return value[1:].decode('utf-8')
+
+
+class CompressedTextField(models.BinaryField):
+    description = 'Text, zlib-compressed when large'
+    empty_values = list(validators.EMPTY_VALUES)
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('editable', True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs.pop('editable', None)  # True is this field's default
+        if not self.editable:
+            kwargs['editable'] = False
+        return name, path, args, kwargs
+
+    def get_default(self):
+        return models.Field.get_default(self)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        return compress_text(str(value))
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        return decompress_text(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return decompress_text(value)
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
+
+    def formfield(self, **kwargs):
+        return models.Field.formfield(self, **{'widget': forms.Textarea, **kwargs})
@@ -0,0 +1,200 @@
+"""
+Per-source health: when each source was last seen, its event counts by
+severity and its last event type, kept in the SourceHealth table so that
+silent sources are found without a MAX(timestamp) over the events table.
+
+Once the ingesting transaction commits, its events are added to this
+process's ``HealthAccumulator``, an in-memory dict of one pending row per
+source (a rolled-back event is never counted). A background thread writes
+the pending rows every settings.SOURCE_HEALTH_FLUSH_INTERVAL seconds with
+one batched upsert, ``INSERT ... ON CONFLICT (source_name) DO UPDATE``,
+which adds the counts and keeps the later last-seen time whichever process
+writes first; what is still pending is written at exit. The table is
+therefore behind the events of every process by at most the interval
+(whether or not more events arrive), which does not matter for silence
+thresholds of minutes.
+
+Events are summarised by their own timestamp, so importing old events
+never moves a source's last-seen time back.
+"""
+import atexit
+import functools
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, connection, models, transaction
+
+from .models import Event, SourceHealth
+
+logger = logging.getLogger('events')
+
+SEVERITY_INDEX = {severity: index for index, (severity, _) in enumerate(Event.SEVERITY_CHOICES)}
+COLUMNS = ['source_name', 'first_seen', 'last_seen', 'last_event_type',
+           'low_count', 'medium_count', 'high_count', 'critical_count']
+
+
+class HealthAccumulator:
+    def __init__(self, interval):
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+    def add(self, source_name, event_type, severity, timestamp):
+        with self._lock:
+            row = self._pending.get(source_name)
+            if row is None:
+                # [first_seen, last_seen, last_event_type, LOW, MEDIUM, HIGH, CRITICAL]
+                row = self._pending[source_name] = [timestamp, timestamp, event_type, 0, 0, 0, 0]
+            elif timestamp >= row[1]:
+                row[1], row[2] = timestamp, event_type
+            elif timestamp < row[0]:
+                row[0] = timestamp
+            row[3 + SEVERITY_INDEX[severity]] += 1
+
+    def __len__(self):
+        return len(self._pending)
+
+    def flush(self):
+        """Upsert the pending rows; on a database error they are kept for the next flush"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            upsert(pending)
+        except DatabaseError:
+            logger.warning('Writing source health failed', extra={'sources': len(pending)}, exc_info=True)
+            with self._lock:
+                for source_name, row in pending.items():
+                    current = self._pending.get(source_name)
+                    if current is not None:
+                        row = _merge_rows(row, current)
+                    self._pending[source_name] = row
+            return 0
+        return len(pending)
+
+    def start_flusher(self):
+        """Flush every ``interval`` seconds from a background thread, and at exit"""
+        def run():
+            while not self._closed.wait(self.interval):
+                if self._pending:
+                    _flush_quietly(self)
+                    connection.close()  # This thread's own connection
+
+        threading.Thread(target=run, name='source-health-flusher', daemon=True).start()
+        atexit.register(lambda: self._closed.is_set() or _flush_quietly(self))
+
+    def close(self):
+        self._closed.set()
+
+
+def _merge_rows(older, newer):
+    first_seen = min(older[0], newer[0])
+    last_seen, last_event_type = (newer[1], newer[2]) if newer[1] >= older[1] else (older[1], older[2])
+    return [first_seen, last_seen, last_event_type, *(a + b for a, b in zip(older[3:], newer[3:]))]
+
+
+def upsert(pending):
+    """Add ``{source_name: row}`` accumulator rows to SourceHealth in one executemany"""
+    quote = connection.ops.quote_name
+    table = quote(SourceHealth._meta.db_table)
+    first_seen, last_seen, last_event_type = (quote(name) for name in COLUMNS[1:4])
+
+    def later(column, value):
+        return f'CASE WHEN excluded.{last_seen} >= {table}.{last_seen} THEN {value} ELSE {table}.{column} END'
+
+    updates = [
+        f'{first_seen} = CASE WHEN excluded.{first_seen} < {table}.{first_seen} '
+        f'THEN excluded.{first_seen} ELSE {table}.{first_seen} END',
+        f'{last_seen} = {later(last_seen, f"excluded.{last_seen}")}',
+        f'{last_event_type} = {later(last_event_type, f"excluded.{last_event_type}")}',
+        *(f'{quote(name)} = {table}.{quote(name)} + excluded.{quote(name)}' for name in COLUMNS[4:]),
+    ]
+    # Supported by SQLite (3.24+) and PostgreSQL
+    sql = (
+        f'INSERT INTO {table} ({", ".join(quote(name) for name in COLUMNS)}) '
+        f'VALUES ({", ".join(["%s"] * len(COLUMNS))}) '
+        f'ON CONFLICT ({quote(COLUMNS[0])}) DO UPDATE SET {", ".join(updates)}'
+    )
+    adapt = connection.ops.adapt_datetimefield_value
+    rows = [
+        (source_name, adapt(row[0]), adapt(row[1]), *row[2:])
+        for source_name, row in sorted(pending.items())  # One lock order for concurrent writers
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def rebuild():
+    """Recompute SourceHealth from the events table (for bulk writers that bypass the accumulator)"""
+    last_event_type = models.Subquery(
+        Event.objects.filter(source_name=models.OuterRef('source_name'))
+        .order_by('-timestamp', '-id').values('event_type')[:1]
+    )
+    counts = {
+        f'{severity.lower()}_count': models.Count('id', filter=models.Q(severity=severity))
+        for severity in SEVERITY_INDEX
+    }
+    summaries = Event.objects.order_by().values('source_name').annotate(
+        first_seen=models.Min('timestamp'), last_seen=models.Max('timestamp'), **counts,
+    ).annotate(last_event_type=last_event_type)
+    with transaction.atomic():
+        SourceHealth.objects.all().delete()
+        SourceHealth.objects.bulk_create(
+            (SourceHealth(**summary) for summary in summaries.iterator(chunk_size=2000)), batch_size=500,
+        )
+
+
+_lock = threading.Lock()
+_accumulator = None
+
+
+def get_accumulator():
+    global _accumulator
+    if _accumulator is not None:
+        return _accumulator
+    with _lock:
+        if _accumulator is None:
+            _accumulator = HealthAccumulator(settings.SOURCE_HEALTH_FLUSH_INTERVAL)
+            _accumulator.start_flusher()
+        return _accumulator
+
+
+def _flush_quietly(accumulator):
+    try:
+        accumulator.flush()
+    except Exception:
+        logger.warning('Writing source health failed', exc_info=True)
+
+
+def record_event(source_name, event_type, severity, timestamp):
+    """Add one event once the current transaction commits"""
+    transaction.on_commit(functools.partial(get_accumulator().add, source_name, event_type, severity, timestamp))
+
+
+def record_rows(rows):
+    """Add ``(source_name, event_type, severity, timestamp)`` rows written in bulk, once committed"""
+    rows = list(rows)
+
+    def add():
+        accumulator = get_accumulator()
+        for source_name, event_type, severity, timestamp in rows:
+            accumulator.add(source_name, event_type, severity, timestamp)
+
+    transaction.on_commit(add)
+
+
+def flush():
+    """Write this process's pending rows now (before answering from the table)"""
+    return get_accumulator().flush()
+
+
+def reset_accumulator():
+    """Forget the pending rows and stop their flusher (tests)"""
+    global _accumulator
+    with _lock:
+        if _accumulator is not None:
+            _accumulator.close()
+        _accumulator = None
@@ -0,0 +1,104 @@
+"""
+Idempotent event ingestion.
+
+A client that may retry (after a timeout, say) sends an ``Idempotency-Key``
+header, or a ``client_id`` field in the event, unique per event. The key is
+stored with the event under a unique index, so a retry can never create a
+second event, nor a second alert; instead it gets the original event back.
+
+Each process also remembers the keys it has seen, so that most requests
+need no extra query:
+
+- an LRU of the responses to the last settings.IDEMPOTENCY_CACHE_SIZE keys
+  answers a retry without touching the database;
+- a Bloom filter of the keys written or replayed by this process
+  (settings.IDEMPOTENCY_FILTER_CAPACITY keys per generation, two
+  generations kept) tells new keys apart: a key it has certainly not seen
+  is inserted directly, and only a key it may have seen is looked up
+  first. A key first sent to another process is caught by the unique
+  index and looked up then.
+"""
+import collections
+import re
+import threading
+from collections.abc import Mapping
+
+from django.conf import settings
+
+from monitoring.sketches import BloomFilter
+
+from .models import Event
+
+HEADER = 'Idempotency-Key'
+FIELD = 'client_id'
+MAX_LENGTH = Event._meta.get_field('idempotency_key').max_length
+_VALID_KEY = re.compile(r'[\x21-\x7e]+')  # Visible ASCII
+
+
+def get_key(request):
+    """The request's idempotency key -> (key or None, error message or None)"""
+    key = request.headers.get(HEADER)
+    name = HEADER
+    if key is None and isinstance(request.data, Mapping):
+        key, name = request.data.get(FIELD), FIELD
+    if key is None or key == '':
+        return None, None
+    if not isinstance(key, str) or len(key) > MAX_LENGTH or not _VALID_KEY.fullmatch(key):
+        return None, f'{name} must be 1 to {MAX_LENGTH} visible ASCII characters.'
+    return key, None
+
+
+class RecentKeys:
+    def __init__(self, cache_size, filter_capacity, error_rate):
+        self.cache_size = cache_size
+        self.filter_capacity = filter_capacity
+        self.error_rate = error_rate
+        self._responses = collections.OrderedDict()
+        self._filter = BloomFilter(filter_capacity, error_rate)
+        self._previous = None
+        self._lock = threading.Lock()
+
+    def response(self, key):
+        """The cached response data for ``key``, or None"""
+        with self._lock:
+            data = self._responses.get(key)
+            if data is not None:
+                self._responses.move_to_end(key)
+            return data
+
+    def may_exist(self, key):
+        """False when this process has certainly not seen ``key``"""
+        return key in self._filter or (self._previous is not None and key in self._previous)
+
+    def remember(self, key, data):
+        with self._lock:
+            if self._filter.full:
+                # A new generation bounds memory; keys older than two generations fall
+                # back to the unique index
+                self._previous, self._filter = self._filter, BloomFilter(self.filter_capacity, self.error_rate)
+            self._filter.add(key)
+            self._responses[key] = data
+            self._responses.move_to_end(key)
+            if len(self._responses) > self.cache_size:
+                self._responses.popitem(last=False)
+
+
+_lock = threading.Lock()
+_recent = None
+
+
+def get_recent_keys():
+    global _recent
+    if _recent is None:
+        with _lock:
+            if _recent is None:
+                _recent = RecentKeys(settings.IDEMPOTENCY_CACHE_SIZE, settings.IDEMPOTENCY_FILTER_CAPACITY,
+                                     settings.IDEMPOTENCY_FILTER_ERROR_RATE)
+    return _recent
+
+
+def reset_recent_keys():
+    """Forget the keys seen (tests)"""
+    global _recent
+    with _lock:
+        _recent = None
@@ -0,0 +1,243 @@
+import itertools
+import multiprocessing
+import random
+import time
+from datetime import timedelta
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils import timezone
+
+from alerts import history
+from alerts.models import Alert, severity_rank
+from alerts.rules import get_matcher
+from events import health
+from events.bulk import insert_rows, next_id, reset_sequences
+from events.models import Event
+
+SOURCE_KINDS = ['fw', 'ids', 'edr', 'waf', 'vpn', 'mail-gw', 'dns', 'proxy', 'ad', 'nac']
+SITES = ['nyc', 'lon', 'fra', 'sgp', 'syd', 'sfo', 'tor', 'ams']
+EVENT_TYPES = [
+    'Failed Login', 'Port Scan', 'Intrusion Attempt', 'Malware Detected', 'Policy Violation',
+    'Brute Force', 'Privilege Escalation', 'Suspicious DNS Query', 'Data Exfiltration', 'Phishing Email',
+    'Blocked Connection', 'Account Lockout', 'Ransomware Behavior', 'Lateral Movement', 'C2 Beacon',
+    'SQL Injection', 'XSS Attempt', 'Unauthorized Access', 'Certificate Error', 'Config Change',
+    'New Admin Account', 'USB Device Connected', 'Anomalous Traffic', 'Tor Exit Node', 'Credential Dump',
+    'File Integrity Change', 'Service Stopped', 'VPN Login', 'Geo Anomaly', 'DDoS Attempt',
+]
+DESCRIPTIONS = [
+    'Connection from {ip} to {ip2}:{port} denied by rule {rule}',
+    'Failed login for user {user} from {ip} ({n} attempts)',
+    'Signature {sig} matched on {ip} in process {proc}',
+    'Outbound transfer of {n} MB from {ip} to {ip2}',
+    'Scan from {ip} across {n} ports on {ip2}',
+    'User {user} performed {proc} on host {ip}',
+]
+SEVERITY_WEIGHTS = {'LOW': 55, 'MEDIUM': 28, 'HIGH': 13, 'CRITICAL': 4}
+# Relative event volume per hour of day (UTC): quiet nights, busy office hours
+HOUR_WEIGHTS = [2, 1, 1, 1, 1, 2, 4, 7, 10, 12, 12, 11, 10, 11, 12, 12, 11, 9, 7, 5, 4, 3, 3, 2]
+EVENT_FIELDS = ['id', 'source_name', 'event_type', 'severity', 'description', 'timestamp']
+ALERT_FIELDS = ['title', 'severity', 'status', 'event', 'created_at', 'updated_at', 'acknowledged_at', 'resolved_at',
+                'severity_rank']
+
+
+def zipf_cum_weights(n, exponent=1.2):
+    """Cumulative weights where item k has weight 1/k^exponent (a few items dominate)"""
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+def parse_mix(value, allowed):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip().upper()
+        if name not in allowed:
+            raise CommandError(f'Unknown value "{name}" in mix. Expected one of: {", ".join(allowed)}.')
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError(f'Invalid mix entry: "{part}". Expected NAME=WEIGHT.')
+    return mix
+
+
+def _random_ip(rng):
+    return f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}'
+
+
+def _description(rng):
+    return rng.choice(DESCRIPTIONS).format(
+        ip=_random_ip(rng), ip2=_random_ip(rng), port=rng.randint(1, 65535), rule=rng.randint(100, 999),
+        user=f'user{rng.randint(1, 5000):04d}', n=rng.randint(2, 500), sig=f'SIG-{rng.randint(1000, 9999)}',
+        proc=rng.choice(['powershell.exe', 'cmd.exe', 'sshd', 'rundll32.exe', 'curl', 'sudo']),
+    )
+
+
+def generate_chunk(task):
+    """
+    Generate and insert one chunk of events (ids ``first_id`` onwards) plus the
+    alerts for its events that match an alert rule (threshold rules, which
+    need events in time order, are left out). Runs in a worker process when
+    ``--workers`` > 1. Returns (events inserted, alerts inserted).
+    """
+    first_id, count, seed, config = task
+    rng = random.Random(seed)
+    sources, event_types = config['sources'], config['event_types']
+    severities, severity_weights = zip(*config['severity_weights'].items())
+    statuses, status_weights = zip(*config['status_mix'].items())
+    end, span_days = config['end'], config['days']
+    matcher = get_matcher()
+
+    picked_sources = rng.choices(sources, cum_weights=config['source_weights'], k=count)
+    picked_types = rng.choices(event_types, cum_weights=config['type_weights'], k=count)
+    picked_severities = rng.choices(severities, weights=severity_weights, k=count)
+    picked_days = [rng.randrange(span_days) for _ in range(count)]
+    picked_hours = rng.choices(range(24), weights=HOUR_WEIGHTS, k=count)
+
+    events, alerts = [], []
+    for offset in range(count):
+        day_start = (end - timedelta(days=picked_days[offset] + 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        timestamp = day_start + timedelta(hours=picked_hours[offset], seconds=rng.randrange(3600),
+                                          microseconds=rng.randrange(1000000))
+        if timestamp > end:
+            timestamp = end
+        event_type, severity = picked_types[offset], picked_severities[offset]
+        description = _description(rng)
+        event_id = first_id + offset
+        events.append((event_id, picked_sources[offset], event_type, severity, description, timestamp))
+        if matcher.matches(picked_sources[offset], event_type, severity, description):
+            status = rng.choices(statuses, weights=status_weights)[0]
+            updated_at = timestamp if status == 'OPEN' else timestamp + timedelta(minutes=rng.randint(1, 2880))
+            updated_at = min(updated_at, end)
+            acknowledged_at = None if status == 'OPEN' else updated_at
+            resolved_at = updated_at if status == 'RESOLVED' else None
+            alerts.append((f'Alert: {event_type}', severity, status, event_id, timestamp, updated_at,
+                           acknowledged_at, resolved_at, severity_rank(severity)))
+
+    insert_rows(Event, EVENT_FIELDS, events)
+    if alerts:
+        insert_rows(Alert, ALERT_FIELDS, alerts)
+    return len(events), len(alerts)
+
+
+def _init_worker():
+    if not apps.ready:
+        # Spawned (not forked) workers start without a configured Django
+        django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Generates N synthetic events with realistic skew, plus alerts in mixed statuses, using bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help='Number of events to generate')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='Events per bulk insert transaction (default: 10000)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Parallel worker processes (default: 1). Best with PostgreSQL; SQLite serializes writers.',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Spread timestamps over this many past days (default: 30)',
+        )
+        parser.add_argument(
+            '--sources',
+            type=int,
+            default=200,
+            help='Number of distinct source names, Zipf-distributed (default: 200)',
+        )
+        parser.add_argument(
+            '--event-types',
+            type=int,
+            default=len(EVENT_TYPES),
+            help=f'Number of distinct event types, Zipf-distributed (max/default: {len(EVENT_TYPES)})',
+        )
+        parser.add_argument(
+            '--alert-status-mix',
+            type=str,
+            default='OPEN=20,ACKNOWLEDGED=25,RESOLVED=55',
+            help='Status distribution of generated alerts (default: OPEN=20,ACKNOWLEDGED=25,RESOLVED=55)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed (default: 42)',
+        )
+
+    def handle(self, *args, **options):
+        count, chunk_size, workers = options['count'], options['chunk_size'], options['workers']
+        if count < 1 or chunk_size < 1 or workers < 1 or options['days'] < 1:
+            raise CommandError('count, --chunk-size, --workers and --days must be positive')
+        n_types = min(max(options['event_types'], 1), len(EVENT_TYPES))
+        rng = random.Random(options['seed'])
+
+        sources = [
+            f'{rng.choice(SOURCE_KINDS)}-{rng.choice(SITES)}-{index:03d}'
+            for index in range(1, max(options['sources'], 1) + 1)
+        ]
+        config = {
+            'sources': sources,
+            'source_weights': zipf_cum_weights(len(sources)),
+            'event_types': EVENT_TYPES[:n_types],
+            'type_weights': zipf_cum_weights(n_types),
+            'severity_weights': SEVERITY_WEIGHTS,
+            'status_mix': parse_mix(options['alert_status_mix'], [choice[0] for choice in Alert.STATUS_CHOICES]),
+            'end': timezone.now(),
+            'days': options['days'],
+        }
+
+        first_id = next_id(Event)
+        tasks = [
+            (first_id + start, min(chunk_size, count - start), options['seed'] + start // chunk_size + 1, config)
+            for start in range(0, count, chunk_size)
+        ]
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite allows one writer at a time; workers will mostly wait.'))
+
+        self.stdout.write(f'Generating {count} events in {len(tasks)} chunk(s) with {workers} worker(s)...')
+        started = time.perf_counter()
+        events_done = alerts_done = 0
+        if workers > 1:
+            # Forked workers must not share the parent's database connection
+            connections.close_all()
+            with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+                results = pool.imap_unordered(generate_chunk, tasks)
+                for events_done, alerts_done in self._progress(results, count, started):
+                    pass
+        else:
+            for events_done, alerts_done in self._progress(map(generate_chunk, tasks), count, started):
+                pass
+
+        reset_sequences(Event, Alert)
+        # Generated events bypass the source health accumulator (and are spread over the past)
+        health.rebuild()
+        # Nor are generated alerts counted in the response-time histograms
+        history.rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {events_done} events and {alerts_done} alerts in {elapsed:.1f}s '
+            f'({events_done / elapsed:,.0f} events/s)'
+        ))
+
+    def _progress(self, results, total, started):
+        events_done = alerts_done = 0
+        for events, alerts in results:
+            events_done += events
+            alerts_done += alerts
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'  {events_done}/{total} events ({events_done / elapsed:,.0f}/s), {alerts_done} alerts'
+            )
+            yield events_done, alerts_done
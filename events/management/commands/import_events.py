@@ -0,0 +1,282 @@
+import array
+import csv
+import gzip
+import itertools
+import json
+import multiprocessing
+import time
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from alerts.models import Alert
+from events.bulk import create_alerts, insert_rows
+from events.models import Event
+from events import health
+from events.stats import record_rows
+from events.validation import validate_event_payload
+from threat_monitor.renderers import orjson
+
+FORMATS = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'jsonl', '.csv': 'csv'}
+EVENT_FIELDS = ['source_name', 'event_type', 'severity', 'description', 'timestamp']
+ERRORS_SHOWN = 20
+
+
+def detect_format(path):
+    suffixes = [suffix.lower() for suffix in Path(path).suffixes]
+    if suffixes and suffixes[-1] == '.gz':
+        suffixes.pop()
+    if not suffixes or suffixes[-1] not in FORMATS:
+        raise CommandError(f'Cannot tell the format of "{path}"; use --format jsonl or --format csv.')
+    return FORMATS[suffixes[-1]]
+
+
+def _open(path):
+    if str(path).lower().endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_records(path, file_format):
+    """
+    Yield ``(line number, raw record)`` from ``path`` without parsing it. A CSV
+    record can span several lines (quoted newlines); lines are joined until
+    the double quotes balance. The CSV header is yielded as line 1.
+    """
+    with _open(path) as handle:
+        if file_format == 'jsonl':
+            for line_number, line in enumerate(handle, 1):
+                if line.strip():
+                    yield line_number, line
+            return
+        pending, start, quotes = [], 0, 0
+        for line_number, line in enumerate(handle, 1):
+            if not pending:
+                start = line_number
+            pending.append(line)
+            quotes += line.count('"')
+            if quotes % 2 == 0:
+                record = ''.join(pending)
+                pending, quotes = [], 0
+                if record.strip():
+                    yield start, record
+        if pending:
+            yield start, ''.join(pending)
+
+
+def parse_timestamp(value):
+    """ISO 8601 string or Unix epoch seconds -> aware datetime (naive values are UTC); ValueError otherwise"""
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError
+    value = value.strip()
+    try:
+        return datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+    except ValueError:
+        pass
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def _loads(line):
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+
+def _decode_jsonl(records):
+    for line_number, line in records:
+        try:
+            yield line_number, _loads(line), None
+        except ValueError as exc:
+            yield line_number, None, f'Invalid JSON: {exc}'
+
+
+def _decode_csv(records, header):
+    for line_number, record in records:
+        try:
+            values = next(csv.reader([record]))
+        except (csv.Error, StopIteration) as exc:
+            yield line_number, None, f'Invalid CSV: {exc}'
+            continue
+        if len(values) != len(header):
+            yield line_number, None, f'Expected {len(header)} columns, found {len(values)}.'
+            continue
+        yield line_number, dict(zip(header, values)), None
+
+
+def parse_chunk(task):
+    """
+    Parse and validate one chunk of raw records with the EventSerializer rules
+    (``validate_event_payload``) plus a required ``timestamp``. Runs in a
+    worker process when ``--workers`` > 1 and never touches the database.
+    Returns (event rows ordered like EVENT_FIELDS, [(line number, error)]).
+    """
+    file_format, header, records = task
+    if file_format == 'jsonl':
+        decoded = _decode_jsonl(records)
+    else:
+        decoded = _decode_csv(records, header)
+
+    rows, errors = [], []
+    for line_number, payload, error in decoded:
+        if error is not None:
+            errors.append((line_number, error))
+            continue
+        validated, field_errors = validate_event_payload(payload)
+        if field_errors:
+            errors.append((line_number, '; '.join(
+                f'{name}: {" ".join(str(message) for message in messages)}'
+                for name, messages in field_errors.items()
+            )))
+            continue
+        raw_timestamp = payload.get('timestamp')
+        try:
+            timestamp = parse_timestamp(raw_timestamp)
+        except (ValueError, OverflowError, OSError):
+            if raw_timestamp is None or raw_timestamp == '':
+                errors.append((line_number, 'timestamp: This field is required.'))
+            else:
+                errors.append((line_number, f'timestamp: Expected an ISO 8601 datetime or Unix seconds. '
+                                            f'Received: "{raw_timestamp}".'))
+            continue
+        rows.append((validated['source_name'], validated['event_type'], validated['severity'],
+                     validated['description'], timestamp))
+    return rows, errors
+
+
+def _init_worker():
+    if not apps.ready:
+        # Spawned (not forked) workers start without a configured Django
+        django.setup()
+    # Workers only parse; the inherited database connection is left alone
+    # (closing it here would close the parent's PostgreSQL session too)
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports historical events from JSONL/CSV exports (optionally gzipped), keeping their '
+        'timestamps. Parsing runs in parallel; rows are bulk inserted, then alerts are created in one pass.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='JSONL or CSV files (.gz allowed)')
+        parser.add_argument(
+            '--format',
+            choices=['jsonl', 'csv'],
+            help='Input format (default: from each file extension)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=min(multiprocessing.cpu_count(), 4),
+            help='Parallel parsing processes (default: CPU count, at most 4)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='Records per parsing task and bulk insert transaction (default: 10000)',
+        )
+        parser.add_argument(
+            '--alert-status',
+            choices=[choice[0] for choice in Alert.STATUS_CHOICES],
+            default='OPEN',
+            help='Status of alerts created for imported events that match an alert rule (default: OPEN)',
+        )
+        parser.add_argument(
+            '--no-alerts',
+            action='store_true',
+            help='Do not create alerts for the imported events',
+        )
+        parser.add_argument(
+            '--errors-file',
+            type=str,
+            help='Write every rejected record as a JSON line {"file", "line", "error"}',
+        )
+
+    def handle(self, *args, **options):
+        workers, chunk_size = options['workers'], options['chunk_size']
+        if workers < 1 or chunk_size < 1:
+            raise CommandError('--workers and --chunk-size must be positive')
+        files = []
+        for path in options['paths']:
+            if not Path(path).is_file():
+                raise CommandError(f'File not found: "{path}"')
+            files.append((path, options['format'] or detect_format(path)))
+
+        # Ids are left to the database, so API ingestion can continue during the import:
+        # alerts are then created for the ids of the imported events only
+        event_ids = array.array('q')
+        errors_file = open(options['errors_file'], 'w', encoding='utf-8') if options['errors_file'] else None
+        pool = multiprocessing.Pool(workers, initializer=_init_worker) if workers > 1 else None
+        self.stdout.write(f'Importing {len(files)} file(s) with {workers} parsing worker(s)...')
+        started = time.perf_counter()
+        imported = rejected = 0
+        try:
+            for path, file_format in files:
+                tasks = self._tasks(path, file_format, chunk_size)
+                results = pool.imap(parse_chunk, tasks) if pool else map(parse_chunk, tasks)
+                for rows, errors in results:
+                    # The parent is the only writer; workers parse the next chunks meanwhile
+                    if rows:
+                        event_ids.extend(insert_rows(Event, EVENT_FIELDS, rows, return_ids=True))
+                        # Only events within the last EVENT_STATS_WINDOWS windows are counted
+                        record_rows((row[0], row[1], row[4]) for row in rows)
+                        health.record_rows((row[0], row[1], row[2], row[4]) for row in rows)
+                    imported += len(rows)
+                    for line_number, error in errors:
+                        rejected += 1
+                        if rejected <= ERRORS_SHOWN:
+                            self.stderr.write(f'  {path}:{line_number}: {error}')
+                        if errors_file:
+                            errors_file.write(json.dumps({'file': path, 'line': line_number, 'error': error}) + '\n')
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f'  {imported} events ({imported / elapsed:,.0f}/s), {rejected} rejected'
+                    )
+        finally:
+            if pool:
+                pool.terminate()
+            if errors_file:
+                errors_file.close()
+        health.flush()
+        if rejected > ERRORS_SHOWN:
+            self.stderr.write(f'  ... {rejected - ERRORS_SHOWN} more rejected records')
+
+        alerts = 0
+        if imported and not options['no_alerts']:
+            alert_started = time.perf_counter()
+            alerts = sum(create_alerts(event_ids, options['alert_status']).values())
+            self.stdout.write(f'  {alerts} alerts created in {time.perf_counter() - alert_started:.1f}s')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} events ({rejected} rejected) and created {alerts} alerts in {elapsed:.1f}s '
+            f'({imported / elapsed:,.0f} events/s)'
+        ))
+
+    def _tasks(self, path, file_format, chunk_size):
+        """Parsing tasks for ``path``; a CSV header is checked here, before any task runs"""
+        records = read_records(path, file_format)
+        header = None
+        if file_format == 'csv':
+            first = next(records, None)
+            if first is None:
+                return iter(())
+            header = [name.strip() for name in next(csv.reader([first[1]]))]
+            missing = [name for name in EVENT_FIELDS if name not in header]
+            if missing:
+                raise CommandError(f'{path}: CSV header is missing column(s): {", ".join(missing)}')
+        chunks = iter(lambda: list(itertools.islice(records, chunk_size)), [])
+        return ((file_format, header, chunk) for chunk in chunks)
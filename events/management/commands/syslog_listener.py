@@ -0,0 +1,122 @@
+import asyncio
+import json
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from events.syslog import SyslogMapper, SyslogServer
+from monitoring import metrics
+
+
+class Command(BaseCommand):
+    help = 'Receives syslog (RFC 3164/5424) over UDP and TCP and stores the messages as events'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--host',
+            default=settings.SYSLOG_HOST,
+            help=f'Address to listen on (default: {settings.SYSLOG_HOST})',
+        )
+        parser.add_argument(
+            '--udp-port',
+            type=int,
+            default=settings.SYSLOG_UDP_PORT,
+            help=f'UDP port (default: {settings.SYSLOG_UDP_PORT})',
+        )
+        parser.add_argument(
+            '--tcp-port',
+            type=int,
+            default=settings.SYSLOG_TCP_PORT,
+            help=f'TCP port (default: {settings.SYSLOG_TCP_PORT})',
+        )
+        parser.add_argument('--no-udp', action='store_true', help='Do not listen on UDP')
+        parser.add_argument('--no-tcp', action='store_true', help='Do not listen on TCP')
+        parser.add_argument(
+            '--rules',
+            type=str,
+            help='JSON file with a list of mapping rules (default: settings.SYSLOG_RULES)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.SYSLOG_BATCH_SIZE,
+            help=f'Events per insert transaction (default: {settings.SYSLOG_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--flush-interval',
+            type=float,
+            default=settings.SYSLOG_FLUSH_INTERVAL,
+            help=f'Seconds a partial batch may wait (default: {settings.SYSLOG_FLUSH_INTERVAL})',
+        )
+        parser.add_argument(
+            '--stats-interval',
+            type=float,
+            default=10,
+            help='Seconds between counter summaries, 0 to disable (default: 10)',
+        )
+
+    def handle(self, *args, **options):
+        if options['no_udp'] and options['no_tcp']:
+            raise CommandError('--no-udp and --no-tcp leave nothing to listen on')
+        if options['batch_size'] < 1 or options['flush_interval'] <= 0:
+            raise CommandError('--batch-size and --flush-interval must be positive')
+        rules = settings.SYSLOG_RULES
+        if options['rules']:
+            try:
+                with open(options['rules'], encoding='utf-8') as handle:
+                    rules = json.load(handle)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Cannot read rules from "{options["rules"]}": {exc}')
+        try:
+            mapper = SyslogMapper(rules)
+        except (TypeError, ValueError) as exc:
+            raise CommandError(f'Invalid syslog rule: {exc}')
+
+        # Counters reach /metrics when METRICS_DIR is shared with the web workers
+        metrics.REGISTRY.ensure_flusher()
+        asyncio.run(self._serve(mapper, options))
+
+    async def _serve(self, mapper, options):
+        server = SyslogServer(
+            mapper,
+            batch_size=options['batch_size'],
+            flush_interval=options['flush_interval'],
+            queue_size=settings.SYSLOG_QUEUE_SIZE,
+            max_message_size=settings.SYSLOG_MAX_MESSAGE_SIZE,
+        )
+        try:
+            await server.start(
+                options['host'],
+                udp_port=None if options['no_udp'] else options['udp_port'],
+                tcp_port=None if options['no_tcp'] else options['tcp_port'],
+            )
+        except OSError as exc:
+            raise CommandError(f'Cannot listen on {options["host"]}: {exc}')
+        listening = [f'{name} {address[0]}:{address[1]}' for name, address in
+                     (('UDP', server.udp_address), ('TCP', server.tcp_address)) if address]
+        self.stdout.write(f'Listening for syslog on {", ".join(listening)} (Ctrl+C to stop)')
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        interval = options['stats_interval']
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), interval if interval > 0 else None)
+            except asyncio.TimeoutError:
+                self._write_stats(server.stats)
+
+        self.stdout.write('Stopping; writing queued messages...')
+        await server.stop()
+        self._write_stats(server.stats)
+
+    def _write_stats(self, stats):
+        dropped = ', '.join(
+            f'{key[len("dropped_"):]}={count}' for key, count in sorted(stats.items()) if key.startswith('dropped_')
+        )
+        self.stdout.write(
+            f'  {stats["received"]} received, {stats["events"]} events, {stats["alerts"]} alerts, '
+            f'dropped: {dropped or "none"}'
+        )
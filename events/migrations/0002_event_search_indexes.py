@@ -0,0 +1,29 @@
+# Generated by Django 4.2.1 on 2026-10-19 07:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['timestamp', 'id'], name='event_timestamp_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['source_name', 'timestamp', 'id'], name='event_source_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['event_type', 'timestamp', 'id'], name='event_type_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['severity', 'timestamp', 'id'], name='event_severity_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+from django.db import migrations, models
+
+import events.fields
+
+BATCH_SIZE = 2000
+
+
+def _copy(apps, source, target):
+    Event = apps.get_model('events', 'Event')
+    last_pk = 0
+    while True:
+        batch = list(Event.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', source)[:BATCH_SIZE])
+        if not batch:
+            return
+        for event in batch:
+            setattr(event, target, getattr(event, source))
+        Event.objects.bulk_update(batch, [target])
+        last_pk = batch[-1].pk
+
+
+def compress_descriptions(apps, schema_editor):
+    _copy(apps, 'description', 'description_data')
+
+
+def restore_descriptions(apps, schema_editor):
+    _copy(apps, 'description_data', 'description')
+
+
+class Migration(migrations.Migration):
+    """
+    Move Event.description into a CompressedTextField. The text is copied
+    into a new column (in primary-key batches) rather than altered in place,
+    so no database has to cast text to binary.
+    """
+
+    dependencies = [
+        ('events', '0002_event_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='description_data',
+            field=events.fields.CompressedTextField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='description',
+            field=models.TextField(null=True),
+        ),
+        migrations.RunPython(compress_descriptions, restore_descriptions),
+        migrations.RemoveField(
+            model_name='event',
+            name='description',
+        ),
+        migrations.RenameField(
+            model_name='event',
+            old_name='description_data',
+            new_name='description',
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='description',
+            field=events.fields.CompressedTextField(),
+        ),
+    ]
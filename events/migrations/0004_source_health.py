@@ -0,0 +1,55 @@
+# Generated by Django 4.2.1 on 2026-10-19 08:07
+
+from django.db import migrations, models
+
+SEVERITIES = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+
+
+def backfill(apps, schema_editor):
+    """One summary row per source of the existing events"""
+    Event = apps.get_model('events', 'Event')
+    SourceHealth = apps.get_model('events', 'SourceHealth')
+    last_event_type = models.Subquery(
+        Event.objects.filter(source_name=models.OuterRef('source_name'))
+        .order_by('-timestamp', '-id').values('event_type')[:1]
+    )
+    counts = {
+        f'{severity.lower()}_count': models.Count('id', filter=models.Q(severity=severity))
+        for severity in SEVERITIES
+    }
+    summaries = Event.objects.order_by().values('source_name').annotate(
+        first_seen=models.Min('timestamp'), last_seen=models.Max('timestamp'), **counts,
+    ).annotate(last_event_type=last_event_type)
+    SourceHealth.objects.bulk_create(
+        (SourceHealth(**summary) for summary in summaries.iterator(chunk_size=2000)), batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+    """Add the per-source health table, filled from the existing events"""
+
+    dependencies = [
+        ('events', '0003_compress_event_description'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceHealth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_name', models.CharField(max_length=200, unique=True)),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField(db_index=True)),
+                ('last_event_type', models.CharField(max_length=200)),
+                ('low_count', models.PositiveBigIntegerField(default=0)),
+                ('medium_count', models.PositiveBigIntegerField(default=0)),
+                ('high_count', models.PositiveBigIntegerField(default=0)),
+                ('critical_count', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'source health',
+                'ordering': ['last_seen'],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
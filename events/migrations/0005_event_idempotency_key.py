@@ -0,0 +1,18 @@
+# Generated by Django 4.2.1 on 2026-10-19 08:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_source_health'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=200, null=True, unique=True),
+        ),
+    ]
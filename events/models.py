@@ -1,4 +1,5 @@
 from django.db import models
+from .fields import CompressedTextField
 
 
 class Event(models.Model):
@@ -12,11 +13,50 @@ class Event(models.Model):
     source_name = models.CharField(max_length=200)
     event_type = models.CharField(max_length=200)
     severity = models.CharField(max_length=10, choices=SEVERITY_CHOICES)
-    description = models.TextField()
+    description = CompressedTextField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Client-supplied key (Idempotency-Key header or client_id): a retried submission returns this event
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ['-timestamp']
+        # Event search filters on one column and pages by (timestamp, id); each
+        # index serves a filter plus the keyset order as one range scan
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='event_timestamp_id_idx'),
+            models.Index(fields=['source_name', 'timestamp', 'id'], name='event_source_timestamp_idx'),
+            models.Index(fields=['event_type', 'timestamp', 'id'], name='event_type_timestamp_idx'),
+            models.Index(fields=['severity', 'timestamp', 'id'], name='event_severity_timestamp_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.event_type} - {self.severity} ({self.source_name})"
\ No newline at end of file
+        return f"{self.event_type} - {self.severity} ({self.source_name})"
+
+
+class SourceHealth(models.Model):
+    """
+    Per-source summary kept up to date by ingestion (events/health.py), so
+    silent sources are found without scanning the events table
+    """
+    source_name = models.CharField(max_length=200, unique=True)
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField(db_index=True)
+    last_event_type = models.CharField(max_length=200)
+    low_count = models.PositiveBigIntegerField(default=0)
+    medium_count = models.PositiveBigIntegerField(default=0)
+    high_count = models.PositiveBigIntegerField(default=0)
+    critical_count = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['last_seen']
+        verbose_name_plural = 'source health'
+
+    def __str__(self):
+        return f"{self.source_name} (last seen {self.last_seen})"
+
+    @property
+    def severity_counts(self):
+        return {
+            'LOW': self.low_count, 'MEDIUM': self.medium_count,
+            'HIGH': self.high_count, 'CRITICAL': self.critical_count,
+        }
@@ -25,3 +25,18 @@ class EventPermission(permissions.BasePermission):
         """Check if user has permission for the specific object"""
         # Same logic as has_permission for consistency
         return self.has_permission(request, view)
+
+
+class EventStatsPermission(permissions.BasePermission):
+    """
+    Permission for the event statistics and source health (aggregates only, no event content):
+    - Admin and Analyst: read-only access
+    - Other authenticated users: no access
+    """
+
+    def has_permission(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return False
+        if request.method not in permissions.SAFE_METHODS:
+            return False
+        return request.user.groups.filter(name__in=['Admin', 'Analyst']).exists()
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.utils.html import strip_tags
-from .models import Event
+from .models import Event, SourceHealth
 
 
 class EventSerializer(serializers.ModelSerializer):
@@ -71,3 +71,15 @@ class EventSerializer(serializers.ModelSerializer):
             if field not in attrs or not attrs[field]:
                 raise serializers.ValidationError({field: f'{field} is required.'})
         return attrs
+
+
+class SourceHealthSerializer(serializers.ModelSerializer):
+    severity_counts = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+    silent_seconds = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SourceHealth
+        fields = ['source_name', 'first_seen', 'last_seen', 'last_event_type', 'severity_counts', 'silent_seconds']
+
+    def get_silent_seconds(self, obj) -> int:
+        return int((self.context['now'] - obj.last_seen).total_seconds())
@@ -3,18 +3,39 @@ from django.dispatch import receiver
 from django.db import transaction, IntegrityError
 from django.core.exceptions import ValidationError
 import logging
+from monitoring import metrics
 
 logger = logging.getLogger('events')
 
 
+@receiver(post_save, sender='events.Event')
+def record_event_stats(sender, instance, created, **kwargs):
+    """Count new events in the streaming statistics (events.stats)"""
+    if created:
+        from .stats import record_event
+        record_event(instance.source_name, instance.event_type, instance.timestamp)
+
+
+@receiver(post_save, sender='events.Event')
+def record_source_health(sender, instance, created, **kwargs):
+    """Update the source's last-seen time and counts (events.health)"""
+    if created:
+        from . import health
+        health.record_event(instance.source_name, instance.event_type, instance.severity, instance.timestamp)
+
+
 @receiver(post_save, sender='events.Event')
 def create_alert_for_high_severity_event(sender, instance, created, **kwargs):
     """
-    Automatically create an Alert when a NEW Event with HIGH or CRITICAL severity is created.
+    Automatically create an Alert when a NEW Event matching an active AlertRule is created
+    (the default rule matches HIGH and CRITICAL severity), or when it brings a threshold
+    rule's count for its source and type to the threshold (alerts.thresholds).
+    Watchlist indicators found in the description are recorded first
+    (indicators.matching), and rules can require one.
     
     Guarantees:
     - Alert is created ONLY when a new Event is created (not on updates)
-    - Severity must be HIGH or CRITICAL
+    - The event must trigger an active alert rule (alerts.rules)
     - Exactly ONE alert per event is allowed
     - No duplicate alerts can be created under any condition
     
@@ -26,12 +47,21 @@ def create_alert_for_high_severity_event(sender, instance, created, **kwargs):
     if not created:
         return
     
-    # CRITICAL: Only process HIGH or CRITICAL severity events
-    if instance.severity not in ['HIGH', 'CRITICAL']:
-        return
-    
     # Import here to avoid circular import
     from alerts.models import Alert
+    from alerts.rules import get_matcher
+    from indicators.matching import get_matcher as get_indicator_matcher, record_matches
+    from notifications.outbox import enqueue_alerts
+
+    indicator_matcher = get_indicator_matcher()
+    indicators = indicator_matcher.scan(instance.description) if indicator_matcher else {}
+    if indicators:
+        record_matches([(instance.pk, indicators)])
+
+    # CRITICAL: Only process events triggering an active alert rule
+    rule = get_matcher().trigger_event(instance, indicator=bool(indicators))
+    if rule is None:
+        return
     
     # Use atomic transaction to ensure consistency
     try:
@@ -40,8 +70,8 @@ def create_alert_for_high_severity_event(sender, instance, created, **kwargs):
             existing_alert = Alert.objects.filter(event=instance).first()
             if existing_alert:
                 logger.warning(
-                    f'Alert already exists for event {instance.id}. '
-                    f'Skipping alert creation to prevent duplicate. Existing alert ID: {existing_alert.id}'
+                    'Alert already exists for event, skipping alert creation to prevent duplicate',
+                    extra={'event_id': instance.id, 'alert_id': existing_alert.id},
                 )
                 return
             
@@ -50,42 +80,53 @@ def create_alert_for_high_severity_event(sender, instance, created, **kwargs):
             alert, created_alert = Alert.objects.get_or_create(
                 event=instance,
                 defaults={
-                    'title': f"Alert: {instance.event_type}",
-                    'description': instance.description,
+                    # No description: the alert reads it from the event (Alert.description)
+                    'title': f"Alert: {instance.event_type}{rule.title_suffix}",
                     'severity': instance.severity,
                     'status': 'OPEN',
                 }
             )
             
             if created_alert:
+                metrics.alerts_created.inc(severity=alert.severity)
+                # Queued in this transaction; notification_worker delivers it
+                enqueue_alerts([alert])
                 logger.info(
-                    f'Auto-created alert {alert.id} for event {instance.id} '
-                    f'(severity: {instance.severity}, type: {instance.event_type})'
+                    'Auto-created alert',
+                    extra={
+                        'alert_id': alert.id,
+                        'event_id': instance.id,
+                        'severity': instance.severity,
+                        'event_type': instance.event_type,
+                    },
                 )
             else:
                 logger.warning(
-                    f'Alert {alert.id} already exists for event {instance.id}. '
-                    f'This should not happen due to database constraints.'
+                    'Alert already exists for event. This should not happen due to database constraints.',
+                    extra={'event_id': instance.id, 'alert_id': alert.id},
                 )
                 
     except IntegrityError as e:
         # Database constraint violation - alert already exists
         logger.error(
-            f'Database integrity error creating alert for event {instance.id}: {e}. '
-            f'This indicates a duplicate alert attempt was prevented by database constraint.'
+            'Database integrity error creating alert. '
+            'This indicates a duplicate alert attempt was prevented by database constraint.',
+            extra={'event_id': instance.id, 'error': e},
         )
         # Re-raise to ensure transaction rollback
         raise
     except ValidationError as e:
         # Application-level validation failed
         logger.error(
-            f'Validation error creating alert for event {instance.id}: {e}'
+            'Validation error creating alert',
+            extra={'event_id': instance.id, 'error': e},
         )
         raise
     except Exception as e:
         # Unexpected error - log and re-raise
         logger.error(
-            f'Unexpected error creating alert for event {instance.id}: {e}',
+            'Unexpected error creating alert',
+            extra={'event_id': instance.id},
             exc_info=True
         )
         raise
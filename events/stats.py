@@ -0,0 +1,313 @@
+"""
+Streaming statistics of ingested events: top sources and event types and
+distinct sources, without scanning the events table.
+
+Events are counted by event time into windows of settings.EVENT_STATS_WINDOW
+seconds, of which the last settings.EVENT_STATS_WINDOWS are kept (older
+events are not counted). Each window holds fixed-size sketches
+(monitoring/sketches.py):
+
+- Space-Saving summaries of source names and of event types
+  (EVENT_STATS_TOP_K counters each);
+- a HyperLogLog of source names, and one per event type for the first
+  EVENT_STATS_MAX_EVENT_TYPES types of the window.
+
+so memory is bounded whatever the number of events or sources. A query
+merges the windows it covers.
+
+As with metrics, set settings.EVENT_STATS_DIR to a directory shared by the
+worker processes: each process then writes its windows to
+``<EVENT_STATS_DIR>/event-stats-<pid>.json`` every
+EVENT_STATS_FLUSH_INTERVAL seconds and at exit, and a query merges the
+files of all processes. Files of stopped processes keep counting until
+their windows age out, so the statistics survive restarts.
+"""
+import atexit
+import base64
+import glob
+import json
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+
+from monitoring.sketches import HyperLogLog, SpaceSaving
+
+_FILE_NAME = re.compile(r'event-stats-(\d+)\.json$')
+
+
+class Window:
+    __slots__ = ('events', 'sources', 'event_types', 'distinct_sources', 'sources_by_type')
+
+    def __init__(self, top_k, precision):
+        self.events = 0
+        self.sources = SpaceSaving(top_k)
+        self.event_types = SpaceSaving(top_k)
+        self.distinct_sources = HyperLogLog(precision)
+        self.sources_by_type = {}
+
+    def add(self, source_name, event_type, max_event_types):
+        self.events += 1
+        self.sources.add(source_name)
+        self.event_types.add(event_type)
+        self.distinct_sources.add(source_name)
+        by_type = self.sources_by_type.get(event_type)
+        if by_type is None:
+            if len(self.sources_by_type) >= max_event_types:
+                return
+            by_type = self.sources_by_type[event_type] = HyperLogLog(self.distinct_sources.precision)
+        by_type.add(source_name)
+
+    def copy(self):
+        window = Window.__new__(Window)
+        window.events = self.events
+        window.sources = self.sources.copy()
+        window.event_types = self.event_types.copy()
+        window.distinct_sources = self.distinct_sources.copy()
+        window.sources_by_type = {name: sketch.copy() for name, sketch in self.sources_by_type.items()}
+        return window
+
+    def merge(self, other):
+        merged = Window.__new__(Window)
+        merged.events = self.events + other.events
+        merged.sources = self.sources.merge(other.sources)
+        merged.event_types = self.event_types.merge(other.event_types)
+        merged.distinct_sources = self.distinct_sources.merge(other.distinct_sources)
+        merged.sources_by_type = dict(self.sources_by_type)
+        for event_type, sketch in other.sources_by_type.items():
+            mine = merged.sources_by_type.get(event_type)
+            merged.sources_by_type[event_type] = sketch if mine is None else mine.merge(sketch)
+        return merged
+
+    def to_dict(self):
+        def registers(sketch):
+            return base64.b64encode(bytes(sketch.registers)).decode()
+        return {
+            'events': self.events,
+            'sources': self.sources.to_list(),
+            'event_types': self.event_types.to_list(),
+            'distinct_sources': registers(self.distinct_sources),
+            'sources_by_type': {name: registers(sketch) for name, sketch in self.sources_by_type.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data, top_k, precision):
+        def sketch(encoded):
+            return HyperLogLog(precision, base64.b64decode(encoded))
+        window = cls.__new__(cls)
+        window.events = data['events']
+        window.sources = SpaceSaving.from_list(top_k, data['sources'])
+        window.event_types = SpaceSaving.from_list(top_k, data['event_types'])
+        window.distinct_sources = sketch(data['distinct_sources'])
+        window.sources_by_type = {name: sketch(encoded) for name, encoded in data['sources_by_type'].items()}
+        return window
+
+
+class EventStats:
+    def __init__(self, width, windows, top_k, precision, max_event_types):
+        self.width = width
+        self.windows_kept = windows
+        self.top_k = top_k
+        self.precision = precision
+        self.max_event_types = max_event_types
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def _new_window(self):
+        return Window(self.top_k, self.precision)
+
+    def record(self, source_name, event_type, timestamp, now=None):
+        """Count one event at ``timestamp`` (Unix time)"""
+        current = int((now or time.time()) // self.width)
+        index = min(int(timestamp // self.width), current)  # Clocks ahead count as now
+        if index <= current - self.windows_kept:
+            return
+        with self._lock:
+            window = self._windows.get(index)
+            if window is None:
+                for old in [old for old in self._windows if old <= current - self.windows_kept]:
+                    del self._windows[old]
+                window = self._windows[index] = self._new_window()
+            window.add(source_name, event_type, self.max_event_types)
+
+    def windows(self):
+        """Copies of the windows, safe to merge while events are recorded"""
+        with self._lock:
+            return {index: window.copy() for index, window in self._windows.items()}
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'width': self.width,
+                'windows': {str(index): window.to_dict() for index, window in self._windows.items()},
+            }
+
+    def windows_from_dict(self, data):
+        """Windows of a snapshot taken with the same window width"""
+        if data.get('width') != self.width:
+            return {}
+        return {
+            int(index): Window.from_dict(window, self.top_k, self.precision)
+            for index, window in data['windows'].items()
+        }
+
+    def summary(self, windows, minutes, limit, now=None):
+        """Top sources and event types and distinct sources over the last ``minutes``"""
+        current = int((now or time.time()) // self.width)
+        first = current - min(self.windows_kept, -(-minutes * 60 // self.width)) + 1
+        covered = [window for index, window in windows.items() if first <= index <= current]
+        events = sum(window.events for window in covered)
+        sources, event_types = SpaceSaving(self.top_k), SpaceSaving(self.top_k)
+        distinct_sources = HyperLogLog(self.precision)
+        for window in covered:
+            sources = sources.merge(window.sources)
+            event_types = event_types.merge(window.event_types)
+            distinct_sources = distinct_sources.merge(window.distinct_sources)
+
+        top_types = []
+        for event_type, count, error in event_types.top(limit):
+            # Only the reported types' distinct sources are merged
+            by_type = None
+            for window in covered:
+                sketch = window.sources_by_type.get(event_type)
+                if sketch is not None:
+                    by_type = sketch if by_type is None else by_type.merge(sketch)
+            top_types.append({
+                'event_type': event_type, 'count': count, 'max_error': error,
+                'distinct_sources': by_type.count() if by_type is not None else None,
+            })
+        return {
+            'from': first * self.width,
+            'to': (current + 1) * self.width,
+            'events': events,
+            'distinct_sources': distinct_sources.count(),
+            'top_sources': [
+                {'source_name': source_name, 'count': count, 'max_error': error}
+                for source_name, count, error in sources.top(limit)
+            ],
+            'top_event_types': top_types,
+            'accuracy': {
+                # Space-Saving: counts are over-estimated by at most events / counters
+                'max_count_error': events // self.top_k,
+                'distinct_relative_error': round(distinct_sources.relative_error, 4),
+            },
+        }
+
+    # Multi-process support
+
+    def _path(self, directory, pid):
+        return os.path.join(directory, f'event-stats-{pid}.json')
+
+    def write_snapshot(self, directory):
+        """Atomically replace this process's snapshot file"""
+        path = self._path(directory, os.getpid())
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as fh:
+            json.dump(self.to_dict(), fh)
+        os.replace(tmp_path, path)
+
+    def load_own_snapshot(self, directory):
+        """Continue from a snapshot left by an earlier process with this pid"""
+        try:
+            with open(self._path(directory, os.getpid())) as fh:
+                windows = self.windows_from_dict(json.load(fh))
+        except (OSError, ValueError):
+            return
+        current = int(time.time() // self.width)
+        with self._lock:
+            for index, window in windows.items():
+                if index > current - self.windows_kept and index not in self._windows:
+                    self._windows[index] = window
+
+    def collect(self, directory):
+        """This process's windows merged with the snapshots of the other processes"""
+        windows = self.windows()
+        current = int(time.time() // self.width)
+        for path in glob.glob(os.path.join(directory, 'event-stats-*.json')):
+            match = _FILE_NAME.search(path)
+            if not match or int(match.group(1)) == os.getpid():
+                continue
+            try:
+                with open(path) as fh:
+                    other = self.windows_from_dict(json.load(fh))
+            except (OSError, ValueError):
+                continue
+            live = {index: window for index, window in other.items() if index > current - self.windows_kept}
+            if not live:
+                try:
+                    os.unlink(path)  # Only aged-out windows left (its process stopped counting)
+                except OSError:
+                    pass
+            for index, window in live.items():
+                mine = windows.get(index)
+                windows[index] = window if mine is None else mine.merge(window)
+        return windows
+
+
+_lock = threading.Lock()
+_stats = None
+
+
+def get_stats():
+    """This process's statistics, created (and their snapshots started) on first use"""
+    global _stats
+    if _stats is not None:
+        return _stats
+    with _lock:
+        if _stats is None:
+            stats = EventStats(
+                settings.EVENT_STATS_WINDOW, settings.EVENT_STATS_WINDOWS, settings.EVENT_STATS_TOP_K,
+                settings.EVENT_STATS_HLL_PRECISION, settings.EVENT_STATS_MAX_EVENT_TYPES,
+            )
+            directory = settings.EVENT_STATS_DIR
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+                stats.load_own_snapshot(directory)
+            _stats = stats
+            if directory:
+                _start_flusher(stats, directory)
+        return _stats
+
+
+def _start_flusher(stats, directory):
+    def write():
+        if _stats is stats:
+            try:
+                stats.write_snapshot(directory)
+            except OSError:
+                pass
+
+    def run():
+        while _stats is stats:
+            time.sleep(settings.EVENT_STATS_FLUSH_INTERVAL)
+            write()
+
+    threading.Thread(target=run, name='event-stats-flusher', daemon=True).start()
+    atexit.register(write)
+
+
+def record_event(source_name, event_type, timestamp):
+    get_stats().record(source_name, event_type, timestamp.timestamp())
+
+
+def record_rows(rows):
+    """Count ``(source_name, event_type, timestamp)`` rows written in bulk"""
+    stats = get_stats()
+    for source_name, event_type, timestamp in rows:
+        stats.record(source_name, event_type, timestamp.timestamp())
+
+
+def summary(minutes=60, limit=20):
+    stats = get_stats()
+    directory = settings.EVENT_STATS_DIR
+    windows = stats.collect(directory) if directory else stats.windows()
+    return stats.summary(windows, minutes, limit)
+
+
+def reset_stats():
+    """Forget all windows (tests)"""
+    global _stats
+    with _lock:
+        _stats = None
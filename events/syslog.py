@@ -0,0 +1,461 @@
+"""
+Syslog ingestion: message parsing, mapping rules and an asyncio server.
+
+``parse_message`` reads RFC 5424 messages and the BSD format of RFC 3164,
+falling back to treating the whole text as the message as RFC 3164 asks
+of relays. ``SyslogMapper`` turns a message into ``Event`` fields through
+the first matching rule (settings.SYSLOG_RULES or a JSON file), for example::
+
+    {"app_name": "sshd", "message": "Failed password for (?P<user>\\\\S+)",
+     "event_type": "Failed Login", "severity": "HIGH",
+     "description": "Failed SSH login for {user} on {hostname}"}
+
+Keys ``hostname``, ``app_name``, ``procid``, ``msgid``, ``facility`` (a
+name such as ``auth``) and ``syslog_severity`` (0-7) match a value or a
+list of values; ``message`` is a regex searched in the text, whose named
+groups can be used in the templates. ``source_name``, ``event_type``, ``severity`` and
+``description`` are ``str.format`` templates over the message fields;
+``"drop": true`` discards the message. Without a rule (or for a template a
+rule leaves out) the source is the hostname, the type the app name and the
+severity follows the priority: emerg/alert/crit are CRITICAL, err HIGH,
+warning MEDIUM and the rest LOW.
+
+``SyslogServer`` receives over UDP and TCP (octet-counted or LF framing,
+RFC 6587). The event loop only frames and enqueues messages; a single
+writer thread parses, maps and validates each batch, inserts it and
+creates its alerts and their webhook notifications in one transaction. When the queue is full UDP
+messages are dropped and TCP senders wait. Events are timestamped when
+received: device clocks drift and RFC 3164 dates carry no year or zone.
+"""
+import asyncio
+import collections
+import logging
+import re
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import close_old_connections, connections, transaction
+from django.utils.dateparse import parse_datetime
+
+from monitoring import metrics
+
+from .bulk import create_alerts, id_chunks, insert_rows
+from .models import Event
+from . import health
+from .stats import record_rows
+from .validation import validate_event_payload
+
+logger = logging.getLogger('events')
+
+FACILITIES = [
+    'kern', 'user', 'mail', 'daemon', 'auth', 'syslog', 'lpr', 'news', 'uucp', 'cron', 'authpriv', 'ftp',
+    'ntp', 'security', 'console', 'solaris-cron', 'local0', 'local1', 'local2', 'local3', 'local4',
+    'local5', 'local6', 'local7',
+]
+# Syslog severity (0 = emerg ... 7 = debug) -> Event severity
+SEVERITIES = ['CRITICAL', 'CRITICAL', 'CRITICAL', 'HIGH', 'MEDIUM', 'LOW', 'LOW', 'LOW']
+DEFAULT_PRIORITY = 13  # user.notice, assumed for messages without one (RFC 3164 4.3.3)
+UDP_RECEIVE_BUFFER = 8 * 1024 * 1024  # Bytes
+EVENT_FIELDS = ['source_name', 'event_type', 'severity', 'description', 'timestamp']
+
+SyslogMessage = collections.namedtuple('SyslogMessage', [
+    'facility', 'severity', 'timestamp', 'hostname', 'app_name', 'procid', 'msgid',
+    'structured_data', 'message',
+])
+
+_PRI_RE = re.compile(r'<(\d{1,3})>')
+_BSD_TIMESTAMP_RE = re.compile(r'([A-Z][a-z]{2}) ([ \d]\d) (\d\d):(\d\d):(\d\d) ')
+_TAG_RE = re.compile(r'([^\s:\[\]]{1,48})(?:\[([^\]]*)\])?: ?')
+_MONTHS = {name: number for number, name in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1)}
+
+
+def _nil(value):
+    return None if value == '-' else value
+
+
+def _split_structured_data(text):
+    """RFC 5424 STRUCTURED-DATA -> (raw SD or None, rest of the text)"""
+    if text.startswith('-'):
+        return None, text[1:]
+    if not text.startswith('['):
+        raise ValueError('Invalid STRUCTURED-DATA')
+    position, in_element, in_value = 0, False, False
+    while position < len(text):
+        char = text[position]
+        if in_value:
+            if char == '\\':
+                position += 1  # Escaped '"', '\' or ']'
+            elif char == '"':
+                in_value = False
+        elif char == '"':
+            in_value = True
+        elif char == '[' and not in_element:
+            in_element = True
+        elif char == ']' and in_element:
+            in_element = False
+            if position + 1 == len(text) or text[position + 1] != '[':
+                return text[:position + 1], text[position + 1:]
+        position += 1
+    raise ValueError('Unterminated STRUCTURED-DATA')
+
+
+def _parse_5424(facility, severity, text):
+    parts = text.split(' ', 5)
+    if len(parts) < 6:
+        raise ValueError('Truncated RFC 5424 header')
+    raw_timestamp, hostname, app_name, procid, msgid, rest = parts
+    timestamp = None
+    if raw_timestamp != '-':
+        timestamp = parse_datetime(raw_timestamp)
+        if timestamp is None or timestamp.tzinfo is None:
+            raise ValueError(f'Invalid RFC 5424 timestamp "{raw_timestamp}"')
+    structured_data, message = _split_structured_data(rest)
+    if message.startswith(' '):
+        message = message[1:]
+    if message.startswith('\ufeff'):
+        message = message[1:]  # BOM marking a UTF-8 MSG
+    return SyslogMessage(
+        facility, severity, timestamp, _nil(hostname), _nil(app_name), _nil(procid), _nil(msgid),
+        structured_data, message,
+    )
+
+
+def _bsd_timestamp(match, now):
+    month, day = _MONTHS.get(match.group(1)), int(match.group(2))
+    if month is None:
+        return None
+    hour, minute, second = (int(match.group(index)) for index in (3, 4, 5))
+    try:
+        # No year or zone on the wire: assume UTC and the most recent such date
+        timestamp = datetime(now.year, month, day, hour, minute, second, tzinfo=dt_timezone.utc)
+        if timestamp > now + timedelta(days=1):
+            timestamp = timestamp.replace(year=now.year - 1)
+    except ValueError:
+        return None
+    return timestamp
+
+
+def _parse_3164(facility, severity, text, now):
+    timestamp = hostname = None
+    match = _BSD_TIMESTAMP_RE.match(text)
+    if match:
+        timestamp = _bsd_timestamp(match, now)
+    if timestamp is not None:
+        text = text[match.end():]
+        # The HOSTNAME is optional in practice: "su: ..." starts with the tag
+        host, space, rest = text.partition(' ')
+        if space and not _TAG_RE.fullmatch(host) and not host.endswith(':'):
+            hostname, text = host, rest
+    app_name = procid = None
+    tag = _TAG_RE.match(text)
+    if tag:
+        app_name, procid, text = tag.group(1), tag.group(2), text[tag.end():]
+    return SyslogMessage(facility, severity, timestamp, hostname, app_name, procid, None, None, text)
+
+
+def parse_message(data, now=None):
+    """Parse one syslog message (bytes) into a ``SyslogMessage``; ValueError if it is unusable"""
+    text = data.decode('utf-8', errors='replace').rstrip('\r\n\x00')
+    if not text.strip():
+        raise ValueError('Empty message')
+    match = _PRI_RE.match(text)
+    if match:
+        priority = int(match.group(1))
+        if priority > 191:
+            raise ValueError(f'Invalid priority {priority}')
+        text = text[match.end():]
+    else:
+        priority = DEFAULT_PRIORITY
+    facility, severity = divmod(priority, 8)
+    if match and text.startswith('1 '):
+        return _parse_5424(facility, severity, text[2:])
+    return _parse_3164(facility, severity, text, now or datetime.now(dt_timezone.utc))
+
+
+class _Fields(dict):
+    def __missing__(self, key):
+        return ''
+
+
+class SyslogRule:
+    MATCH_KEYS = ('hostname', 'app_name', 'procid', 'msgid', 'facility', 'syslog_severity')
+    TEMPLATE_KEYS = ('source_name', 'event_type', 'severity', 'description')
+
+    def __init__(self, config):
+        unknown = set(config) - set(self.MATCH_KEYS) - set(self.TEMPLATE_KEYS) - {'message', 'drop'}
+        if unknown:
+            raise ValueError(f'Unknown rule key(s): {", ".join(sorted(unknown))}')
+        self.conditions = {}
+        for key in self.MATCH_KEYS:
+            if key in config:
+                values = config[key] if isinstance(config[key], list) else [config[key]]
+                self.conditions[key] = {str(value) for value in values}
+        try:
+            self.pattern = re.compile(config['message']) if 'message' in config else None
+        except re.error as exc:
+            raise ValueError(f'Invalid message regex {config["message"]!r}: {exc}')
+        severity = config.get('severity')
+        if severity is not None and '{' not in severity and severity.upper() not in SEVERITIES:
+            raise ValueError(f'Invalid severity "{severity}" in rule')
+        self.templates = {key: config[key] for key in self.TEMPLATE_KEYS if key in config}
+        self.drop = bool(config.get('drop', False))
+
+    def match(self, fields):
+        """Named groups of the message regex if the rule applies, else None"""
+        for key, values in self.conditions.items():
+            if str(fields[key]) not in values:
+                return None
+        if self.pattern is None:
+            return {}
+        found = self.pattern.search(fields['message'])
+        return None if found is None else found.groupdict(default='')
+
+
+class SyslogMapper:
+    DEFAULT_TEMPLATES = {
+        'source_name': '{hostname}',
+        'event_type': '{app_name}',
+        'description': '{message}',
+    }
+
+    def __init__(self, rules=()):
+        self.rules = [SyslogRule(rule) for rule in rules]
+
+    def map(self, message, peer):
+        """Event payload for ``message`` (to be validated), or None if a rule drops it"""
+        fields = _Fields(message._asdict())
+        fields.update(
+            hostname=message.hostname or peer,
+            app_name=message.app_name or 'syslog',
+            facility=FACILITIES[message.facility] if message.facility < len(FACILITIES) else message.facility,
+            syslog_severity=message.severity,
+            peer=peer,
+        )
+        templates = self.DEFAULT_TEMPLATES
+        for rule in self.rules:
+            groups = rule.match(fields)
+            if groups is not None:
+                if rule.drop:
+                    return None
+                fields.update(groups)
+                templates = {**self.DEFAULT_TEMPLATES, **rule.templates}
+                break
+        payload = {key: template.format_map(fields) for key, template in templates.items()}
+        payload.setdefault('severity', SEVERITIES[message.severity])
+        return payload
+
+
+def write_events(rows):
+    """
+    Insert event rows, their alerts and the alerts' notifications in one
+    transaction, then count the events in the event statistics and source
+    health; returns ``{severity: alerts created}``.
+    """
+    from alerts.models import Alert
+    from notifications.outbox import active_destination_ids, enqueue_alerts
+
+    close_old_connections()
+    with transaction.atomic():
+        event_ids = insert_rows(Event, EVENT_FIELDS, rows, return_ids=True)
+        created = create_alerts(event_ids)
+        if any(created.values()) and active_destination_ids():
+            for chunk in id_chunks(event_ids):
+                enqueue_alerts(Alert.objects.filter(event_id__in=chunk).select_related('event'))
+    record_rows((row[0], row[1], row[4]) for row in rows)
+    health.record_rows((row[0], row[1], row[2], row[4]) for row in rows)
+    return created
+
+
+class SyslogServer:
+    def __init__(self, mapper, batch_size=500, flush_interval=1.0, queue_size=20000,
+                 max_message_size=8192, writer=write_events):
+        self.mapper = mapper
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_message_size = max_message_size
+        self.writer = writer
+        self.queue = asyncio.Queue(queue_size)
+        self.stats = collections.Counter()
+        self.udp_address = self.tcp_address = None
+        self._transport = self._tcp_server = self._writer_task = None
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='syslog-writer')
+
+    async def start(self, host, udp_port=None, tcp_port=None):
+        """Listen on the given ports (None disables a transport, 0 picks a free port)"""
+        loop = asyncio.get_running_loop()
+        if udp_port is not None:
+            self._transport, _ = await loop.create_datagram_endpoint(
+                lambda: _UDPProtocol(self), local_addr=(host, udp_port),
+            )
+            sock = self._transport.get_extra_info('socket')
+            # A larger kernel buffer absorbs bursts while the loop is busy (capped by net.core.rmem_max)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RECEIVE_BUFFER)
+            self.udp_address = sock.getsockname()[:2]
+        if tcp_port is not None:
+            self._tcp_server = await asyncio.start_server(
+                self._handle_tcp, host, tcp_port, limit=self.max_message_size,
+            )
+            self.tcp_address = self._tcp_server.sockets[0].getsockname()[:2]
+        self._writer_task = asyncio.create_task(self._write_loop())
+
+    async def stop(self):
+        """Stop receiving, write what is queued and wait for the writer"""
+        if self._transport is not None:
+            self._transport.close()
+        if self._tcp_server is not None:
+            self._tcp_server.close()
+            await self._tcp_server.wait_closed()
+        await self.queue.put(None)
+        await self._writer_task
+        await asyncio.get_running_loop().run_in_executor(self._executor, connections.close_all)
+        self._executor.shutdown()
+
+    # Receiving (event loop)
+
+    def _received(self, data, peer, transport):
+        self.stats['received'] += 1
+        metrics.syslog_messages_received.inc(transport=transport)
+        if len(data) > self.max_message_size:
+            self._dropped('too_large')
+            return None
+        return time.monotonic(), time.time(), data, peer
+
+    def submit(self, data, peer, transport='udp'):
+        item = self._received(data, peer, transport)
+        if item is None:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self._dropped('queue_full')
+
+    async def submit_wait(self, data, peer, transport='tcp'):
+        item = self._received(data, peer, transport)
+        if item is not None:
+            await self.queue.put(item)  # Back-pressure instead of dropping
+
+    def _dropped(self, reason, count=1):
+        self.stats[f'dropped_{reason}'] += count
+        metrics.syslog_messages_dropped.inc(count, reason=reason)
+
+    async def _handle_tcp(self, reader, writer):
+        peer = (writer.get_extra_info('peername') or ('unknown',))[0]
+        try:
+            while True:
+                head = await reader.read(1)
+                if not head:
+                    break
+                if head in b'\r\n':
+                    continue
+                if head.isdigit():
+                    # Octet counting: "<length> <message>"
+                    length = int(head + (await reader.readuntil(b' '))[:-1])
+                    if length > self.max_message_size:
+                        self.stats['received'] += 1
+                        self._dropped('too_large')
+                        break  # The stream cannot be resynchronized cheaply
+                    data = await reader.readexactly(length)
+                else:
+                    try:
+                        data = head + await reader.readuntil(b'\n')
+                    except asyncio.IncompleteReadError as exc:
+                        data = head + exc.partial  # Last message, without a trailing LF
+                await self.submit_wait(data, peer)
+        except asyncio.LimitOverrunError:
+            self.stats['received'] += 1
+            self._dropped('too_large')
+        except ValueError:
+            self._dropped('malformed')  # Non-numeric octet count
+        except asyncio.IncompleteReadError:
+            self._dropped('malformed')  # Connection closed inside a counted frame
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # Writing (batches are processed on the writer thread)
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            counts = await loop.run_in_executor(self._executor, self._process_batch, batch)
+            self.stats.update(counts)
+
+    def _process_batch(self, batch):
+        counts = collections.Counter()
+        rows, received_at = [], []
+        for received, received_time, data, peer in batch:
+            try:
+                message = parse_message(data)
+            except ValueError:
+                counts['dropped_malformed'] += 1
+                continue
+            payload = self.mapper.map(message, peer)
+            if payload is None:
+                counts['dropped_filtered'] += 1
+                continue
+            validated, errors = validate_event_payload(payload)
+            if errors:
+                counts['dropped_invalid'] += 1
+                continue
+            rows.append((
+                validated['source_name'], validated['event_type'], validated['severity'],
+                validated['description'], datetime.fromtimestamp(received_time, dt_timezone.utc),
+            ))
+            received_at.append(received)
+
+        for key, count in counts.items():
+            metrics.syslog_messages_dropped.inc(count, reason=key[len('dropped_'):])
+        if not rows:
+            return counts
+        try:
+            alerts = self.writer(rows)
+        except Exception:
+            logger.error('Failed to store syslog batch', extra={'events': len(rows)}, exc_info=True)
+            counts['dropped_db_error'] += len(rows)
+            metrics.syslog_messages_dropped.inc(len(rows), reason='db_error')
+            return counts
+
+        committed = time.monotonic()
+        for received in received_at:
+            metrics.syslog_ingest_lag.observe(committed - received)
+        for row in rows:
+            metrics.events_ingested.inc(severity=row[2])
+        for severity, count in alerts.items():
+            if count:
+                metrics.alerts_created.inc(count, severity=severity)
+        counts['events'] += len(rows)
+        counts['alerts'] += sum(alerts.values())
+        return counts
+
+
+class _UDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, addr):
+        self.server.submit(data, addr[0], 'udp')
@@ -1,9 +1,24 @@
-from django.test import TestCase
+import gzip
+import json
+import time
+import zlib
+from datetime import timedelta
+from io import StringIO
+from urllib.parse import urlencode
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import Count
+from django.utils import timezone
 from django.contrib.auth.models import User, Group
 from rest_framework.test import APIClient
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.http import QueryDict
 from .models import Event
+from .serializers import EventSerializer
+from threat_monitor.msgpack_codec import packb
+from .validation import validate_event_payload
 
 
 class EventAlertCreationTest(TestCase):
@@ -136,3 +151,941 @@ class EventPermissionTest(TestCase):
         
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Event.objects.count(), 1)
+
+
+class GenerateEventsCommandTest(TestCase):
+    """Test the synthetic dataset generator"""
+
+    def test_generates_events_and_matching_alerts(self):
+        """Test that events are skewed over the window and only HIGH/CRITICAL get alerts"""
+        from alerts.models import Alert
+
+        call_command('generate_events', 2000, chunk_size=300, days=7, seed=7, stdout=StringIO())
+
+        self.assertEqual(Event.objects.count(), 2000)
+        alerts = Alert.objects.select_related('event')
+        self.assertEqual(alerts.count(), Event.objects.filter(severity__in=['HIGH', 'CRITICAL']).count())
+        self.assertTrue(all(alert.severity == alert.event.severity for alert in alerts))
+        self.assertEqual(set(alerts.values_list('status', flat=True)), {'OPEN', 'ACKNOWLEDGED', 'RESOLVED'})
+
+        now = timezone.now()
+        self.assertFalse(Event.objects.filter(timestamp__gt=now).exists())
+        self.assertFalse(Event.objects.filter(timestamp__lt=now - timedelta(days=8)).exists())
+
+        # Zipf skew: the busiest source has far more than an even share
+        top = Event.objects.values('source_name').annotate(n=Count('id')).order_by('-n').first()
+        self.assertGreater(top['n'], 2000 / 200 * 10)
+
+        # New events after the bulk load still get fresh ids
+        event = Event.objects.create(source_name='IDS', event_type='Port Scan', severity='LOW', description='x')
+        self.assertGreater(event.id, 2000)
+
+
+class EventPayloadValidationTest(TestCase):
+    """Test that the lean ingestion validator matches EventSerializer exactly"""
+
+    VALID = {
+        'source_name': 'Firewall',
+        'event_type': 'Intrusion Attempt',
+        'severity': 'HIGH',
+        'description': 'Unauthorized access attempt',
+    }
+
+    def _variant(self, **changes):
+        payload = dict(self.VALID)
+        for key, value in changes.items():
+            if value is KeyError:
+                payload.pop(key)
+            else:
+                payload[key] = value
+        return payload
+
+    def assertMatchesSerializer(self, payload):
+        serializer = EventSerializer(data=payload)
+        validated, errors = validate_event_payload(payload)
+        if serializer.is_valid():
+            self.assertIsNone(errors)
+            self.assertEqual(validated, dict(serializer.validated_data))
+        else:
+            self.assertIsNone(validated)
+            self.assertEqual(errors, serializer.errors)
+            self.assertEqual(list(errors), list(serializer.errors))
+
+    def test_parity_with_event_serializer(self):
+        """Test normalized output and error messages over valid and invalid payloads"""
+        payloads = [
+            self.VALID,
+            self._variant(severity='critical'),
+            self._variant(severity=' medium '),
+            self._variant(source_name='  IDS  ', description='  padded  '),
+            self._variant(description='<b>bold</b> <script>alert(1)</script>text'),
+            self._variant(source_name='<b></b>'),
+            self._variant(event_type='<i>   </i>'),
+            self._variant(source_name='x' * 200),
+            self._variant(source_name='x' * 201),
+            self._variant(source_name='<b>' + 'x' * 199 + '</b>'),
+            self._variant(event_type='a\x00b'),
+            self._variant(description='bad \ud800 surrogate'),
+            self._variant(severity='BOGUS'),
+            self._variant(severity=''),
+            self._variant(severity=None),
+            self._variant(severity=True),
+            self._variant(severity=['HIGH']),
+            self._variant(source_name=12345),
+            self._variant(description=1.5),
+            self._variant(description='   '),
+            self._variant(source_name=KeyError, description=KeyError),
+            {},
+            {'source_name': '', 'event_type': None, 'severity': 'x' * 300, 'description': {}},
+            [self.VALID],
+            'not a dict',
+            QueryDict('source_name=IDS&event_type=Scan&severity=low&description=found'),
+            QueryDict('source_name=&severity=HIGH'),
+        ]
+        for payload in payloads:
+            with self.subTest(payload=payload):
+                self.assertMatchesSerializer(payload)
+
+    def test_api_response_is_unchanged(self):
+        """Test that create_event returns the serializer representation"""
+        admin_group, _ = Group.objects.get_or_create(name='Admin')
+        user = User.objects.create_user(username='admin', password='adminpass123')
+        user.groups.add(admin_group)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+        response = client.post('/api/events/', self._variant(severity='high', source_name='<b>FW</b>'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        event = Event.objects.get()
+        self.assertEqual(response.json(), EventSerializer(event).data)
+        self.assertEqual(event.source_name, 'FW')
+        self.assertEqual(event.severity, 'HIGH')
+
+        response = client.post('/api/events/', {'severity': 'nope'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {
+            'source_name': ['This field is required.'],
+            'event_type': ['This field is required.'],
+            'severity': ['Severity must be one of: LOW, MEDIUM, HIGH, CRITICAL. Received: "nope".'],
+            'description': ['This field is required.'],
+        })
+
+
+class EventWireFormatTest(TestCase):
+    """Test the orjson renderer/parser and MessagePack ingestion"""
+
+    def setUp(self):
+        """Set up an Admin client"""
+        admin_group, _ = Group.objects.get_or_create(name='Admin')
+        user = User.objects.create_user(username='admin', password='adminpass123')
+        user.groups.add(admin_group)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        self.payload = {
+            'source_name': 'Firewall',
+            'event_type': 'Intrusion Attempt',
+            'severity': 'high',
+            'description': 'Blocked   connection from 10.0.0.1 é',
+        }
+
+    def test_msgpack_event_is_created(self):
+        """Test that create_event accepts a MessagePack body"""
+        response = self.client.post(
+            '/api/events/', packb(self.payload), content_type='application/msgpack',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        event = Event.objects.get()
+        self.assertEqual(event.severity, 'HIGH')
+        self.assertEqual(event.description, self.payload['description'])
+        self.assertEqual(response.json(), EventSerializer(event).data)
+
+    def test_malformed_msgpack_is_rejected(self):
+        """Test that truncated or non-mapping MessagePack bodies return 400"""
+        body = packb(self.payload)
+        response = self.client.post('/api/events/', body[:-3], content_type='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('MessagePack parse error', response.json()['detail'])
+
+        response = self.client.post('/api/events/', packb([1, 2]), content_type='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('non_field_errors', response.json())
+        self.assertFalse(Event.objects.exists())
+
+    def test_pure_python_codec(self):
+        """Test the fallback MessagePack codec against reference encodings"""
+        from threat_monitor import msgpack_codec
+
+        vectors = [
+            (None, b'\xc0'), (True, b'\xc3'), (5, b'\x05'), (-3, b'\xfd'), (300, b'\xcd\x01\x2c'),
+            (1.5, b'\xcb\x3f\xf8\x00\x00\x00\x00\x00\x00'), ('ab', b'\xa2ab'), (b'\x00', b'\xc4\x01\x00'),
+            ([1, 'x'], b'\x92\x01\xa1x'), ({'a': None}, b'\x81\xa1a\xc0'), ('x' * 40, b'\xd9\x28' + b'x' * 40),
+        ]
+        for value, encoded in vectors:
+            with self.subTest(value=value):
+                self.assertEqual(msgpack_codec._unpackb_python(encoded), value)
+                out = []
+                msgpack_codec._encode(value, out)
+                self.assertEqual(msgpack_codec._unpackb_python(b''.join(out)), value)
+
+        for bad in [b'', b'\xc1', b'\x92\x01', b'\xc0\xc0', b'\xd4\x01\x00', b'\x81\x01\x02', b'\xa1\xff',
+                    b'\x91' * 100 + b'\xc0']:
+            with self.subTest(bad=bad):
+                with self.assertRaises(ValueError):
+                    msgpack_codec._unpackb_python(bad)
+
+    def test_fast_json_matches_drf_json(self):
+        """Test that FastJSONRenderer output is byte-identical to JSONRenderer"""
+        from rest_framework.renderers import JSONRenderer
+        from threat_monitor.renderers import FastJSONRenderer
+
+        Event.objects.create(**{**self.payload, 'severity': 'HIGH'})
+        data = {'count': 1, 'results': EventSerializer(Event.objects.all(), many=True).data, 'at': timezone.now()}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render({1: 2 ** 70}), JSONRenderer().render({1: 2 ** 70}))
+        data['results'][0]['description'] = 'line\u2028separated \u2026'
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4'),
+        )
+
+    def test_fast_json_parser_is_strict(self):
+        """Test that JSON bodies with NaN are rejected as before"""
+        response = self.client.post(
+            '/api/events/', '{"source_name": NaN}', content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('JSON parse error', response.json()['detail'])
+
+
+@override_settings(REQUEST_DECOMPRESSION_MAX_SIZE=256 * 1024, REQUEST_DECOMPRESSION_MAX_RATIO=50)
+class CompressedIngestionTest(TestCase):
+    """Test gzip/deflate request bodies on the ingestion endpoint"""
+
+    def setUp(self):
+        """Set up an Admin client and a JSON payload"""
+        admin_group, _ = Group.objects.get_or_create(name='Admin')
+        user = User.objects.create_user(username='admin', password='adminpass123')
+        user.groups.add(admin_group)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        self.body = json.dumps({
+            'source_name': 'Firewall',
+            'event_type': 'Port Scan',
+            'severity': 'LOW',
+            'description': 'Scan from 10.0.0.1 across 500 ports ' * 50,
+        }).encode()
+
+    def _post(self, body, encoding, content_type='application/json'):
+        return self.client.post('/api/events/', body, content_type=content_type, HTTP_CONTENT_ENCODING=encoding)
+
+    def test_gzip_and_deflate_bodies_are_accepted(self):
+        """Test that gzip, zlib-deflate and raw-deflate bodies are ingested"""
+        raw = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        bodies = {
+            'gzip': gzip.compress(self.body),
+            'deflate': zlib.compress(self.body),
+            'Deflate': raw.compress(self.body) + raw.flush(),
+        }
+        for encoding, body in bodies.items():
+            with self.subTest(encoding=encoding):
+                response = self._post(body, encoding)
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Event.objects.count(), 3)
+        response = self._post(gzip.compress(packb(json.loads(self.body))), 'gzip', 'application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_zip_bomb_is_rejected(self):
+        """Test that bodies over the size or ratio limit return 413"""
+        response = self._post(gzip.compress(b' ' * (1024 * 1024)), 'gzip')
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertIn('ratio', response.json()['detail'])
+
+        with override_settings(REQUEST_DECOMPRESSION_MAX_RATIO=10000):
+            response = self._post(gzip.compress(b' ' * (1024 * 1024)), 'gzip')
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(Event.objects.exists())
+
+    def test_invalid_bodies_and_encodings(self):
+        """Test truncated/corrupt bodies (400) and unsupported encodings (415)"""
+        compressed = gzip.compress(self.body)
+        for body in [compressed[:-10], b'not gzip at all', compressed + b'trailing']:
+            with self.subTest(body=body[:10]):
+                self.assertEqual(self._post(body, 'gzip').status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(self._post(self.body, 'br').status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        response = self.client.patch(
+            '/api/alerts/1/', compressed, content_type='application/json', HTTP_CONTENT_ENCODING='gzip',
+        )
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        self.assertEqual(self._post(self.body, 'identity').status_code, status.HTTP_201_CREATED)
+
+    def test_compressed_form_bodies_are_refused(self):
+        """Test that a compressed form body gets 415 rather than being parsed truncated"""
+        form = urlencode({'source_name': 'Firewall', 'event_type': 'Port Scan', 'severity': 'LOW',
+                          'description': 'Scan from 10.0.0.1 ' * 200})
+        response = self._post(gzip.compress(form.encode()), 'gzip', 'application/x-www-form-urlencoded')
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        self.assertIn('only supported for JSON and MessagePack', response.json()['detail'])
+        self.assertEqual(self._post(form, 'identity', 'application/x-www-form-urlencoded').status_code,
+                         status.HTTP_201_CREATED)
+        self.assertEqual(Event.objects.get().description, ('Scan from 10.0.0.1 ' * 200).strip())
+
+
+class EventSearchTest(TestCase):
+    """Test the Admin-only event search endpoint"""
+
+    def setUp(self):
+        """Set up Admin/Analyst users and events with fixed timestamps"""
+        self.admin_group, _ = Group.objects.get_or_create(name='Admin')
+        self.analyst_group, _ = Group.objects.get_or_create(name='Analyst')
+        self.admin_user = User.objects.create_user(username='admin', password='adminpass123')
+        self.admin_user.groups.add(self.admin_group)
+        self.analyst_user = User.objects.create_user(username='analyst', password='analystpass123')
+        self.analyst_user.groups.add(self.analyst_group)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self._get_token(self.admin_user)}')
+
+        self.start = timezone.now().replace(microsecond=0) - timedelta(days=1)
+        for index in range(25):
+            event = Event.objects.create(
+                source_name='Firewall' if index % 2 else 'IDS',
+                event_type='Port Scan',
+                severity='LOW' if index % 5 else 'MEDIUM',
+                description=f'Event {index}',
+            )
+            # Pairs of events share a timestamp, so the id breaks ties in the cursor
+            Event.objects.filter(pk=event.pk).update(timestamp=self.start + timedelta(minutes=index // 2))
+
+    def _get_token(self, user):
+        """Helper method to get JWT token for user"""
+        return str(RefreshToken.for_user(user).access_token)
+
+    def _all_pages(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(row['id'] for row in response.json()['results'])
+            url = response.json()['next']
+        return ids
+
+    def test_keyset_pages_cover_all_events_in_order(self):
+        """Test that following next links returns every event once, newest first"""
+        ids = self._all_pages('/api/events/search/?page_size=4')
+        expected = list(Event.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+        response = self.client.get('/api/events/search/?page_size=4')
+        self.assertEqual(set(response.json()), {'next', 'results'})
+        self.assertEqual(set(response.json()['results'][0]), set(EventSerializer.Meta.fields))
+
+    def test_filters(self):
+        """Test source, type, severity and time range filters"""
+        query = urlencode({
+            'source_name': 'IDS', 'severity': 'low,Medium', 'page_size': 2,
+            'until': (self.start + timedelta(minutes=6)).isoformat(),
+        })
+        ids = self._all_pages(f'/api/events/search/?{query}')
+        expected = Event.objects.filter(source_name='IDS', timestamp__lt=self.start + timedelta(minutes=6))
+        self.assertEqual(sorted(ids), sorted(expected.values_list('id', flat=True)))
+
+        since = (self.start + timedelta(minutes=10)).isoformat()
+        response = self.client.get('/api/events/search/', {'severity': 'MEDIUM', 'since': since})
+        self.assertEqual([row['description'] for row in response.json()['results']], ['Event 20'])
+        self.assertIsNone(response.json()['next'])
+
+        response = self.client.get('/api/events/search/?event_type=Unknown')
+        self.assertEqual(response.json()['results'], [])
+
+    def test_invalid_parameters(self):
+        """Test that invalid severities/datetimes return 400 and bad cursors 404"""
+        self.assertEqual(
+            self.client.get('/api/events/search/?severity=HIGH,nope').status_code, status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertEqual(self.client.get('/api/events/search/?since=yesterday').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/events/search/?cursor=garbage').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_analyst_cannot_search_events(self):
+        """Test that Analyst receives 403 Forbidden"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self._get_token(self.analyst_user)}')
+        self.assertEqual(client.get('/api/events/search/').status_code, status.HTTP_403_FORBIDDEN)
+
+
+class CompressedDescriptionTest(TestCase):
+    """Test compressed storage of event descriptions"""
+
+    def _stored(self, event):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT description FROM events_event WHERE id = %s', [event.pk])
+            return bytes(cursor.fetchone()[0])
+
+    def test_large_descriptions_are_compressed(self):
+        """Test that long text is stored zlib-compressed and short text raw, both read back unchanged"""
+        long_text = 'Blocked connection from 10.0.0.1 to 10.0.0.2:443 by rule 100. ' * 40 + 'é✓'
+        event = Event.objects.create(source_name='FW', event_type='Block', severity='LOW', description=long_text)
+        stored = self._stored(event)
+        self.assertEqual(stored[:1], b'\x01')
+        self.assertLess(len(stored), len(long_text) // 5)
+        self.assertEqual(Event.objects.get(pk=event.pk).description, long_text)
+
+        short = Event.objects.create(source_name='FW', event_type='Block', severity='LOW', description='short')
+        self.assertEqual(self._stored(short), b'\x00short')
+        self.assertEqual(Event.objects.get(pk=short.pk).description, 'short')
+
+    @override_settings(TEXT_COMPRESSION_MIN_BYTES=None)
+    def test_compression_can_be_disabled(self):
+        """Test that TEXT_COMPRESSION_MIN_BYTES=None stores text uncompressed"""
+        event = Event.objects.create(source_name='FW', event_type='Block', severity='LOW', description='x' * 5000)
+        self.assertEqual(self._stored(event), b'\x00' + b'x' * 5000)
+
+
+class ImportEventsCommandTest(TestCase):
+    """Test the historical import command"""
+
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _write(self, name, text, compress=False):
+        path = f'{self.tmp.name}/{name}'
+        with (gzip.open(path, 'wt', encoding='utf-8') if compress else open(path, 'w', encoding='utf-8')) as handle:
+            handle.write(text)
+        return path
+
+    def _import(self, *paths, **options):
+        out, err = StringIO(), StringIO()
+        call_command('import_events', *paths, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_imports_jsonl_and_csv_with_original_timestamps(self):
+        """Test that both formats are imported with their timestamps and HIGH/CRITICAL get alerts"""
+        from alerts.models import Alert
+
+        jsonl = self._write('events.jsonl.gz', '\n'.join(json.dumps(row) for row in [
+            {'source_name': 'FW', 'event_type': 'Port Scan', 'severity': 'low', 'description': 'scan',
+             'timestamp': '2025-01-02T03:04:05Z'},
+            {'source_name': 'IDS', 'event_type': 'Intrusion', 'severity': 'CRITICAL', 'description': '<b>x</b>',
+             'timestamp': 1735700000},
+        ]) + '\n\n', compress=True)
+        csv_path = self._write('events.csv', (
+            'timestamp,source_name,event_type,severity,description,extra\n'
+            '2025-01-03 10:00:00,EDR,Malware,HIGH,"two\nlines, quoted",ignored\n'
+        ))
+
+        out, err = self._import(jsonl, csv_path, workers=1)
+
+        self.assertEqual(err, '')
+        self.assertIn('Imported 3 events (0 rejected) and created 2 alerts', out)
+        scan = Event.objects.get(source_name='FW')
+        self.assertEqual(scan.severity, 'LOW')
+        self.assertEqual(scan.timestamp.isoformat(), '2025-01-02T03:04:05+00:00')
+        intrusion = Event.objects.get(source_name='IDS')
+        self.assertEqual(intrusion.description, 'x')
+        self.assertEqual(intrusion.timestamp.timestamp(), 1735700000)
+        malware = Event.objects.get(source_name='EDR')
+        self.assertEqual(malware.description, 'two\nlines, quoted')
+        self.assertEqual(malware.timestamp.isoformat(), '2025-01-03T10:00:00+00:00')
+
+        alerts = {alert.event_id: alert for alert in Alert.objects.all()}
+        self.assertEqual(set(alerts), {intrusion.id, malware.id})
+        self.assertEqual(alerts[malware.id].title, 'Alert: Malware')
+        self.assertEqual(alerts[malware.id].status, 'OPEN')
+        self.assertEqual(alerts[malware.id].created_at, malware.timestamp)
+        self.assertEqual(alerts[malware.id].description, 'two\nlines, quoted')
+
+    def test_invalid_records_are_reported_and_skipped(self):
+        """Test that rejected records name their line and the valid ones are still imported"""
+        lines = [
+            '{"source_name": "FW", "event_type": "Scan", "severity": "LOW", "description": "ok", '
+            '"timestamp": "2025-01-01T00:00:00Z"}',
+            '{"source_name": "FW", "event_type": "Scan", "severity": "BAD", "description": "x", '
+            '"timestamp": "2025-01-01T00:00:00Z"}',
+            '{"source_name": "FW", "event_type": "Scan", "severity": "LOW", "description": "x"}',
+            '{not json',
+        ]
+        path = self._write('events.jsonl', '\n'.join(lines))
+        errors_path = f'{self.tmp.name}/errors.jsonl'
+
+        out, err = self._import(path, errors_file=errors_path, workers=1)
+
+        self.assertEqual(Event.objects.count(), 1)
+        self.assertIn('Imported 1 events (3 rejected)', out)
+        self.assertIn(f'{path}:2: severity: Severity must be one of', err)
+        self.assertIn(f'{path}:3: timestamp: This field is required.', err)
+        self.assertIn(f'{path}:4: Invalid JSON', err)
+        with open(errors_path) as handle:
+            self.assertEqual([json.loads(line)['line'] for line in handle], [2, 3, 4])
+
+    def test_parallel_workers_keep_file_order(self):
+        """Test that chunks parsed by a process pool are written in file order"""
+        from alerts.models import Alert
+
+        path = self._write('events.csv', 'source_name,event_type,severity,description,timestamp\n' + ''.join(
+            f'src-{index},Scan,{"HIGH" if index % 10 == 0 else "LOW"},event {index},{1700000000 + index}\n'
+            for index in range(1000)
+        ))
+
+        self._import(path, workers=2, chunk_size=64, alert_status='RESOLVED')
+
+        names = list(Event.objects.order_by('id').values_list('source_name', flat=True))
+        self.assertEqual(names, [f'src-{index}' for index in range(1000)])
+        self.assertEqual(Alert.objects.filter(status='RESOLVED').count(), 100)
+
+        # Existing alerts are not duplicated and new events still get fresh ids
+        event = Event.objects.create(source_name='IDS', event_type='Scan', severity='HIGH', description='x')
+        self.assertEqual(Alert.objects.count(), 101)
+        self.assertGreater(event.id, max(Event.objects.exclude(pk=event.pk).values_list('id', flat=True)))
+
+    def test_inserted_ids_are_returned(self):
+        """Test that bulk-inserted rows report their own ids, over several INSERT statements"""
+        from alerts.models import Alert
+        from events.bulk import create_alerts, insert_rows
+
+        now = timezone.now()
+        ids = insert_rows(Event, ['source_name', 'event_type', 'severity', 'description', 'timestamp'],
+                          [('FW', 'Scan', 'HIGH', f'event {index}', now) for index in range(600)], return_ids=True)
+        # Saved through the API while the batch is being processed: it already has its alert
+        api_event = Event.objects.create(source_name='IDS', event_type='Scan', severity='HIGH', description='api')
+
+        self.assertEqual(len(ids), 600)
+        self.assertEqual(dict(Event.objects.filter(pk__in=ids).values_list('pk', 'description')),
+                         {pk: f'event {index}' for index, pk in enumerate(ids)})
+        self.assertEqual(create_alerts(ids), {'HIGH': 600})
+        self.assertEqual(Alert.objects.filter(event=api_event).count(), 1)
+
+    def test_missing_csv_columns_fail(self):
+        """Test that a CSV without the required columns is refused before importing anything"""
+        from django.core.management.base import CommandError
+
+        path = self._write('events.csv', 'source_name,severity\nFW,LOW\n')
+        with self.assertRaisesMessage(CommandError, 'missing column(s): event_type, description, timestamp'):
+            self._import(path, workers=1)
+        self.assertFalse(Event.objects.exists())
+
+
+class SyslogParsingTest(TestCase):
+    """Test syslog parsing and the mapping rules"""
+
+    def test_rfc5424(self):
+        """Test that RFC 5424 headers, structured data and BOM are parsed"""
+        from .syslog import parse_message
+
+        message = parse_message(
+            '<34>1 2025-10-11T22:14:15.003Z mymachine su - ID47 '
+            '[exampleSDID@32473 iut="3" eventID="1011 \\"]x\\""][meta a="b"] \ufeff\'su root\' failed'.encode()
+        )
+        self.assertEqual((message.facility, message.severity), (4, 2))
+        self.assertEqual(message.timestamp.isoformat(), '2025-10-11T22:14:15.003000+00:00')
+        self.assertEqual((message.hostname, message.app_name, message.procid, message.msgid),
+                         ('mymachine', 'su', None, 'ID47'))
+        self.assertEqual(message.structured_data, '[exampleSDID@32473 iut="3" eventID="1011 \\"]x\\""][meta a="b"]')
+        self.assertEqual(message.message, "'su root' failed")
+
+        bare = parse_message(b'<165>1 - - - - - -')
+        self.assertEqual((bare.timestamp, bare.hostname, bare.structured_data, bare.message), (None, None, None, ''))
+
+    def test_rfc3164(self):
+        """Test BSD messages with and without hostname, and the no-header fallback"""
+        from datetime import datetime, timezone as dt_timezone
+        from .syslog import parse_message
+
+        now = datetime(2026, 1, 5, tzinfo=dt_timezone.utc)
+        message = parse_message(b'<38>Dec 31 23:59:58 fw01 sshd[4242]: Failed password for root\n', now=now)
+        self.assertEqual(message.timestamp, datetime(2025, 12, 31, 23, 59, 58, tzinfo=dt_timezone.utc))
+        self.assertEqual((message.facility, message.severity), (4, 6))
+        self.assertEqual((message.hostname, message.app_name, message.procid), ('fw01', 'sshd', '4242'))
+        self.assertEqual(message.message, 'Failed password for root')
+
+        no_host = parse_message(b'<13>Jan  4 10:00:00 su: session opened', now=now)
+        self.assertEqual((no_host.hostname, no_host.app_name, no_host.message), (None, 'su', 'session opened'))
+
+        no_header = parse_message(b'link down on port 7', now=now)
+        self.assertEqual((no_header.facility, no_header.severity, no_header.timestamp), (1, 5, None))
+        self.assertEqual(no_header.message, 'link down on port 7')
+
+        for data in (b'', b'<999>x', b'<34>1 2025-10-11 host', b'<34>1 - h a p m [unterminated'):
+            with self.subTest(data=data), self.assertRaises(ValueError):
+                parse_message(data)
+
+    def test_mapping_rules(self):
+        """Test default mapping from priority and the first matching rule"""
+        from .syslog import SyslogMapper, parse_message
+
+        mapper = SyslogMapper([
+            {'app_name': 'sshd', 'message': r'Failed password for (?P<user>\S+)',
+             'event_type': 'Failed Login', 'severity': 'HIGH', 'description': '{user} on {hostname}'},
+            {'facility': ['cron', 'mail'], 'drop': True},
+        ])
+        sshd = parse_message(b'<38>Oct  1 10:00:00 fw01 sshd[1]: Failed password for root')
+        self.assertEqual(mapper.map(sshd, '10.0.0.9'), {
+            'source_name': 'fw01', 'event_type': 'Failed Login', 'severity': 'HIGH', 'description': 'root on fw01',
+        })
+        self.assertIsNone(mapper.map(parse_message(b'<78>Oct  1 10:00:00 cron: job done'), '10.0.0.9'))
+        self.assertEqual(mapper.map(parse_message(b'<3>kernel panic'), '10.0.0.9'), {
+            'source_name': '10.0.0.9', 'event_type': 'syslog', 'severity': 'HIGH', 'description': 'kernel panic',
+        })
+
+        for rule in ({'unknown': 1}, {'message': '('}, {'severity': 'URGENT'}):
+            with self.subTest(rule=rule), self.assertRaises(ValueError):
+                SyslogMapper([rule])
+
+
+class SyslogListenerTest(TransactionTestCase):
+    """Test the syslog listener end to end over loopback"""
+
+    # Restore the alert rule seeded by the migrations after the flush
+    serialized_rollback = True
+
+    def setUp(self):
+        from alerts.rules import clear_matcher_cache
+        clear_matcher_cache()
+        self.addCleanup(clear_matcher_cache)
+
+    def _run(self, scenario, **server_options):
+        import asyncio
+        from .syslog import SyslogMapper, SyslogServer
+
+        async def main():
+            server = SyslogServer(SyslogMapper(), flush_interval=0.05, **server_options)
+            await server.start('127.0.0.1', udp_port=0, tcp_port=0)
+            try:
+                await scenario(server)
+            finally:
+                await server.stop()
+            return server.stats
+
+        return asyncio.run(main())
+
+    async def _wait_for(self, server, key, count):
+        import asyncio
+        for _ in range(200):
+            if server.stats[key] >= count:
+                return
+            await asyncio.sleep(0.02)
+        self.fail(f'{key} stayed at {server.stats[key]}, expected {count}')
+
+    def test_udp_and_tcp_messages_become_events_and_alerts(self):
+        """Test that both transports and both TCP framings are stored, with alerts for HIGH/CRITICAL"""
+        import asyncio
+        import socket
+        from alerts.models import Alert
+        from monitoring import metrics
+
+        async def scenario(server):
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.sendto(b'<34>1 2025-10-11T22:14:15Z fw01 su - - - auth failure', server.udp_address)
+                sock.sendto(b'<14>Oct 11 22:14:15 fw01 app: routine', server.udp_address)
+                sock.sendto(b'<999>junk', server.udp_address)
+            reader, writer = await asyncio.open_connection(*server.tcp_address)
+            framed = b'<11>1 - ids01 snort - - - counted'
+            writer.write(str(len(framed)).encode() + b' ' + framed)
+            writer.write(b'<12>Oct 11 22:14:15 ids01 snort: lf one\n<13>lf two')
+            await writer.drain()
+            writer.close()
+            await self._wait_for(server, 'events', 5)
+
+        before = metrics.syslog_messages_dropped.snapshot()['samples']
+        stats = self._run(scenario)
+
+        self.assertEqual(stats['received'], 6)
+        self.assertEqual(stats['events'], 5)
+        self.assertEqual(stats['dropped_malformed'], 1)
+        self.assertEqual(stats['alerts'], 2)
+        self.assertEqual(
+            sorted(Event.objects.values_list('source_name', 'event_type', 'severity', 'description')),
+            [('127.0.0.1', 'syslog', 'LOW', 'lf two'),  # No header: peer address and default type
+             ('fw01', 'app', 'LOW', 'routine'), ('fw01', 'su', 'CRITICAL', 'auth failure'),
+             ('ids01', 'snort', 'HIGH', 'counted'), ('ids01', 'snort', 'MEDIUM', 'lf one')],
+        )
+        self.assertEqual(sorted(Alert.objects.values_list('severity', flat=True)), ['CRITICAL', 'HIGH'])
+        self.assertNotEqual(metrics.syslog_messages_dropped.snapshot()['samples'], before)
+
+    def test_full_queue_drops_udp_and_oversized_messages(self):
+        """Test that UDP drops beyond the queue and oversized messages are counted, not stored"""
+        async def scenario(server):
+            for index in range(5):
+                server.submit(b'<14>message %d' % index, '10.0.0.1')
+            server.submit(b'<14>' + b'x' * 200, '10.0.0.1')
+            await self._wait_for(server, 'events', 2)
+
+        stats = self._run(scenario, queue_size=2, max_message_size=100)
+
+        self.assertEqual(stats['dropped_queue_full'], 3)
+        self.assertEqual(stats['dropped_too_large'], 1)
+        self.assertEqual(Event.objects.count(), 2)
+
+
+@override_settings(EVENT_STATS_DIR=None)
+class EventStatsTest(TestCase):
+    """Test the streaming event statistics and their endpoint"""
+
+    def setUp(self):
+        from .stats import reset_stats
+        reset_stats()
+        self.addCleanup(reset_stats)
+        self.client = APIClient()
+        self.analyst = User.objects.create_user(username='analyst', password='analystpass123')
+        self.analyst.groups.add(Group.objects.get_or_create(name='Analyst')[0])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.analyst).access_token}')
+
+    def _events(self, source_name, event_type, count):
+        Event.objects.bulk_create([
+            Event(source_name=source_name, event_type=event_type, severity='LOW', description='x')
+            for _ in range(count)
+        ])
+        from .stats import record_rows
+        record_rows([(source_name, event_type, timezone.now())] * count)
+
+    def test_top_sources_and_distinct_counts(self):
+        """Test that analysts get the noisiest sources and types and distinct source counts"""
+        self._events('fw-01', 'Failed Login', 30)
+        self._events('fw-02', 'Failed Login', 20)
+        self._events('ids-01', 'Port Scan', 5)
+        Event.objects.create(source_name='ids-02', event_type='Port Scan', severity='HIGH', description='x')
+
+        with self.assertNumQueries(2):  # Authentication and the permission check only
+            response = self.client.get('/api/events/stats/?minutes=15&limit=2')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['events'], 56)
+        self.assertEqual(data['distinct_sources'], 4)
+        self.assertEqual(data['top_sources'], [
+            {'source_name': 'fw-01', 'count': 30, 'max_error': 0},
+            {'source_name': 'fw-02', 'count': 20, 'max_error': 0},
+        ])
+        self.assertEqual(data['top_event_types'], [
+            {'event_type': 'Failed Login', 'count': 50, 'max_error': 0, 'distinct_sources': 2},
+            {'event_type': 'Port Scan', 'count': 6, 'max_error': 0, 'distinct_sources': 2},
+        ])
+        self.assertEqual(data['accuracy'], {'max_count_error': 0, 'distinct_relative_error': 0.023})
+
+    def test_old_events_are_not_counted(self):
+        """Test that events older than the windows kept are left out"""
+        from .stats import record_rows
+        record_rows([('old-fw', 'Failed Login', timezone.now() - timedelta(hours=2))])
+        self.assertEqual(self.client.get('/api/events/stats/').json()['events'], 0)
+
+    def test_processes_are_merged(self):
+        """Test that the snapshots of other processes are merged and aged-out ones removed"""
+        import os
+        import tempfile
+        import time
+        from django.conf import settings
+        from .stats import EventStats
+
+        def other_process(path, source_name, now):
+            stats = EventStats(settings.EVENT_STATS_WINDOW, settings.EVENT_STATS_WINDOWS, settings.EVENT_STATS_TOP_K,
+                               settings.EVENT_STATS_HLL_PRECISION, settings.EVENT_STATS_MAX_EVENT_TYPES)
+            for _ in range(3):
+                stats.record(source_name, 'Port Scan', now, now=now)
+            with open(path, 'w') as fh:
+                json.dump(stats.to_dict(), fh)
+
+        with tempfile.TemporaryDirectory() as directory, self.settings(EVENT_STATS_DIR=directory):
+            other_process(os.path.join(directory, 'event-stats-999999999.json'), 'ids-01', time.time())
+            stale = os.path.join(directory, 'event-stats-999999998.json')
+            other_process(stale, 'ids-02', time.time() - 7200)
+            self._events('fw-01', 'Port Scan', 2)
+
+            data = self.client.get('/api/events/stats/').json()
+
+            self.assertEqual([(row['source_name'], row['count']) for row in data['top_sources']],
+                             [('ids-01', 3), ('fw-01', 2)])
+            self.assertEqual(data['top_event_types'][0]['distinct_sources'], 2)
+            self.assertFalse(os.path.exists(stale))
+
+    def test_permissions_and_validation(self):
+        """Test that users without a role are refused and parameters are checked"""
+        self.assertEqual(self.client.get('/api/events/stats/?minutes=0').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('minutes', self.client.get('/api/events/stats/?minutes=61').json())
+        self.assertEqual(self.client.post('/api/events/stats/').status_code, status.HTTP_403_FORBIDDEN)
+        other = User.objects.create_user(username='other', password='otherpass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(other).access_token}')
+        self.assertEqual(self.client.get('/api/events/stats/').status_code, status.HTTP_403_FORBIDDEN)
+
+
+# No timed flush during a test: the tests flush explicitly
+@override_settings(SOURCE_HEALTH_FLUSH_INTERVAL=3600)
+class SourceHealthTest(TestCase):
+    """Test the per-source health table and the silent-sources endpoint"""
+
+    def setUp(self):
+        from .health import reset_accumulator
+        reset_accumulator()
+        self.addCleanup(reset_accumulator)
+        self.client = APIClient()
+        self.analyst = User.objects.create_user(username='analyst', password='analystpass123')
+        self.analyst.groups.add(Group.objects.get_or_create(name='Analyst')[0])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.analyst).access_token}')
+
+    def test_batched_upserts(self):
+        """Test that flushes add counts and keep the latest event, whatever order events arrive in"""
+        from . import health
+        from .models import SourceHealth
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            Event.objects.create(source_name='fw-01', event_type='Port Scan', severity='LOW', description='x')
+            Event.objects.create(source_name='fw-01', event_type='Failed Login', severity='HIGH', description='x')
+        with self.assertNumQueries(3):  # One executemany in a savepoint
+            self.assertEqual(health.flush(), 1)
+        self.assertEqual(health.flush(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            health.record_rows([('fw-01', 'Old Event', 'CRITICAL', now - timedelta(days=30)),
+                                ('ids-01', 'Port Scan', 'MEDIUM', now)])
+        health.flush()
+
+        row = SourceHealth.objects.get(source_name='fw-01')
+        self.assertEqual(row.last_event_type, 'Failed Login')
+        self.assertGreaterEqual(row.last_seen, now)
+        self.assertEqual(row.first_seen, now - timedelta(days=30))
+        self.assertEqual(row.severity_counts, {'LOW': 1, 'MEDIUM': 0, 'HIGH': 1, 'CRITICAL': 1})
+        self.assertEqual(SourceHealth.objects.count(), 2)
+
+    def test_only_committed_events_are_counted(self):
+        """Test that events are added once their transaction commits, and not when it rolls back"""
+        from . import health
+        from .models import SourceHealth
+        with self.captureOnCommitCallbacks() as callbacks:
+            Event.objects.create(source_name='fw-01', event_type='Port Scan', severity='LOW', description='x')
+        self.assertEqual(health.flush(), 0)
+        callbacks[0]()
+        self.assertEqual(health.flush(), 1)
+        self.assertEqual(SourceHealth.objects.get().source_name, 'fw-01')
+
+    def test_rebuild(self):
+        """Test that rebuilding from the events table matches what ingestion records"""
+        from . import health
+        from .models import SourceHealth
+        with self.captureOnCommitCallbacks(execute=True):
+            for source_name, event_type, severity in [('fw-01', 'Port Scan', 'LOW'),
+                                                      ('fw-01', 'Failed Login', 'HIGH'),
+                                                      ('ids-01', 'Port Scan', 'MEDIUM')]:
+                Event.objects.create(source_name=source_name, event_type=event_type, severity=severity,
+                                     description='x')
+        health.flush()
+        fields = ['source_name', 'first_seen', 'last_seen', 'last_event_type', 'low_count', 'medium_count',
+                  'high_count', 'critical_count']
+        recorded = list(SourceHealth.objects.order_by('source_name').values(*fields))
+
+        health.rebuild()
+
+        self.assertEqual(list(SourceHealth.objects.order_by('source_name').values(*fields)), recorded)
+
+    def test_silent_sources(self):
+        """Test that sources silent longer than the threshold are listed, longest silent first"""
+        from . import health
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            health.record_rows([
+                ('fw-01', 'Port Scan', 'LOW', now - timedelta(hours=2)),
+                ('ids-01', 'Port Scan', 'LOW', now - timedelta(minutes=30)),
+                ('proxy-01', 'Web Request', 'LOW', now - timedelta(minutes=5)),
+            ])
+
+        # Authentication, the permission check, this process's pending rows (one executemany
+        # in a savepoint), count and page
+        with self.assertNumQueries(7):
+            response = self.client.get('/api/events/sources/silent/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()['results']
+        self.assertEqual([row['source_name'] for row in results], ['fw-01', 'ids-01'])
+        self.assertEqual(results[0]['last_event_type'], 'Port Scan')
+        self.assertGreaterEqual(results[0]['silent_seconds'], 7200)
+        self.assertEqual(results[0]['severity_counts'], {'LOW': 1, 'MEDIUM': 0, 'HIGH': 0, 'CRITICAL': 0})
+        response = self.client.get('/api/events/sources/silent/?minutes=60')
+        self.assertEqual([row['source_name'] for row in response.json()['results']], ['fw-01'])
+        self.assertEqual(self.client.get('/api/events/sources/silent/?minutes=0').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+
+class SourceHealthFlusherTest(TransactionTestCase):
+    """Test that pending source health is written on a timer"""
+    serialized_rollback = True  # Migrations seed the default alert rules
+
+    def setUp(self):
+        from .health import reset_accumulator
+        reset_accumulator()
+        self.addCleanup(reset_accumulator)
+
+    @override_settings(SOURCE_HEALTH_FLUSH_INTERVAL=0.05)
+    def test_flushed_without_more_traffic(self):
+        """Test that an idle process still writes its last events within the interval"""
+        from .models import SourceHealth
+        Event.objects.create(source_name='fw-01', event_type='Port Scan', severity='LOW', description='x')
+
+        def written():
+            try:
+                return SourceHealth.objects.exists()
+            except OperationalError:  # The test database's tables are locked while the flusher writes
+                return False
+
+        deadline = time.monotonic() + 5
+        while not written() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(SourceHealth.objects.get().low_count, 1)
+
+
+class IdempotentIngestionTest(TestCase):
+    """Test that retried submissions with an idempotency key return the original event"""
+
+    def setUp(self):
+        from .idempotency import reset_recent_keys
+        reset_recent_keys()
+        self.addCleanup(reset_recent_keys)
+        admin_group, _ = Group.objects.get_or_create(name='Admin')
+        user = User.objects.create_user(username='admin', password='adminpass123')
+        user.groups.add(admin_group)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        self.payload = {
+            'source_name': 'Firewall', 'event_type': 'Intrusion Attempt', 'severity': 'HIGH',
+            'description': 'Blocked connection from 10.0.0.1',
+        }
+
+    def test_retry_is_replayed(self):
+        """Test that a retry creates no second event or alert and is answered from memory"""
+        from alerts.models import Alert
+        headers = {'HTTP_IDEMPOTENCY_KEY': '7f1c9e2a-retry'}
+        first = self.client.post('/api/events/', self.payload, format='json', **headers)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', first)
+
+        with self.assertNumQueries(2):  # Authentication and the permission check only
+            retry = self.client.post('/api/events/', self.payload, format='json', **headers)
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Event.objects.get().idempotency_key, '7f1c9e2a-retry')
+        self.assertEqual(Alert.objects.count(), 1)
+
+    def test_key_first_sent_to_another_process(self):
+        """Test that the unique index catches a key this process has not seen"""
+        from .idempotency import reset_recent_keys
+        payload = {**self.payload, 'client_id': 'sensor-7:1042'}
+        first = self.client.post('/api/events/', payload, format='json')
+        reset_recent_keys()  # As a worker that did not receive the first attempt
+
+        retry = self.client.post('/api/events/', payload, format='json')
+        retry_again = self.client.post('/api/events/', payload, format='json')
+
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry_again.json(), first.json())
+        self.assertEqual(Event.objects.count(), 1)
+
+    def test_keys_are_optional_and_checked(self):
+        """Test that events without a key are never deduplicated and malformed keys are refused"""
+        for _ in range(2):
+            self.assertEqual(self.client.post('/api/events/', self.payload, format='json').status_code,
+                             status.HTTP_201_CREATED)
+        self.assertEqual(Event.objects.count(), 2)
+        response = self.client.post('/api/events/', self.payload, format='json', HTTP_IDEMPOTENCY_KEY='two words')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('client_id', response.json())
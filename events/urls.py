@@ -1,6 +1,9 @@
 from django.urls import path
-from .views import create_event
+from .views import EventSearchView, SilentSourcesView, create_event, event_stats
 
 urlpatterns = [
     path('events/', create_event, name='create_event'),
+    path('events/search/', EventSearchView.as_view(), name='event_search'),
+    path('events/stats/', event_stats, name='event_stats'),
+    path('events/sources/silent/', SilentSourcesView.as_view(), name='silent_sources'),
 ]
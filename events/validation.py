@@ -0,0 +1,125 @@
+"""
+Lean validation for event ingestion.
+
+``validate_event_payload`` applies exactly the rules of ``EventSerializer``
+(DRF CharField coercion, trimming and validators, the ``validate_*`` methods
+and the cross-field check) and returns the same normalized values and error
+messages, without building a serializer and its field pipeline per event.
+HTML stripping, the expensive part, only runs when a value contains ``<``
+(``strip_tags`` returns any other value unchanged).
+
+``EventSerializer`` remains the schema for the API docs and for output.
+"""
+import re
+from collections.abc import Mapping
+
+from django.core.validators import ProhibitNullCharactersValidator
+from django.utils.html import strip_tags
+from rest_framework.fields import CharField, Field
+from rest_framework.serializers import Serializer
+from rest_framework.settings import api_settings
+from rest_framework.validators import ProhibitSurrogateCharactersValidator
+
+from .models import Event
+
+_MISSING = object()
+_SURROGATE_RE = re.compile('[\ud800-\udfff]')
+_VALID_SEVERITIES = [choice[0] for choice in Event.SEVERITY_CHOICES]
+
+# (field name, max_length) in EventSerializer.Meta.fields order - errors keep that order
+_FIELDS = (
+    ('source_name', 200),
+    ('event_type', 200),
+    ('severity', None),
+    ('description', None),
+)
+
+
+def _message(messages, key, **params):
+    message = str(messages[key])
+    return message.format(**params) if params else message
+
+
+def _clean_char(value, max_length):
+    """DRF CharField(trim_whitespace=True).run_validation -> (value, [errors])"""
+    if value is _MISSING:
+        return None, [_message(Field.default_error_messages, 'required')]
+    if value is None:
+        return None, [_message(Field.default_error_messages, 'null')]
+    if value == '' or str(value).strip() == '':
+        return None, [_message(CharField.default_error_messages, 'blank')]
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return None, [_message(CharField.default_error_messages, 'invalid')]
+
+    value = str(value).strip()
+    errors = []
+    if max_length is not None and len(value) > max_length:
+        errors.append(_message(CharField.default_error_messages, 'max_length', max_length=max_length))
+    if '\x00' in value:
+        errors.append(str(ProhibitNullCharactersValidator.message))
+    surrogate = _SURROGATE_RE.search(value)
+    if surrogate:
+        errors.append(ProhibitSurrogateCharactersValidator.message.format(code_point=ord(surrogate.group())))
+    return value, errors
+
+
+def _sanitize(value):
+    # strip_tags only changes text containing '<'
+    return strip_tags(value) if '<' in value else value
+
+
+def _validate_text(label, max_length=None):
+    def validate(value):
+        cleaned = _sanitize(value)
+        if max_length is not None and len(cleaned) > max_length:
+            return None, f'{label} cannot exceed {max_length} characters.'
+        return cleaned, None
+    return validate
+
+
+def _validate_severity(value):
+    value_upper = value.upper()
+    if value_upper not in _VALID_SEVERITIES:
+        return None, f'Severity must be one of: {", ".join(_VALID_SEVERITIES)}. Received: "{value}".'
+    return value_upper, None
+
+
+_FIELD_VALIDATORS = {
+    'source_name': _validate_text('Source name', 200),
+    'event_type': _validate_text('Event type', 200),
+    'severity': _validate_severity,
+    'description': _validate_text('Description'),
+}
+
+
+def validate_event_payload(data):
+    """
+    Validate one event payload (a dict or QueryDict).
+
+    Returns ``(validated_data, None)`` on success or ``(None, errors)`` where
+    ``errors`` has the same shape and messages as ``EventSerializer.errors``.
+    """
+    if not isinstance(data, Mapping):
+        message = _message(Serializer.default_error_messages, 'invalid', datatype=type(data).__name__)
+        return None, {api_settings.NON_FIELD_ERRORS_KEY: [message]}
+
+    validated = {}
+    errors = {}
+    for name, max_length in _FIELDS:
+        value, field_errors = _clean_char(data[name] if name in data else _MISSING, max_length)
+        if not field_errors:
+            value, error = _FIELD_VALIDATORS[name](value)
+            if error:
+                field_errors = [error]
+        if field_errors:
+            errors[name] = field_errors
+        else:
+            validated[name] = value
+    if errors:
+        return None, errors
+
+    # EventSerializer.validate(): markup-only values are empty after stripping
+    for name, _ in _FIELDS:
+        if not validated[name]:
+            return None, {name: [f'{name} is required.']}
+    return validated, None
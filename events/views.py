@@ -1,12 +1,26 @@
 import logging
-from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import generics, status
+from rest_framework.decorators import api_view, parser_classes, permission_classes, throttle_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
 from rest_framework.response import Response
 from rest_framework.throttling import UserRateThrottle
-from drf_spectacular.utils import extend_schema, OpenApiParameter
-from .models import Event
-from .serializers import EventSerializer
-from .permissions import EventPermission
+from drf_spectacular.utils import extend_schema, inline_serializer, OpenApiParameter
+from rest_framework import serializers
+from monitoring import metrics
+from threat_monitor.parsers import MessagePackParser
+from threat_monitor.query_params import datetime_param
+from . import health, idempotency, stats
+from .models import Event, SourceHealth
+from .pagination import KeysetPagination
+from .serializers import EventSerializer, SourceHealthSerializer
+from .validation import validate_event_payload
+from .permissions import EventPermission, EventStatsPermission
 
 logger = logging.getLogger('events')
 
@@ -18,12 +32,22 @@ class EventIngestionThrottle(UserRateThrottle):
 
 @extend_schema(
     summary='Create a new security event',
-    description='Ingest a new security event. Admin-only access. Rate limited to 100 requests per minute.',
+    description=(
+        'Ingest a new security event. Admin-only access. Rate limited to 100 requests per minute. '
+        'The body may be JSON or MessagePack (Content-Type: application/msgpack). '
+        'With an Idempotency-Key header (or a "client_id" field), a retried submission returns the '
+        'original event with an Idempotent-Replayed header instead of creating it again.'
+    ),
+    parameters=[
+        OpenApiParameter(idempotency.HEADER, location=OpenApiParameter.HEADER, required=False, type=str,
+                         description='Unique per event, e.g. a UUID; retries send the same key'),
+    ],
     request=EventSerializer,
     responses={201: EventSerializer, 400: EventSerializer, 403: None},
     tags=['Events'],
 )
 @api_view(['POST'])
+@parser_classes([*api_settings.DEFAULT_PARSER_CLASSES, MessagePackParser])
 @permission_classes([EventPermission])
 @throttle_classes([EventIngestionThrottle])
 def create_event(request):
@@ -31,19 +55,222 @@ def create_event(request):
     POST endpoint to create a new event.
     Admin-only access. Analyst receives 403 Forbidden.
     Rate limited to 100 requests per minute.
+    Payloads are checked with validate_event_payload, which applies the
+    EventSerializer rules without the serializer field pipeline.
+    Accepts JSON, form data and MessagePack (Content-Type: application/msgpack).
+    Keyed submissions are idempotent (events/idempotency.py): a retry is
+    answered from this process's recent responses when possible, and the
+    unique index on the key stops duplicates from any process.
     """
-    serializer = EventSerializer(data=request.data)
-    if serializer.is_valid(raise_exception=False):
-        event = serializer.save()
+    key, key_error = idempotency.get_key(request)
+    if key_error:
+        metrics.event_validation_rejects.inc()
+        return Response({idempotency.FIELD: [key_error]}, status=status.HTTP_400_BAD_REQUEST)
+    recent = idempotency.get_recent_keys() if key else None
+    if key:
+        data = recent.response(key)
+        if data is not None:
+            return _replayed(data, 'cache')
+
+    validated_data, errors = validate_event_payload(request.data)
+    if errors is None:
+        if key and recent.may_exist(key):
+            event = Event.objects.filter(idempotency_key=key).first()
+            if event is not None:
+                return _replayed(_remember(recent, key, event), 'database')
+        try:
+            # A savepoint, so that a duplicate key leaves any outer transaction usable
+            with transaction.atomic():
+                event = Event.objects.create(**validated_data, idempotency_key=key)
+        except IntegrityError:
+            # The key was first sent to another process (or raced with this one)
+            event = Event.objects.filter(idempotency_key=key).first() if key else None
+            if event is None:
+                raise
+            return _replayed(_remember(recent, key, event), 'database')
+        data = _remember(recent, key, event) if key else EventSerializer(event).data
+        metrics.events_ingested.inc(severity=event.severity)
         logger.info(
-            f'Event ingested: id={event.id}, type={event.event_type}, '
-            f'severity={event.severity}, source={event.source_name}, '
-            f'user={request.user.username}'
+            'Event ingested',
+            extra={
+                'event_id': event.id,
+                'event_type': event.event_type,
+                'severity': event.severity,
+                'source': event.source_name,
+                'user': request.user.username,
+            },
         )
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(data, status=status.HTTP_201_CREATED)
     
+    metrics.event_validation_rejects.inc()
+    # Only the failing field names are logged - not the submitted values or messages
     logger.warning(
-        f'Event ingestion failed: validation_errors={serializer.errors}, '
-        f'user={request.user.username}'
+        'Event ingestion failed',
+        extra={'error_fields': sorted(errors), 'user': request.user.username},
     )
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+    return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _remember(recent, key, event):
+    data = EventSerializer(event).data
+    recent.remember(key, data)
+    return data
+
+
+def _replayed(data, lookup):
+    metrics.events_replayed.inc(lookup=lookup)
+    return Response(data, status=status.HTTP_201_CREATED, headers={'Idempotent-Replayed': 'true'})
+
+
+@extend_schema(
+    summary='Search events',
+    description=(
+        'Admin-only. Filter events by source, type, severity and time range, newest first. '
+        'Pages are keyset-paginated: follow the "next" link; there is no total count.'
+    ),
+    parameters=[
+        OpenApiParameter('source_name', description='Exact source name', required=False, type=str),
+        OpenApiParameter('event_type', description='Exact event type', required=False, type=str),
+        OpenApiParameter('severity', description='Severity, or several comma-separated', required=False, type=str),
+        OpenApiParameter('since', description='Events at or after this ISO 8601 time', required=False, type=str),
+        OpenApiParameter('until', description='Events before this ISO 8601 time', required=False, type=str),
+    ],
+    tags=['Events'],
+)
+class EventSearchView(generics.ListAPIView):
+    """
+    GET endpoint to query events. Admin-only access.
+    Every filter combination is served by one of the (column, timestamp, id)
+    indexes, and KeysetPagination continues from the last row instead of
+    counting or offsetting.
+    """
+    serializer_class = EventSerializer
+    permission_classes = [EventPermission]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = Event.objects.all()
+        for name in ('source_name', 'event_type'):
+            value = params.get(name)
+            if value:
+                queryset = queryset.filter(**{name: value})
+
+        severity = params.get('severity')
+        if severity:
+            valid_severities = [choice[0] for choice in Event.SEVERITY_CHOICES]
+            requested = {value.strip().upper() for value in severity.split(',')}
+            invalid = requested - set(valid_severities)
+            if invalid:
+                raise ValidationError({
+                    'severity': [f'Severity must be one of: {", ".join(valid_severities)}. '
+                                 f'Received: "{", ".join(sorted(invalid))}".']
+                })
+            queryset = queryset.filter(severity__in=requested)
+
+        since, until = datetime_param(self.request, 'since'), datetime_param(self.request, 'until')
+        if since is not None:
+            queryset = queryset.filter(timestamp__gte=since)
+        if until is not None:
+            queryset = queryset.filter(timestamp__lt=until)
+        return queryset
+
+
+def _int_param(request, name, default, minimum, maximum):
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        number = None
+    if number is None or not minimum <= number <= maximum:
+        raise ValidationError({name: [f'Expected a whole number from {minimum} to {maximum}. Received: "{value}".']})
+    return number
+
+
+@extend_schema(
+    summary='Event statistics',
+    description=(
+        'Admin and Analyst. Noisiest sources and event types and distinct source counts over the last '
+        'minutes, from streaming sketches kept at ingestion (no query on the events table). Counts may be '
+        'over-estimated by at most "max_error" each; distinct counts are estimates '
+        '(see "accuracy").'
+    ),
+    parameters=[
+        OpenApiParameter('minutes', description='Time range, up to the windows kept (default: 60)',
+                         required=False, type=int),
+        OpenApiParameter('limit', description='Sources and event types listed (default: 20)', required=False,
+                         type=int),
+    ],
+    responses={200: inline_serializer('EventStats', {
+        'from': serializers.DateTimeField(),
+        'to': serializers.DateTimeField(),
+        'events': serializers.IntegerField(),
+        'distinct_sources': serializers.IntegerField(),
+        'top_sources': inline_serializer('EventStatsSource', {
+            'source_name': serializers.CharField(),
+            'count': serializers.IntegerField(),
+            'max_error': serializers.IntegerField(),
+        }, many=True),
+        'top_event_types': inline_serializer('EventStatsEventType', {
+            'event_type': serializers.CharField(),
+            'count': serializers.IntegerField(),
+            'max_error': serializers.IntegerField(),
+            'distinct_sources': serializers.IntegerField(allow_null=True),
+        }, many=True),
+        'accuracy': inline_serializer('EventStatsAccuracy', {
+            'max_count_error': serializers.IntegerField(),
+            'distinct_relative_error': serializers.FloatField(),
+        }),
+    })},
+    tags=['Events'],
+)
+@api_view(['GET'])
+@permission_classes([EventStatsPermission])
+def event_stats(request):
+    """
+    GET endpoint for the streaming event statistics (events/stats.py).
+    Windows are rounded to EVENT_STATS_WINDOW seconds; the current window is
+    included.
+    """
+    retention = settings.EVENT_STATS_WINDOW * settings.EVENT_STATS_WINDOWS // 60
+    minutes = _int_param(request, 'minutes', min(60, retention), 1, retention)
+    limit = _int_param(request, 'limit', 20, 1, settings.EVENT_STATS_TOP_K)
+    data = stats.summary(minutes, limit)
+    for name in ('from', 'to'):
+        data[name] = datetime.fromtimestamp(data[name], tz=dt_timezone.utc).isoformat()
+    return Response(data)
+
+
+@extend_schema(
+    summary='Silent sources',
+    description=(
+        'Admin and Analyst. Sources whose last event is older than "minutes", longest silent first, '
+        'from the per-source health table kept at ingestion (no query on the events table).'
+    ),
+    parameters=[
+        OpenApiParameter('minutes', description='Silence threshold (default: 15, max: 10080)', required=False,
+                         type=int),
+    ],
+    tags=['Events'],
+)
+class SilentSourcesView(generics.ListAPIView):
+    """
+    GET endpoint listing silent sources (events/health.py). This process's
+    pending health rows are written first; those of other processes are at
+    most SOURCE_HEALTH_FLUSH_INTERVAL seconds behind.
+    """
+    serializer_class = SourceHealthSerializer
+    permission_classes = [EventStatsPermission]
+
+    def get_queryset(self):
+        minutes = _int_param(self.request, 'minutes', 15, 1, 7 * 24 * 60)
+        health.flush()
+        self.now = timezone.now()
+        return SourceHealth.objects.filter(last_seen__lt=self.now - timedelta(minutes=minutes)).order_by(
+            'last_seen', 'source_name',
+        )
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'now': self.now}
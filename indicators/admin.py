@@ -0,0 +1,19 @@
+from django.contrib import admin
+from .models import Indicator, IndicatorMatch
+
+
+@admin.register(Indicator)
+class IndicatorAdmin(admin.ModelAdmin):
+    list_display = ['value', 'kind', 'feed', 'updated_at']
+    list_filter = ['kind', 'feed']
+    search_fields = ['value']
+    readonly_fields = ['created_at', 'updated_at']
+    show_full_result_count = False
+
+
+@admin.register(IndicatorMatch)
+class IndicatorMatchAdmin(admin.ModelAdmin):
+    list_display = ['value', 'event', 'indicator', 'created_at']
+    search_fields = ['value']
+    raw_id_fields = ['event', 'indicator']
+    show_full_result_count = False
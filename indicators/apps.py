@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class IndicatorsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'indicators'
+
+    def ready(self):
+        import indicators.signals  # noqa
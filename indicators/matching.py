@@ -0,0 +1,162 @@
+"""
+Indicator-of-compromise matching over event descriptions.
+
+``IndicatorMatcher`` finds the watchlist indicators occurring in a text:
+
+- IPv4 addresses, domains and hashes are kept in a dict, and the
+  description's tokens (words of letters, digits, ``.``, ``-`` and ``_``)
+  are looked up in it, so ``10.0.0.1`` does not match ``10.0.0.10``; a
+  token also matches the domains it is a subdomain of;
+- other values (URLs, IPv6 addresses, free text such as tool names) are
+  searched as substrings by an Aho-Corasick automaton
+  (alerts/automaton.py), so ``mimikatz`` matches ``invoke-mimikatz``.
+
+Either way the cost per description grows with its length, not with the
+size of the watchlist.
+
+``get_matcher`` keeps one matcher per process. It is built from the
+database on first use; after settings.INDICATOR_CACHE_TTL seconds, or once
+an indicator is saved or deleted here, a background thread checks the count
+and latest update of the indicators and, when they changed, builds a new
+matcher and swaps it in. Until then events are matched against the
+previous one, so a reload of a large watchlist never blocks ingestion.
+"""
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Count, Max
+
+from alerts.automaton import Automaton
+from monitoring import metrics
+from .models import Indicator, IndicatorMatch
+
+logger = logging.getLogger('events')
+
+TOKEN = re.compile(r'[0-9a-z_](?:[0-9a-z_.\-]*[0-9a-z_])?')
+# Kinds matched as whole tokens; the others are matched as substrings
+TOKEN_KINDS = {'IP', 'DOMAIN', 'HASH'}
+
+
+class IndicatorMatcher:
+    def __init__(self, indicators):
+        """``indicators``: (id, normalized value, kind) tuples"""
+        self._tokens = {}
+        self._domains = {}
+        needles = {}
+        for pk, value, kind in indicators:
+            if kind in TOKEN_KINDS and TOKEN.fullmatch(value):
+                self._tokens[value] = pk
+                if kind == 'DOMAIN':
+                    self._domains[value] = pk
+            elif value:
+                needles[value] = pk
+        self._automaton = Automaton(needles)
+        self._needles = [(needle, needles[needle]) for needle in self._automaton.needles]
+        self.size = len(self._tokens) + len(self._needles)
+
+    def __len__(self):
+        return self.size
+
+    def scan(self, text):
+        """The indicators occurring in ``text``, as {value: indicator id}"""
+        found = {}
+        tokens, domains = self._tokens, self._domains
+        if tokens:
+            for token in TOKEN.findall(text.casefold()):
+                pk = tokens.get(token)
+                if pk is not None:
+                    found[token] = pk
+                elif domains and '.' in token:
+                    # sub.example.com matches a watched example.com
+                    dot = token.find('.')
+                    while dot != -1:
+                        pk = domains.get(token[dot + 1:])
+                        if pk is not None:
+                            found[token[dot + 1:]] = pk
+                            break
+                        dot = token.find('.', dot + 1)
+        if self._automaton:
+            for index in self._automaton.search(text):
+                needle, pk = self._needles[index]
+                found[needle] = pk
+        return found
+
+
+def record_matches(matches):
+    """Store ``(event id, {value: indicator id})`` pairs as IndicatorMatch rows"""
+    rows = [
+        IndicatorMatch(event_id=event_id, indicator_id=pk, value=value)
+        for event_id, found in matches for value, pk in found.items()
+    ]
+    if rows:
+        IndicatorMatch.objects.bulk_create(rows, ignore_conflicts=True)
+        metrics.indicator_matches.inc(len(rows))
+
+
+_lock = threading.Lock()
+_state = {'matcher': None, 'fingerprint': None, 'expires': 0.0, 'refreshing': False}
+
+
+def _fingerprint():
+    summary = Indicator.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+    return summary['count'], summary['updated']
+
+
+def _build():
+    # Read before the indicators, so a change made meanwhile shows up at the next check
+    fingerprint = _fingerprint()
+    matcher = IndicatorMatcher(Indicator.objects.values_list('pk', 'value', 'kind').iterator(chunk_size=10000))
+    return matcher, fingerprint
+
+
+def _refresh():
+    try:
+        fingerprint = _fingerprint()
+        if fingerprint != _state['fingerprint']:
+            started = time.monotonic()
+            matcher, fingerprint = _build()
+            with _lock:
+                _state['matcher'], _state['fingerprint'] = matcher, fingerprint
+            logger.info('Reloaded indicators', extra={
+                'indicators': len(matcher), 'duration_ms': round((time.monotonic() - started) * 1000),
+            })
+    except DatabaseError:
+        logger.warning('Reloading indicators failed', exc_info=True)
+    finally:
+        connection.close()  # This thread's own connection
+        with _lock:
+            _state['expires'] = time.monotonic() + settings.INDICATOR_CACHE_TTL
+            _state['refreshing'] = False
+
+
+def get_matcher():
+    """This process's indicator matcher (see the module docstring)"""
+    matcher = _state['matcher']
+    if matcher is None:
+        with _lock:
+            if _state['matcher'] is None:
+                _state['matcher'], _state['fingerprint'] = _build()
+                _state['expires'] = time.monotonic() + settings.INDICATOR_CACHE_TTL
+            return _state['matcher']
+    if time.monotonic() >= _state['expires'] and not _state['refreshing']:
+        with _lock:
+            if _state['refreshing']:
+                return matcher
+            _state['refreshing'] = True
+        threading.Thread(target=_refresh, name='indicator-reload', daemon=True).start()
+    return matcher
+
+
+def reload_soon():
+    """Check for changes at the next use instead of after the TTL"""
+    _state['expires'] = 0.0
+
+
+def clear_indicator_cache():
+    """Drop the matcher; the next use builds one in the calling thread"""
+    with _lock:
+        _state['matcher'] = None
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.1 on 2026-10-19 07:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('events', '0003_compress_event_description'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Indicator',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.CharField(max_length=500, unique=True)),
+                ('kind', models.CharField(blank=True, choices=[('IP', 'IP address'), ('DOMAIN', 'Domain'), ('URL', 'URL'), ('HASH', 'File hash'), ('OTHER', 'Other text')], help_text='Detected when blank', max_length=10)),
+                ('feed', models.CharField(db_index=True, help_text='Feed (watchlist) the indicator comes from', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IndicatorMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.CharField(max_length=500)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='indicator_matches', to='events.event')),
+                ('indicator', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='matches', to='indicators.indicator')),
+            ],
+        ),
+    ]
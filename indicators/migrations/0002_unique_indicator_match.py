@@ -0,0 +1,29 @@
+# Generated by Django 4.2.1 on 2026-10-19 08:37
+
+from django.db import migrations, models
+
+
+def remove_duplicate_matches(apps, schema_editor):
+    """Keep the first row of each (event, indicator) pair"""
+    IndicatorMatch = apps.get_model('indicators', 'IndicatorMatch')
+    first_ids = (
+        IndicatorMatch.objects.filter(indicator__isnull=False).order_by()
+        .values('event', 'indicator').annotate(first_id=models.Min('id')).values('first_id')
+    )
+    IndicatorMatch.objects.filter(indicator__isnull=False).exclude(id__in=first_ids).delete()
+
+
+class Migration(migrations.Migration):
+    """One match per event and indicator"""
+
+    dependencies = [
+        ('indicators', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_matches, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='indicatormatch',
+            constraint=models.UniqueConstraint(fields=('event', 'indicator'), name='unique_indicator_match'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+import ipaddress
+import re
+
+from django.db import models
+
+_HASH = re.compile(r'[0-9a-f]{32}|[0-9a-f]{40}|[0-9a-f]{64}|[0-9a-f]{128}')
+_DOMAIN = re.compile(r'(?:[a-z0-9_](?:[a-z0-9_-]*[a-z0-9_])?\.)+[a-z][a-z0-9-]*[a-z0-9]')
+
+
+def normalize_value(value):
+    return value.strip().casefold()
+
+
+def detect_kind(value):
+    """The kind of a normalized indicator value"""
+    try:
+        ipaddress.ip_address(value)
+        return 'IP'
+    except ValueError:
+        pass
+    if _HASH.fullmatch(value):
+        return 'HASH'
+    if '://' in value:
+        return 'URL'
+    if _DOMAIN.fullmatch(value):
+        return 'DOMAIN'
+    return 'OTHER'
+
+
+class Indicator(models.Model):
+    """Watchlist entry searched for in event descriptions (see indicators/matching.py)"""
+
+    KIND_CHOICES = [
+        ('IP', 'IP address'),
+        ('DOMAIN', 'Domain'),
+        ('URL', 'URL'),
+        ('HASH', 'File hash'),
+        ('OTHER', 'Other text'),
+    ]
+
+    # Stored stripped and casefolded; matching is case-insensitive
+    value = models.CharField(max_length=500, unique=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, blank=True, help_text='Detected when blank')
+    feed = models.CharField(max_length=100, db_index=True, help_text='Feed (watchlist) the indicator comes from')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        self.value = normalize_value(self.value)
+        if not self.kind:
+            self.kind = detect_kind(self.value)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.value
+
+
+class IndicatorMatch(models.Model):
+    """An indicator found in an event's description"""
+
+    event = models.ForeignKey('events.Event', on_delete=models.CASCADE, related_name='indicator_matches')
+    # Kept when the indicator is later removed from its feed
+    indicator = models.ForeignKey(Indicator, on_delete=models.SET_NULL, null=True, related_name='matches')
+    value = models.CharField(max_length=500)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # An event matched twice (e.g. by a bulk sweep and the signal) keeps one row
+            models.UniqueConstraint(fields=['event', 'indicator'], name='unique_indicator_match'),
+        ]
+
+    def __str__(self):
+        return f'{self.value} in event {self.event_id}'
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .matching import reload_soon
+
+
+@receiver(post_save, sender='indicators.Indicator')
+@receiver(post_delete, sender='indicators.Indicator')
+def reload_indicators(sender, **kwargs):
+    """Rebuild the matcher in the background at the next event"""
+    reload_soon()
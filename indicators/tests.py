@@ -0,0 +1,164 @@
+import json
+import os
+import tempfile
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from alerts.models import Alert
+from alerts.rules import clear_matcher_cache
+from events.bulk import create_alerts, insert_rows
+from events.models import Event
+from .matching import IndicatorMatcher, clear_indicator_cache, get_matcher, record_matches, reload_soon
+from .models import Indicator, IndicatorMatch, detect_kind
+
+
+class IndicatorTestMixin:
+    def _feed(self, name, lines):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, name)
+        with open(path, 'w') as handle:
+            handle.write('\n'.join(lines) + '\n')
+        return path
+
+    def _load(self, *args, **options):
+        out = StringIO()
+        call_command('load_indicators', *args, stdout=out, **options)
+        return out.getvalue()
+
+
+class IndicatorMatcherTest(TestCase):
+    """Test what the indicator matcher finds in a description"""
+
+    def setUp(self):
+        values = ['10.0.0.1', 'evil.example', 'd41d8cd98f00b204e9800998ecf8427e',
+                  'http://bad.example/payload.exe', '2001:db8::1', 'cobalt strike', 'mimikatz']
+        self.ids = {value: index for index, value in enumerate(values)}
+        self.matcher = IndicatorMatcher((index, value, detect_kind(value)) for value, index in self.ids.items())
+
+    def test_tokens_and_substrings(self):
+        """Test that token values and other values are both found, case-insensitively"""
+        found = self.matcher.scan(
+            'Beacon to 10.0.0.1:443 (cdn.EVIL.example), dropped D41D8CD98F00B204E9800998ECF8427E '
+            'from http://bad.example/payload.exe; Cobalt Strike over [2001:db8::1], ran mimikatz',
+        )
+        self.assertEqual(found, self.ids)
+
+    def test_other_values_match_inside_tokens(self):
+        """Test that a free-text value is found inside longer words, like a file or command name"""
+        for description in ('started mimikatz.exe', 'powershell invoke-mimikatz -dumpcreds', 'MIMIKATZ_x64'):
+            self.assertEqual(self.matcher.scan(description), {'mimikatz': self.ids['mimikatz']})
+
+    def test_no_partial_tokens(self):
+        """Test that a token value does not match inside a longer token"""
+        self.assertEqual(self.matcher.scan('10.0.0.10 notevil.example evil.example.org d41d8cd98f00b204'), {})
+        self.assertEqual(len(self.matcher), 7)
+
+
+class IndicatorLoadTest(IndicatorTestMixin, TestCase):
+    """Test the load_indicators command"""
+
+    def test_load_and_replace(self):
+        """Test that feed files are loaded with detected kinds and --replace drops stale values"""
+        path = self._feed('abuse.txt', [
+            '# IP and domain blocklist', '10.0.0.1', ' Evil.Example ', '', '10.0.0.1',
+            'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855', 'x' * 600,
+        ])
+        output = self._load(path)
+        self.assertIn('abuse: 3 indicators loaded, 0 removed, 1 longer than 500 characters skipped', output)
+        self.assertEqual(dict(Indicator.objects.values_list('value', 'kind')), {
+            '10.0.0.1': 'IP', 'evil.example': 'DOMAIN',
+            'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855': 'HASH',
+        })
+
+        path = self._feed('abuse.txt', ['10.0.0.1', 'http://bad.example/'])
+        output = self._load(path, replace=True)
+        self.assertIn('abuse: 2 indicators loaded, 2 removed', output)
+        self.assertEqual(dict(Indicator.objects.values_list('value', 'kind')),
+                         {'10.0.0.1': 'IP', 'http://bad.example/': 'URL'})
+
+        self._load(self._feed('vendor.txt', ['10.0.0.1']), feed='vendor', kind='OTHER')
+        self.assertEqual(Indicator.objects.get(value='10.0.0.1').feed, 'vendor')
+
+
+class IndicatorEventTest(IndicatorTestMixin, TestCase):
+    """Test that ingested events are scanned for indicators"""
+
+    def setUp(self):
+        clear_matcher_cache()
+        self.addCleanup(clear_matcher_cache)
+        self.addCleanup(clear_indicator_cache)
+        self._load(self._feed('watchlist.txt', ['203.0.113.7', 'evil.example']))
+        clear_indicator_cache()
+
+    def test_matches_are_recorded_and_escalated(self):
+        """Test that a LOW event mentioning an indicator is recorded and raises an alert"""
+        event = Event.objects.create(source_name='proxy', event_type='Web Request', severity='LOW',
+                                     description='GET https://cdn.evil.example/ from 10.1.1.1')
+        Event.objects.create(source_name='proxy', event_type='Web Request', severity='LOW',
+                             description='GET https://example.org/ from 10.1.1.1')
+
+        match = IndicatorMatch.objects.get()
+        self.assertEqual((match.event, match.value, match.indicator.value), (event, 'evil.example', 'evil.example'))
+        alert = Alert.objects.get()
+        self.assertEqual((alert.event, alert.title, alert.severity),
+                         (event, 'Alert: Web Request (watchlist match)', 'LOW'))
+
+    def test_bulk_import_is_scanned(self):
+        """Test that import_events records matches and raises alerts too"""
+        path = self._feed('events.jsonl', [json.dumps({
+            'source_name': 'fw', 'event_type': 'Connection', 'severity': 'LOW', 'description': description,
+            'timestamp': '2025-01-01T00:00:00Z',
+        }) for description in ('allowed 203.0.113.7:22', 'allowed 198.51.100.1:22')])
+
+        call_command('import_events', path, workers=1, stdout=StringIO())
+
+        self.assertEqual(list(IndicatorMatch.objects.values_list('event__description', 'value')),
+                         [('allowed 203.0.113.7:22', '203.0.113.7')])
+        self.assertEqual(Alert.objects.get().title, 'Alert: Connection (watchlist match)')
+
+    def test_events_are_matched_once(self):
+        """Test that a bulk sweep skips events saved after its batch and a match is stored once"""
+        event_ids = insert_rows(Event, ['source_name', 'event_type', 'severity', 'description', 'timestamp'],
+                                [('fw', 'Connection', 'LOW', 'allowed 203.0.113.7:22', timezone.now())],
+                                return_ids=True)
+        # Saved through the API while the batch is being processed: matched by the signal
+        api_event = Event.objects.create(source_name='proxy', event_type='Web Request', severity='LOW',
+                                         description='GET https://cdn.evil.example/')
+        create_alerts(event_ids)
+
+        self.assertEqual(sorted(IndicatorMatch.objects.values_list('event_id', 'value')),
+                         [(event_ids[0], '203.0.113.7'), (api_event.pk, 'evil.example')])
+        record_matches([(api_event.pk, {'evil.example': Indicator.objects.get(value='evil.example').pk})])
+        self.assertEqual(IndicatorMatch.objects.filter(event=api_event).count(), 1)
+
+
+class IndicatorReloadTest(IndicatorTestMixin, TransactionTestCase):
+    """Test that the matcher is rebuilt in the background and swapped in"""
+
+    # Restore the alert rules seeded by the migrations after the flush
+    serialized_rollback = True
+
+    def setUp(self):
+        clear_indicator_cache()
+        self.addCleanup(clear_indicator_cache)
+
+    def test_reload_swaps_matcher(self):
+        """Test that events keep the old matcher until the new one is built"""
+        self._load(self._feed('watchlist.txt', ['203.0.113.7']))
+        old = get_matcher()
+        self.assertEqual(list(old.scan('from 203.0.113.8 and 203.0.113.7')), ['203.0.113.7'])
+
+        self._load(self._feed('watchlist.txt', ['203.0.113.8']))  # As another process would
+        reload_soon()
+        self.assertIs(get_matcher(), old)
+        for _ in range(100):
+            if get_matcher() is not old:
+                break
+            time.sleep(0.05)
+        self.assertEqual(sorted(get_matcher().scan('from 203.0.113.8 and 203.0.113.7')),
+                         ['203.0.113.7', '203.0.113.8'])
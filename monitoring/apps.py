@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'monitoring'
+
+    def ready(self):
+        from .slow_queries import install
+        connection_created.connect(install, dispatch_uid='monitoring.slow_queries.install')
@@ -0,0 +1,601 @@
+"""
+In-process micro-benchmarks for the CPU-heavy pieces of the request paths.
+
+Each benchmark is a setup function registered with ``@benchmark(name)``. It
+receives a seeded ``random.Random`` and returns the operation to time (a
+zero-argument callable). An operation may raise StopIteration when its
+prepared inputs are used up. ``manage.py run_benchmarks`` runs them inside a
+transaction that is rolled back, and compares the results with a baseline.
+"""
+import itertools
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+BENCHMARKS = {}
+
+SOURCES = ['Firewall', 'IDS', 'EDR', 'WAF', 'VPN Gateway', 'Mail Gateway', 'DNS Resolver']
+EVENT_TYPES = ['Intrusion Attempt', 'Failed Login', 'Malware Detected', 'Port Scan', 'Data Exfiltration']
+SEVERITIES = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+
+
+def benchmark(name):
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+def event_payload(rng, markup_ratio=0.05):
+    """A sensor-like event payload; a small fraction carries HTML markup"""
+    description = ' '.join(rng.choice(['connection', 'from', '10.0.0.%d' % rng.randint(1, 254), 'denied',
+                                       'user', 'admin', 'port', str(rng.randint(1, 65535)), 'blocked'])
+                           for _ in range(rng.randint(8, 40)))
+    if rng.random() < markup_ratio:
+        description = f'<b>{description}</b> <script>alert(1)</script>'
+    return {
+        'source_name': rng.choice(SOURCES),
+        'event_type': rng.choice(EVENT_TYPES),
+        'severity': rng.choice(SEVERITIES).lower() if rng.random() < 0.2 else rng.choice(SEVERITIES),
+        'description': description,
+    }
+
+
+def make_events(rng, count, **overrides):
+    """Insert ``count`` events without firing signals and return them with their ids"""
+    from events.models import Event
+    events = []
+    for _ in range(count):
+        payload = event_payload(rng, markup_ratio=0)
+        payload.update(overrides)
+        events.append(Event(**payload))
+    created = Event.objects.bulk_create(events)
+    if created and created[0].pk is None:
+        created = list(Event.objects.order_by('-id')[:count])
+    return created
+
+
+def make_alerts(rng, count):
+    from alerts.models import Alert, severity_rank
+    events = make_events(rng, count, severity='HIGH')
+    Alert.objects.bulk_create([
+        Alert(title=f'Alert: {event.event_type}', description=event.description, severity=event.severity,
+              severity_rank=severity_rank(event.severity), status=rng.choice(['OPEN', 'ACKNOWLEDGED', 'RESOLVED']),
+              event=event)
+        for event in events
+    ])
+    return list(Alert.objects.select_related('event').filter(event__in=events))
+
+
+def _admin_request(label):
+    from django.contrib.auth.models import Group, User
+    from rest_framework.test import APIRequestFactory
+    user = User.objects.create_user(username=f'benchmark-{label}')
+    user.groups.add(Group.objects.get_or_create(name='Admin')[0])
+    request = APIRequestFactory().get('/api/alerts/')
+    request.user = user
+    return request
+
+
+@benchmark('event_serializer.is_valid')
+def event_serializer_is_valid(rng):
+    from events.serializers import EventSerializer
+    payloads = itertools.cycle([event_payload(rng) for _ in range(1000)])
+
+    def op():
+        EventSerializer(data=next(payloads)).is_valid()
+    return op
+
+
+@benchmark('event_validation.validate_event_payload')
+def lean_event_validation(rng):
+    from events.validation import validate_event_payload
+    payloads = itertools.cycle([event_payload(rng) for _ in range(1000)])
+
+    def op():
+        validate_event_payload(next(payloads))
+    return op
+
+
+@benchmark('signal.create_alert_for_high_severity_event')
+def alert_signal(rng):
+    from events.models import Event
+    from events.signals import create_alert_for_high_severity_event
+    from alerts.rules import get_matcher
+    from indicators.matching import get_matcher as get_indicator_matcher
+    from notifications.outbox import active_destination_ids
+    events = iter(make_events(rng, 5000, severity='HIGH'))
+    # Steady state: the per-process rule, indicator and destination caches are warm
+    get_matcher()
+    get_indicator_matcher()
+    active_destination_ids()
+
+    def op():
+        create_alert_for_high_severity_event(sender=Event, instance=next(events), created=True)
+    return op
+
+
+def _alert_rules(rng, count):
+    """Unsaved rules mixing every kind of condition; a few match the sample events"""
+    from alerts.models import AlertRule
+    rules = []
+    for index in range(count):
+        kind = index % 4
+        if kind == 0:
+            rule = AlertRule(severities=rng.choice(SEVERITIES), source_name=f'sensor-{index}')
+        elif kind == 1:
+            rule = AlertRule(event_type_pattern=rf'^Custom {index}\b')
+        elif kind == 2:
+            rule = AlertRule(description_contains=f'ioc-{index:05d}')
+        else:
+            rule = AlertRule(severities='HIGH,CRITICAL', event_type=rng.choice(EVENT_TYPES),
+                             description_contains=rng.choice(['denied', 'blocked', f'hash-{index}']))
+        rule.name = f'rule-{index}'
+        rules.append(rule)
+    return rules
+
+
+@benchmark('alert_rules.compiled.5000_rules')
+def alert_rules_compiled(rng):
+    from alerts.rules import RuleMatcher
+    matcher = RuleMatcher(_alert_rules(rng, 5000))
+    events = itertools.cycle([event_payload(rng, markup_ratio=0) for _ in range(1000)])
+
+    def op():
+        event = next(events)
+        matcher.match(event['source_name'], event['event_type'], event['severity'], event['description'])
+    return op
+
+
+@benchmark('alert_rules.linear_scan.5000_rules')
+def alert_rules_linear_scan(rng):
+    """Reference: every rule checked in turn, as a per-rule loop would"""
+    import re
+    rules = [(rule, re.compile(rule.event_type_pattern) if rule.event_type_pattern else None,
+              rule.severity_list(), rule.description_contains.casefold())
+             for rule in _alert_rules(rng, 5000)]
+    events = itertools.cycle([event_payload(rng, markup_ratio=0) for _ in range(1000)])
+
+    def op():
+        event = next(events)
+        description = event['description'].casefold()
+        [rule for rule, pattern, severities, needle in rules
+         if (not severities or event['severity'] in severities)
+         and (not rule.source_name or rule.source_name == event['source_name'])
+         and (not rule.event_type or rule.event_type == event['event_type'])
+         and (pattern is None or pattern.search(event['event_type']))
+         and (not needle or needle in description)]
+    return op
+
+
+@benchmark('alert_thresholds.hit.10000_keys')
+def alert_threshold_hit(rng):
+    from alerts.models import AlertRule
+    from alerts.thresholds import ThresholdTracker
+    rule = AlertRule.objects.create(name='benchmark-threshold', event_type='Failed Login', threshold=50)
+    tracker = ThresholdTracker(buckets=12)
+    keys = [(rule.pk, f'10.0.{index // 256}.{index % 256}', rng.choice(EVENT_TYPES)) for index in range(10000)]
+    hits = itertools.count()
+
+    def op():
+        hit = next(hits)
+        # ~100 events/s spread over the keys: windows slide and get reset
+        tracker.hit(keys[rng.randrange(10000)], 50, 60, hit / 100)
+    return op
+
+
+def _indicator_scan(rng, count):
+    """A watchlist of ``count`` IPs, domains, hashes and URLs scanned over sample descriptions"""
+    from indicators.matching import IndicatorMatcher
+    values = [
+        lambda index: (f'{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}.{rng.randint(1, 254)}', 'IP'),
+        lambda index: (f'host{index}.example', 'DOMAIN'),
+        lambda index: (f'{rng.getrandbits(256):064x}', 'HASH'),
+        lambda index: (f'http://bad{index}.example/', 'URL'),  # Automaton: kept to 1%
+    ]
+    matcher = IndicatorMatcher((index, *values[index % 3 if index % 100 else 3](index)) for index in range(count))
+    descriptions = itertools.cycle([event_payload(rng, markup_ratio=0)['description'] for _ in range(1000)])
+
+    def op():
+        matcher.scan(next(descriptions))
+    return op
+
+
+@benchmark('indicators.scan.1000_indicators')
+def indicator_scan_1000(rng):
+    return _indicator_scan(rng, 1000)
+
+
+@benchmark('indicators.scan.100000_indicators')
+def indicator_scan_100000(rng):
+    return _indicator_scan(rng, 100000)
+
+
+def _event_stats(rng):
+    from django.conf import settings
+    from events.stats import EventStats
+    stats = EventStats(settings.EVENT_STATS_WINDOW, settings.EVENT_STATS_WINDOWS, settings.EVENT_STATS_TOP_K,
+                       settings.EVENT_STATS_HLL_PRECISION, settings.EVENT_STATS_MAX_EVENT_TYPES)
+    now = time.time()
+    # Long-tailed sources: the Space-Saving summaries keep evicting
+    sources = [f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{min(int(rng.paretovariate(1.1)), 255)}'
+               for _ in range(10000)]
+    events = [(rng.choice(sources), rng.choice(EVENT_TYPES), now - rng.uniform(0, 3600)) for _ in range(10000)]
+    return stats, events, now
+
+
+@benchmark('event_stats.record')
+def event_stats_record(rng):
+    stats, events, now = _event_stats(rng)
+    events = itertools.cycle(events)
+
+    def op():
+        source_name, event_type, timestamp = next(events)
+        stats.record(source_name, event_type, timestamp, now=now)
+    return op
+
+
+@benchmark('event_stats.summary.60_minutes')
+def event_stats_summary(rng):
+    stats, events, now = _event_stats(rng)
+    for source_name, event_type, timestamp in events * 10:
+        stats.record(source_name, event_type, timestamp, now=now)
+
+    def op():
+        stats.summary(stats.windows(), 60, 20, now=now)
+    return op
+
+
+@benchmark('source_health.flush.1000_sources')
+def source_health_flush(rng):
+    from django.utils import timezone
+    from events.health import HealthAccumulator
+    accumulator = HealthAccumulator(interval=0)
+    sources = [f'sensor-{index:04d}' for index in range(1000)]
+    now = timezone.now()
+
+    def op():
+        for source_name in sources:
+            accumulator.add(source_name, rng.choice(EVENT_TYPES), rng.choice(SEVERITIES), now)
+        accumulator.flush()
+    return op
+
+
+def _silent_sources(rng):
+    from datetime import timedelta
+    from django.utils import timezone
+    from events import health
+    from events.models import Event
+    now = timezone.now()
+    sources = [f'sensor-{index:03d}' for index in range(200)]
+    events = []
+    for _ in range(20000):
+        payload = event_payload(rng, markup_ratio=0)
+        payload['source_name'] = rng.choice(sources)
+        events.append(Event(**payload, timestamp=now - timedelta(minutes=rng.randint(0, 7 * 24 * 60))))
+    Event.objects.bulk_create(events, batch_size=2000)
+    health.rebuild()
+    return now - timedelta(minutes=15)
+
+
+@benchmark('source_health.silent_sources.table')
+def source_health_silent_table(rng):
+    from events.models import SourceHealth
+    threshold = _silent_sources(rng)
+
+    def op():
+        list(SourceHealth.objects.filter(last_seen__lt=threshold).values_list('source_name', 'last_seen'))
+    return op
+
+
+@benchmark('source_health.silent_sources.max_timestamp')
+def source_health_silent_max_timestamp(rng):
+    from django.db.models import Max
+    from events.models import Event
+    threshold = _silent_sources(rng)
+
+    def op():
+        list(Event.objects.order_by().values('source_name').annotate(last_seen=Max('timestamp'))
+             .filter(last_seen__lt=threshold).values_list('source_name', 'last_seen'))
+    return op
+
+
+@benchmark('idempotency.may_exist.100000_keys')
+def idempotency_may_exist(rng):
+    from events.idempotency import RecentKeys
+    recent = RecentKeys(cache_size=1000, filter_capacity=1000000, error_rate=0.01)
+    for index in range(100000):
+        recent.remember(f'sensor-{index % 50}:{index}', {})
+    # Mostly new keys, as for first attempts
+    keys = itertools.cycle([f'sensor-{rng.randint(0, 49)}:{rng.randint(0, 200000)}' for _ in range(10000)])
+
+    def op():
+        recent.may_exist(next(keys))
+    return op
+
+
+def _status_changes(rng, bulk):
+    from django.contrib.auth.models import Group, User
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from alerts.views import AlertViewSet
+    alerts = make_alerts(rng, 100)
+    user = User.objects.create_user(username=f'benchmark-bulk-{bulk}')
+    user.groups.add(Group.objects.get_or_create(name='Admin')[0])
+    factory = APIRequestFactory()
+    bulk_view = AlertViewSet.as_view({'post': 'bulk_status'})
+    patch_view = AlertViewSet.as_view({'patch': 'partial_update'})
+    statuses = itertools.cycle(['ACKNOWLEDGED', 'RESOLVED'])
+
+    def op():
+        new_status = next(statuses)
+        if bulk:
+            data = {'status': new_status, 'ids': [alert.pk for alert in alerts]}
+            request = factory.post('/api/alerts/bulk-status/', data, format='json')
+            force_authenticate(request, user)
+            bulk_view(request)
+        else:
+            for alert in alerts:
+                request = factory.patch(f'/api/alerts/{alert.pk}/', {'status': new_status}, format='json')
+                force_authenticate(request, user)
+                patch_view(request, pk=alert.pk)
+    return op
+
+
+@benchmark('alert_status.bulk.100_alerts')
+def alert_status_bulk(rng):
+    return _status_changes(rng, bulk=True)
+
+
+@benchmark('alert_status.patch_each.100_alerts')
+def alert_status_patch_each(rng):
+    return _status_changes(rng, bulk=False)
+
+
+def _responded_alerts(rng):
+    """20,000 alerts acknowledged (and mostly resolved) over the last 7 days"""
+    from datetime import timedelta
+    from django.utils import timezone
+    from alerts import history
+    from alerts.models import Alert
+    now = timezone.now()
+    events = make_events(rng, 20000, severity='HIGH')
+    alerts = []
+    for event in events:
+        created_at = now - timedelta(seconds=rng.randint(3600, 7 * 24 * 3600))
+        acknowledged_at = created_at + timedelta(seconds=rng.expovariate(1 / 600))
+        resolved_at = acknowledged_at + timedelta(seconds=rng.expovariate(1 / 7200)) if rng.random() < 0.8 else None
+        alerts.append(Alert(title=f'Alert: {event.event_type}', severity=rng.choice(SEVERITIES), status='RESOLVED',
+                            event=event, acknowledged_at=min(acknowledged_at, now),
+                            resolved_at=resolved_at and min(resolved_at, now)))
+    Alert.objects.bulk_create(alerts, batch_size=2000)
+    for alert in alerts:
+        alert.created_at = now - (now - alert.acknowledged_at) - timedelta(seconds=rng.randint(0, 3600))
+    Alert.objects.bulk_update(alerts, ['created_at'], batch_size=2000)
+    history.rebuild()
+    return now - timedelta(days=7), now
+
+
+@benchmark('alert_response_times.histograms')
+def alert_response_times_histograms(rng):
+    from alerts import history
+    since, until = _responded_alerts(rng)
+
+    def op():
+        history.response_times(since, until)
+    return op
+
+
+@benchmark('alert_response_times.alert_scan')
+def alert_response_times_alert_scan(rng):
+    from alerts.models import Alert
+    since, until = _responded_alerts(rng)
+
+    def percentiles(latencies):
+        latencies.sort()
+        return [latencies[min(len(latencies) - 1, len(latencies) * percentile // 100)] for percentile in (50, 90, 99)]
+
+    def op():
+        latencies = {}
+        rows = Alert.objects.filter(acknowledged_at__gte=since, acknowledged_at__lt=until).values_list(
+            'severity', 'created_at', 'acknowledged_at', 'resolved_at',
+        )
+        for severity, created_at, acknowledged_at, resolved_at in rows:
+            acknowledge, resolve = latencies.setdefault(severity, ([], []))
+            acknowledge.append((acknowledged_at - created_at).total_seconds())
+            if resolved_at is not None:
+                resolve.append((resolved_at - created_at).total_seconds())
+        {severity: [percentiles(values) for values in metrics] for severity, metrics in latencies.items()}
+    return op
+
+
+def _triage_alerts(rng):
+    """50,000 alerts of mixed severity, a third of them OPEN"""
+    from alerts.models import Alert, severity_rank
+    events = make_events(rng, 50000)
+    Alert.objects.bulk_create([
+        Alert(title=f'Alert: {event.event_type}', severity=event.severity, severity_rank=severity_rank(event.severity),
+              status=rng.choice(['OPEN', 'ACKNOWLEDGED', 'RESOLVED']), event=event)
+        for event in events
+    ], batch_size=2000)
+
+
+@benchmark('alert_triage.rank_index.limit_50')
+def alert_triage_rank_index(rng):
+    from alerts.models import Alert
+    _triage_alerts(rng)
+
+    def op():
+        list(Alert.objects.filter(status='OPEN').order_by('-severity_rank', 'created_at', 'id')
+             .values_list('pk', flat=True)[:50])
+    return op
+
+
+@benchmark('alert_triage.severity_case.limit_50')
+def alert_triage_severity_case(rng):
+    from django.db.models import Case, Value, When
+    from alerts.models import SEVERITY_RANKS, Alert
+    _triage_alerts(rng)
+    rank = Case(*[When(severity=severity, then=Value(value)) for severity, value in SEVERITY_RANKS.items()],
+                default=Value(0))
+
+    def op():
+        list(Alert.objects.filter(status='OPEN').order_by(rank.desc(), 'created_at', 'id')
+             .values_list('pk', flat=True)[:50])
+    return op
+
+
+def _alert_page(rng, size):
+    from alerts.serializers import AlertSerializer
+    alerts = make_alerts(rng, size)
+
+    def op():
+        AlertSerializer(alerts, many=True).data
+    return op
+
+
+@benchmark('alert_serializer.page_100')
+def alert_serializer_page_100(rng):
+    return _alert_page(rng, 100)
+
+
+@benchmark('alert_serializer.page_1000')
+def alert_serializer_page_1000(rng):
+    return _alert_page(rng, 1000)
+
+
+def _rendered_alert_page(rng):
+    from alerts.serializers import AlertSerializer
+    return {'count': 1000, 'next': None, 'previous': None,
+            'results': AlertSerializer(make_alerts(rng, 1000), many=True).data}
+
+
+@benchmark('renderer.drf_json.page_1000')
+def drf_json_renderer(rng):
+    from rest_framework.renderers import JSONRenderer
+    data, renderer = _rendered_alert_page(rng), JSONRenderer()
+
+    def op():
+        renderer.render(data)
+    return op
+
+
+@benchmark('renderer.fast_json.page_1000')
+def fast_json_renderer(rng):
+    from threat_monitor.renderers import FastJSONRenderer
+    data, renderer = _rendered_alert_page(rng), FastJSONRenderer()
+
+    def op():
+        renderer.render(data)
+    return op
+
+
+def _parse_bodies(parser, bodies):
+    import io
+    bodies = itertools.cycle(bodies)
+
+    def op():
+        parser.parse(io.BytesIO(next(bodies)), parser.media_type, {})
+    return op
+
+
+@benchmark('parser.drf_json.event')
+def drf_json_parser(rng):
+    import json
+    from rest_framework.parsers import JSONParser
+    return _parse_bodies(JSONParser(), [json.dumps(event_payload(rng)).encode() for _ in range(1000)])
+
+
+@benchmark('parser.fast_json.event')
+def fast_json_parser(rng):
+    import json
+    from threat_monitor.parsers import FastJSONParser
+    return _parse_bodies(FastJSONParser(), [json.dumps(event_payload(rng)).encode() for _ in range(1000)])
+
+
+@benchmark('parser.msgpack.event')
+def msgpack_parser(rng):
+    from threat_monitor.msgpack_codec import packb
+    from threat_monitor.parsers import MessagePackParser
+    return _parse_bodies(MessagePackParser(), [packb(event_payload(rng)) for _ in range(1000)])
+
+
+@benchmark('permissions.alert')
+def alert_permission(rng):
+    from alerts.permissions import AlertPermission
+    request = _admin_request('alert')
+    permission = AlertPermission()
+
+    def op():
+        permission.has_permission(request, None)
+    return op
+
+
+@benchmark('permissions.event')
+def event_permission(rng):
+    from events.permissions import EventPermission
+    request = _admin_request('event')
+    permission = EventPermission()
+
+    def op():
+        permission.has_permission(request, None)
+    return op
+
+
+def measure(op, min_time=0.5, rounds=3, query_sample=10):
+    """
+    Time ``op`` and count its queries.
+
+    Runs ``rounds`` timed rounds of at least ``min_time`` seconds each and
+    reports the best round's ops/sec; queries per op are counted over a
+    separate sample of ``query_sample`` calls.
+    """
+    with CaptureQueriesContext(connection) as captured:
+        calls = 0
+        try:
+            for _ in range(query_sample):
+                op()
+                calls += 1
+        except StopIteration:
+            pass
+    queries_per_op = len(captured) / calls if calls else 0.0
+
+    best = 0.0
+    for _ in range(rounds):
+        iterations = 0
+        start = time.perf_counter()
+        try:
+            while True:
+                op()
+                iterations += 1
+                if iterations % 10 == 0 and time.perf_counter() - start >= min_time:
+                    break
+        except StopIteration:
+            pass
+        elapsed = time.perf_counter() - start
+        if iterations and elapsed:
+            best = max(best, iterations / elapsed)
+    return {'ops_per_sec': round(best, 1), 'queries_per_op': round(queries_per_op, 2)}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return the regressions of ``results`` against ``baseline``: throughput more
+    than ``tolerance`` (a fraction) below the baseline, or more queries per op.
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        floor = reference['ops_per_sec'] * (1 - tolerance)
+        if result['ops_per_sec'] < floor:
+            regressions.append(
+                f"{name}: {result['ops_per_sec']} ops/sec is below {floor:.1f} "
+                f"(baseline {reference['ops_per_sec']}, tolerance {tolerance:.0%})"
+            )
+        if result['queries_per_op'] > reference['queries_per_op']:
+            regressions.append(
+                f"{name}: {result['queries_per_op']} queries/op, baseline {reference['queries_per_op']}"
+            )
+    return regressions
@@ -0,0 +1,158 @@
+"""
+Logging building blocks used by settings.LOGGING.
+
+- QueueListenerHandler: hands records to a background writer thread so that
+  file and console I/O never happens on the request path.
+- JSONFormatter: renders one JSON object per record. Formatting is deferred to
+  the writer thread, so callers pass structured data through ``extra``.
+- RateLimitFilter: caps repeated warnings per message template and samples
+  the overflow, so a flood of bad requests does not become a flood of lines.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+# Attributes present on every LogRecord - anything else came from ``extra``
+_RESERVED_ATTRS = frozenset(
+    vars(logging.LogRecord('', logging.INFO, '', 0, '', (), None)).keys()
+) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """Render a record as a single-line JSON object including its ``extra`` fields"""
+
+    def format(self, record):
+        payload = {
+            'timestamp': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limit repeated records that share a logger, level and message template.
+
+    Within each ``period`` the first ``rate`` records of a template pass; after
+    that only every ``sample``-th record passes (``sample=0`` drops them all).
+    The next record that passes carries a ``suppressed`` count of the records
+    dropped before it. Records below ``level`` are never limited.
+    """
+
+    max_keys = 1024
+
+    def __init__(self, rate=10, period=60, sample=100, level='WARNING'):
+        super().__init__()
+        self.rate = rate
+        self.period = period
+        self.sample = sample
+        self.level = logging._checkLevel(level)
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < self.level:
+            return True
+
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.period:
+                suppressed = window[2] if window else 0
+                if window is None and len(self._windows) >= self.max_keys:
+                    # Templates should be constants; if they are not, start over
+                    # rather than letting the table grow without bound
+                    self._windows.clear()
+                window = self._windows[key] = [now, 0, suppressed]
+            window[1] += 1
+            seen = window[1]
+            allowed = seen <= self.rate or (
+                self.sample > 0 and (seen - self.rate) % self.sample == 0
+            )
+            if not allowed:
+                window[2] += 1
+                return False
+            suppressed, window[2] = window[2], 0
+
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class QueueListenerHandler(logging.handlers.QueueHandler):
+    """
+    Queue records in memory and write them to ``handlers`` from a background thread.
+
+    ``handlers`` is a list of handler objects; in dictConfig use
+    ``'cfg://handlers.<name>'`` references. The writer thread is started on the
+    first record (and restarted after a fork). When the queue is full, records
+    are dropped and counted in ``dropped`` rather than blocking the caller.
+    """
+
+    def __init__(self, handlers, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        # ConvertingList only resolves cfg:// references on item access
+        targets = [handlers[i] for i in range(len(handlers))]
+        for target in targets:
+            if not isinstance(target, logging.Handler):
+                raise ValueError('Unable to resolve queue target %r' % (target,)) from TypeError(
+                    'target not configured yet'
+                )
+        self.targets = targets
+        self.dropped = 0
+        self._listener = None
+        self._listener_pid = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def prepare(self, record):
+        # Formatting happens on the writer thread; the record is passed as is
+        return record
+
+    def enqueue(self, record):
+        if self._listener_pid != os.getpid():
+            self._start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start_listener(self):
+        with self._start_lock:
+            if self._listener_pid == os.getpid():
+                return
+            # A listener inherited through fork has no thread behind it
+            self._listener = logging.handlers.QueueListener(
+                self.queue, *self.targets, respect_handler_level=True
+            )
+            self._listener.start()
+            self._listener_pid = os.getpid()
+
+    def flush(self):
+        """Block until every queued record is written; the writer restarts on the next record"""
+        with self._start_lock:
+            if self._listener is not None and self._listener_pid == os.getpid():
+                self._listener.stop()
+                self._listener = None
+                self._listener_pid = None
+        for target in self.targets:
+            target.flush()
+
+    def close(self):
+        self.flush()
+        super().close()
@@ -0,0 +1,252 @@
+import http.client
+import itertools
+import json
+import random
+import socketserver
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlencode, urlsplit
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+
+from monitoring.stats import percentile
+from threat_monitor.msgpack_codec import packb
+
+# Accounts created by `manage.py create_test_users`
+WRITER_USERS = ['admin', 'testadmin']
+READER_USERS = ['analyst', 'testanalyst']
+
+SOURCES = ['Firewall', 'IDS', 'EDR', 'WAF', 'VPN Gateway', 'Mail Gateway']
+EVENT_TYPES = ['Intrusion Attempt', 'Failed Login', 'Malware Detected', 'Port Scan', 'Data Exfiltration']
+
+
+class _ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def parse_mix(value):
+    """Parse ``LOW=50,MEDIUM=30,...`` into (choices, weights)"""
+    choices, weights = [], []
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        try:
+            weights.append(float(weight))
+        except ValueError:
+            raise CommandError(f'Invalid severity mix entry: "{part}". Expected NAME=WEIGHT.')
+        choices.append(name.strip().upper())
+    return choices, weights
+
+
+class Command(BaseCommand):
+    help = 'Drives concurrent event ingestion and alert listing over HTTP and reports latency percentiles as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            type=str,
+            default=None,
+            help='Base URL of a running server (default: start the app in-process on a free port)',
+        )
+        parser.add_argument(
+            '--password',
+            type=str,
+            default='testpass123',
+            help='Password of the create_test_users accounts (default: testpass123)',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=1000,
+            help='Total number of requests to send (default: 1000)',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=None,
+            help='Stop after this many seconds even if --requests is not reached',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Number of concurrent client connections (default: 8)',
+        )
+        parser.add_argument(
+            '--write-ratio',
+            type=float,
+            default=0.5,
+            help='Fraction of requests that are create_event POSTs; the rest list alerts (default: 0.5)',
+        )
+        parser.add_argument(
+            '--severity-mix',
+            type=str,
+            default='LOW=50,MEDIUM=30,HIGH=15,CRITICAL=5',
+            help='Severity distribution of ingested events (default: LOW=50,MEDIUM=30,HIGH=15,CRITICAL=5)',
+        )
+        parser.add_argument(
+            '--msgpack',
+            action='store_true',
+            help='Send create_event bodies as MessagePack instead of JSON',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the request mix (default: 42)',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='Also write the JSON report to this file',
+        )
+
+    def handle(self, *args, **options):
+        severities, severity_weights = parse_mix(options['severity_mix'])
+        server = None
+        if options['url']:
+            base_url = options['url'].rstrip('/')
+        else:
+            server = make_server(
+                '127.0.0.1', 0, get_wsgi_application(),
+                server_class=_ThreadingWSGIServer, handler_class=_QuietHandler,
+            )
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f'http://127.0.0.1:{server.server_port}'
+
+        try:
+            writer_tokens = [self._token(base_url, user, options['password']) for user in WRITER_USERS]
+            reader_tokens = [self._token(base_url, user, options['password']) for user in READER_USERS]
+
+            results = []
+            sequence = itertools.count()
+            deadline = time.monotonic() + options['duration'] if options['duration'] else None
+
+            def worker(index):
+                rng = random.Random(options['seed'] + index)
+                conn = self._connect(base_url)
+                samples = []
+                while next(sequence) < options['requests']:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        break
+                    if rng.random() < options['write_ratio']:
+                        operation = 'create_event'
+                        payload = {
+                            'source_name': rng.choice(SOURCES),
+                            'event_type': rng.choice(EVENT_TYPES),
+                            'severity': rng.choices(severities, severity_weights)[0],
+                            'description': f'Load test event {rng.getrandbits(32):08x}',
+                        }
+                        body = packb(payload) if options['msgpack'] else json.dumps(payload)
+                        request = ('POST', '/api/events/', body, rng.choice(writer_tokens))
+                    else:
+                        operation = 'list_alerts'
+                        query = {'status': rng.choice(['OPEN', 'ACKNOWLEDGED', 'RESOLVED'])}
+                        if rng.random() < 0.5:
+                            query['severity'] = rng.choice(['HIGH', 'CRITICAL'])
+                        request = ('GET', f'/api/alerts/?{urlencode(query)}', None, rng.choice(reader_tokens))
+                    samples.append((operation, *self._send(conn, *request, msgpack=options['msgpack'])))
+                conn.close()
+                results.extend(samples)
+
+            started = time.perf_counter()
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['concurrency'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+        report = self._report(results, elapsed, options, base_url if options['url'] else 'in-process')
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        self.stdout.write(output)
+
+    def _connect(self, base_url):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(parts.hostname, parts.port, timeout=30)
+
+    def _send(self, conn, method, path, body, token, msgpack=False):
+        """Send one request on a keep-alive connection; returns (status, seconds)"""
+        headers = {'Authorization': f'Bearer {token}'}
+        if body is not None:
+            headers['Content-Type'] = 'application/msgpack' if msgpack else 'application/json'
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            status = 0  # Connection-level failure
+        return status, time.perf_counter() - start
+
+    def _token(self, base_url, username, password):
+        conn = self._connect(base_url)
+        try:
+            conn.request(
+                'POST', '/api/token/',
+                body=json.dumps({'username': username, 'password': password}),
+                headers={'Content-Type': 'application/json'},
+            )
+            response = conn.getresponse()
+            payload = response.read()
+        finally:
+            conn.close()
+        if response.status != 200:
+            raise CommandError(
+                f'Could not obtain a token for "{username}" (HTTP {response.status}). '
+                f'Run `manage.py create_test_users` first.'
+            )
+        return json.loads(payload)['access']
+
+    def _summary(self, samples, elapsed):
+        latencies = sorted(seconds * 1000 for _, seconds in samples)
+        statuses = Counter(status for status, _ in samples)
+        count = len(samples)
+        throttled = statuses.get(429, 0)
+        errors = sum(n for status, n in statuses.items() if status == 0 or (status >= 400 and status != 429))
+        return {
+            'requests': count,
+            'throughput_rps': round(count / elapsed, 2) if elapsed else None,
+            'p50_ms': round(percentile(latencies, 50), 3) if latencies else None,
+            'p95_ms': round(percentile(latencies, 95), 3) if latencies else None,
+            'p99_ms': round(percentile(latencies, 99), 3) if latencies else None,
+            'error_rate': round(errors / count, 4) if count else None,
+            'throttle_rate': round(throttled / count, 4) if count else None,
+            'status_counts': {str(status): n for status, n in sorted(statuses.items())},
+        }
+
+    def _report(self, results, elapsed, options, target):
+        by_operation = {}
+        for operation, status, seconds in results:
+            by_operation.setdefault(operation, []).append((status, seconds))
+        return {
+            'target': target,
+            'config': {
+                key: options[key]
+                for key in ('requests', 'duration', 'concurrency', 'write_ratio', 'severity_mix', 'msgpack', 'seed')
+            },
+            'elapsed_s': round(elapsed, 3),
+            'overall': self._summary([(status, seconds) for _, status, seconds in results], elapsed),
+            'operations': {
+                operation: self._summary(samples, elapsed)
+                for operation, samples in sorted(by_operation.items())
+            },
+        }
@@ -0,0 +1,109 @@
+import json
+import os
+import platform
+import random
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from monitoring.benchmarks import BENCHMARKS, compare, measure
+
+
+class Command(BaseCommand):
+    help = 'Runs the in-process micro-benchmarks and flags regressions against a stored baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--baseline',
+            type=str,
+            default=str(settings.BENCHMARK_BASELINE),
+            help='Baseline file to compare against (default: settings.BENCHMARK_BASELINE)',
+        )
+        parser.add_argument(
+            '--update-baseline',
+            action='store_true',
+            help='Write the results to the baseline file instead of comparing',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Allowed throughput drop as a fraction of the baseline (default: 0.25)',
+        )
+        parser.add_argument(
+            '--only',
+            type=str,
+            default=None,
+            help='Run only benchmarks whose name starts with this prefix',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=1234,
+            help='Random seed for generated inputs (default: 1234)',
+        )
+        parser.add_argument(
+            '--min-time',
+            type=float,
+            default=0.5,
+            help='Minimum seconds per timed round (default: 0.5)',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the results as JSON',
+        )
+
+    def handle(self, *args, **options):
+        names = [name for name in BENCHMARKS if not options['only'] or name.startswith(options['only'])]
+        if not names:
+            raise CommandError(f'No benchmark matches "{options["only"]}"')
+
+        results = {}
+        # Inputs are written to the database; roll all of it back afterwards
+        with transaction.atomic():
+            for name in names:
+                op = BENCHMARKS[name](random.Random(options['seed']))
+                results[name] = measure(op, min_time=options['min_time'])
+            transaction.set_rollback(True)
+
+        if options['update_baseline']:
+            os.makedirs(os.path.dirname(options['baseline']) or '.', exist_ok=True)
+            with open(options['baseline'], 'w') as fh:
+                json.dump({
+                    'environment': {
+                        'python': platform.python_version(),
+                        'django': django.get_version(),
+                        'machine': platform.machine(),
+                    },
+                    'benchmarks': results,
+                }, fh, indent=2, sort_keys=True)
+                fh.write('\n')
+
+        baseline = {}
+        if not options['update_baseline'] and os.path.exists(options['baseline']):
+            with open(options['baseline']) as fh:
+                baseline = json.load(fh)['benchmarks']
+        regressions = compare(results, baseline, options['tolerance'])
+
+        if options['json']:
+            self.stdout.write(json.dumps({'results': results, 'regressions': regressions}, indent=2))
+        else:
+            for name, result in results.items():
+                reference = baseline.get(name)
+                delta = ''
+                if reference and reference['ops_per_sec']:
+                    delta = f" ({result['ops_per_sec'] / reference['ops_per_sec'] - 1:+.0%} vs baseline)"
+                self.stdout.write(
+                    f"{name:50s} {result['ops_per_sec']:12.1f} ops/sec "
+                    f"{result['queries_per_op']:6.2f} queries/op{delta}"
+                )
+            if options['update_baseline']:
+                self.stdout.write(self.style.SUCCESS(f'Baseline written to {options["baseline"]}'))
+
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(self.style.ERROR(regression))
+            raise CommandError(f'{len(regressions)} benchmark regression(s)')
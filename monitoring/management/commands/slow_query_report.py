@@ -0,0 +1,96 @@
+import json
+import re
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.stats import percentile
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """Reduce a statement to its shape: literals and IN-lists become placeholders"""
+    shape = _STRING_LITERAL.sub('?', sql)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = shape.replace('%s', '?')
+    shape = _PLACEHOLDER_LIST.sub('(...)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class Command(BaseCommand):
+    help = 'Summarises the slow-query log grouped by normalized query shape'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log',
+            type=str,
+            default=str(settings.SLOW_QUERY_LOG),
+            help='Slow-query log to read (default: settings.SLOW_QUERY_LOG)',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Number of query shapes to show, by total time (default: 20)',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the report as JSON',
+        )
+
+    def handle(self, *args, **options):
+        groups = defaultdict(lambda: {'durations': [], 'frames': Counter(), 'views': Counter()})
+        skipped = 0
+        try:
+            with open(options['log']) as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                        group = groups[normalize_sql(entry['sql'])]
+                        group['durations'].append(float(entry['duration_ms']))
+                    except (ValueError, KeyError, TypeError):
+                        skipped += 1
+                        continue
+                    group['frames'][entry.get('frame')] += 1
+                    group['views'][entry.get('view')] += 1
+        except FileNotFoundError:
+            raise CommandError(f'Slow-query log not found: {options["log"]}')
+
+        report = []
+        for shape, group in groups.items():
+            durations = sorted(group['durations'])
+            report.append({
+                'query': shape,
+                'count': len(durations),
+                'total_ms': round(sum(durations), 3),
+                'p95_ms': round(percentile(durations, 95), 3),
+                'max_ms': round(durations[-1], 3),
+                'top_frame': group['frames'].most_common(1)[0][0],
+                'top_view': group['views'].most_common(1)[0][0],
+            })
+        report.sort(key=lambda row: row['total_ms'], reverse=True)
+        report = report[:options['top']]
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        if not report:
+            self.stdout.write(self.style.WARNING('No slow queries logged'))
+            return
+        for row in report:
+            self.stdout.write(self.style.SUCCESS(
+                f"{row['total_ms']:10.1f} ms total  {row['count']:6d} x  "
+                f"p95 {row['p95_ms']:.1f} ms  max {row['max_ms']:.1f} ms"
+            ))
+            self.stdout.write(f"  {row['query']}")
+            self.stdout.write(f"  at {row['top_frame']} (view: {row['top_view']})")
+            self.stdout.write('')
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'Skipped {skipped} unreadable line(s)'))
@@ -0,0 +1,395 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Each metric keeps its samples in a plain dict guarded by its own lock, held
+only for the increment itself. With several worker processes, set
+settings.METRICS_DIR: every process then periodically writes a snapshot of its
+own samples to ``<METRICS_DIR>/metrics-<uuid>.json`` from a background thread
+(a random id per process, so pids reused by a restart or shared between
+containers do not collide), and the /metrics view merges all snapshots
+(counters and histogram buckets are summed), so any worker can answer a
+scrape.
+
+As in prometheus_client's multiprocess mode, the totals of a process that
+is gone are folded into ``<METRICS_DIR>/archive.json`` so that the summed
+counters never go down (Prometheus would read that as a counter reset): a
+process archives its own samples at exit, and a scrape archives snapshots
+not rewritten for METRICS_STALE_AFTER seconds (a process that was killed).
+A process whose snapshot was archived while it was only stalled notices the
+missing file and from then on writes only what it counted since.
+"""
+import atexit
+import bisect
+import contextlib
+import fcntl
+import glob
+import json
+import math
+import os
+import re
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+NAMESPACE = 'threat_monitor'
+ARCHIVE_NAME = 'archive.json'
+_SNAPSHOT_NAME = re.compile(r'metrics-[0-9a-f]{32}\.json')
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = f'{NAMESPACE}_{name}'
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._samples = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            samples = [[list(key), self._copy(value)] for key, value in self._samples.items()]
+        return {
+            'type': self.type,
+            'help': self.documentation,
+            'labelnames': list(self.labelnames),
+            'samples': samples,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._samples[key] = self._samples.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    """Histogram samples are ``[bucket counts..., +Inf count, sum]`` (non-cumulative)"""
+
+    type = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            sample = self._samples.get(key)
+            if sample is None:
+                sample = self._samples[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            sample[index] += 1
+            sample[-1] += value
+
+    def snapshot(self):
+        data = super().snapshot()
+        data['buckets'] = list(self.buckets)
+        return data
+
+    def _copy(self, value):
+        return list(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._flusher_pid = None
+        self._flusher_lock = threading.Lock()
+        self._process = None  # (pid, id) naming this process's snapshot file
+        self._baseline = None  # Samples already archived (see write_snapshot)
+        self._written = None  # Samples of the last snapshot written
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def clear(self):
+        for metric in self._metrics.values():
+            metric.clear()
+        self._baseline = self._written = None
+
+    # Multi-process support
+
+    def _snapshot_path(self, directory):
+        pid = os.getpid()
+        if self._process is None or self._process[0] != pid:
+            # A new process (or a forked child): a new file, and nothing archived yet
+            self._process = (pid, uuid.uuid4().hex)
+            self._baseline = self._written = None
+        return os.path.join(directory, f'metrics-{self._process[1]}.json')
+
+    @contextlib.contextmanager
+    def _locked(self, directory):
+        """Serialize snapshot writes and archiving between the processes sharing ``directory``"""
+        with open(os.path.join(directory, 'metrics.lock'), 'a') as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _check_archived(self, path):
+        """Exclude from now on what a scrape archived while this process was stalled (lock held)"""
+        if self._written is not None and not os.path.exists(path):
+            # The archive holds everything counted up to the last write
+            self._baseline, self._written = self._written, None
+
+    def write_snapshot(self, directory):
+        """Atomically replace this process's snapshot file"""
+        path = self._snapshot_path(directory)
+        with self._locked(directory):
+            self._check_archived(path)
+            samples = self.snapshot()
+            _write_json(path, _subtract(samples, self._baseline))
+            self._written = samples
+
+    def archive_snapshot(self, directory):
+        """Fold this process's samples into the archive and remove its snapshot (at exit)"""
+        path = self._snapshot_path(directory)
+        with self._locked(directory):
+            archive_path = os.path.join(directory, ARCHIVE_NAME)
+            self._check_archived(path)
+            samples = self.snapshot()
+            own = _subtract(samples, self._baseline)
+            _write_json(archive_path, _as_snapshot(merge_snapshots([_read_json(archive_path), own])))
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            self._baseline, self._written = samples, None
+
+    def ensure_flusher(self):
+        """Start the snapshot writer thread for this process if METRICS_DIR is set"""
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory or self._flusher_pid == os.getpid():
+            return
+        with self._flusher_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            os.makedirs(directory, exist_ok=True)
+            interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+
+            def run():
+                while True:
+                    time.sleep(interval)
+                    try:
+                        self.write_snapshot(directory)
+                    except OSError:
+                        pass
+
+            def archive():
+                if self._flusher_pid == os.getpid():  # Not in a forked child
+                    try:
+                        self.archive_snapshot(directory)
+                    except OSError:
+                        pass
+
+            threading.Thread(target=run, name='metrics-flusher', daemon=True).start()
+            atexit.register(archive)
+            self._flusher_pid = os.getpid()
+
+    def collect(self):
+        """Merge this process's live samples with the snapshots of other processes and the archive"""
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            return merge_snapshots([self.snapshot()])
+        own_path = self._snapshot_path(directory)
+        archive_path = os.path.join(directory, ARCHIVE_NAME)
+        stale_after = getattr(settings, 'METRICS_STALE_AFTER', 60)
+        stale = []
+        os.makedirs(directory, exist_ok=True)
+        # Under the lock, a snapshot is either read or already in the archive, never both
+        with self._locked(directory):
+            self._check_archived(own_path)
+            snapshots = [_subtract(self.snapshot(), self._baseline)]
+            for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+                if path == own_path or not _SNAPSHOT_NAME.fullmatch(os.path.basename(path)):
+                    continue
+                try:
+                    is_stale = time.time() - os.path.getmtime(path) > stale_after
+                    snapshot = _read_json(path)
+                except (OSError, ValueError):
+                    continue
+                if is_stale:
+                    stale.append((path, snapshot))
+                else:
+                    snapshots.append(snapshot)
+            archive = _read_json(archive_path)
+            if stale:
+                # Killed processes: keep their totals, drop their files
+                archive = _as_snapshot(merge_snapshots([archive, *(snapshot for _, snapshot in stale)]))
+                _write_json(archive_path, archive)
+                for path, _ in stale:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(path)
+        return merge_snapshots([*snapshots, archive])
+
+    def render(self):
+        return render_text(self.collect())
+
+
+def _read_json(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {}
+
+
+def _write_json(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as fh:
+        json.dump(data, fh)
+    os.replace(tmp_path, path)
+
+
+def _subtract(snapshot, baseline):
+    """``snapshot`` less the samples of ``baseline`` (an earlier snapshot of the same metrics)"""
+    if not baseline:
+        return snapshot
+    result = {}
+    for name, data in snapshot.items():
+        before = {tuple(key): value for key, value in baseline.get(name, {}).get('samples', [])}
+        samples = []
+        for key, value in data['samples']:
+            old = before.get(tuple(key))
+            if old is not None:
+                value = [a - b for a, b in zip(value, old)] if isinstance(value, list) else value - old
+            samples.append([key, value])
+        result[name] = {**data, 'samples': samples}
+    return result
+
+
+def _as_snapshot(merged):
+    """merge_snapshots() output in the snapshot file format"""
+    return {
+        name: {**data, 'samples': [[list(key), value] for key, value in data['samples'].items()]}
+        for name, data in merged.items()
+    }
+
+
+def merge_snapshots(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for name, data in snapshot.items():
+            target = merged.setdefault(name, {**data, 'samples': {}})
+            for key, value in data['samples']:
+                key = tuple(key)
+                current = target['samples'].get(key)
+                if current is None:
+                    target['samples'][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target['samples'][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target['samples'][key] = current + value
+    return merged
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+def render_text(merged):
+    """Render merged samples in the Prometheus text exposition format (0.0.4)"""
+    lines = []
+    for name in sorted(merged):
+        data = merged[name]
+        names = data['labelnames']
+        lines.append(f'# HELP {name} {data["help"]}')
+        lines.append(f'# TYPE {name} {data["type"]}')
+        for key in sorted(data['samples']):
+            value = data['samples'][key]
+            if data['type'] != 'histogram':
+                lines.append(f'{name}{_labels(names, key)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(list(data['buckets']) + [math.inf], value[:-1]):
+                cumulative += count
+                le = (('le', _number(bound)),)
+                lines.append(f'{name}_bucket{_labels(names, key, le)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(names, key)} {_number(value[-1])}')
+            lines.append(f'{name}_count{_labels(names, key)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# HTTP layer (recorded by MetricsMiddleware)
+http_requests = Counter(
+    'http_requests_total', 'HTTP requests by view, method and status code', ['view', 'method', 'status'],
+)
+http_request_duration = Histogram(
+    'http_request_duration_seconds', 'Request latency by view', ['view', 'method'],
+)
+db_queries_per_request = Histogram(
+    'db_queries_per_request', 'Database queries executed per request', ['view'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+db_time_per_request = Histogram(
+    'db_time_per_request_seconds', 'Time spent in database queries per request', ['view'],
+)
+throttled_requests = Counter(
+    'throttled_requests_total', 'Requests rejected by a throttle (HTTP 429)', ['view'],
+)
+
+# Application counters
+events_ingested = Counter('events_ingested_total', 'Events ingested', ['severity'])
+event_validation_rejects = Counter('event_validation_rejects_total', 'Event payloads rejected by validation')
+events_replayed = Counter(
+    'events_replayed_total', 'Retried event submissions answered with the original event', ['lookup'],
+)
+alerts_created = Counter('alerts_created_total', 'Alerts created', ['severity'])
+alert_status_updates = Counter('alert_status_updates_total', 'Alert status changes', ['status'])
+indicator_matches = Counter('indicator_matches_total', 'Watchlist indicators found in event descriptions')
+
+# Syslog listener (manage.py syslog_listener)
+syslog_messages_received = Counter(
+    'syslog_messages_received_total', 'Syslog messages received', ['transport'],
+)
+syslog_messages_dropped = Counter(
+    'syslog_messages_dropped_total', 'Syslog messages not stored as events', ['reason'],
+)
+syslog_ingest_lag = Histogram(
+    'syslog_ingest_lag_seconds', 'Time from receiving a syslog message to committing its event',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+
+# Webhook notifications (manage.py notification_worker)
+notifications_sent = Counter(
+    'notifications_sent_total', 'Alert notifications by delivery outcome (delivered, retry, failed)', ['result'],
+)
+webhook_request_duration = Histogram(
+    'webhook_request_duration_seconds', 'Webhook request latency by destination', ['destination'],
+)
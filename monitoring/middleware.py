@@ -0,0 +1,112 @@
+import time
+
+from django.db import connection
+from django.http import HttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from . import metrics, profiling, slow_queries
+
+
+class MetricsMiddleware:
+    """
+    Record request latency, status and database usage per view.
+
+    Views are labelled by URL name (e.g. ``alert-list``), never by raw path, so
+    label cardinality stays bounded. Place first in MIDDLEWARE so the latency
+    covers the whole middleware stack.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics.REGISTRY.ensure_flusher()
+        db_stats = [0, 0.0]
+
+        def count_queries(execute, sql, params, many, context):
+            query_start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db_stats[0] += 1
+                db_stats[1] += time.perf_counter() - query_start
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match._func_path) if match else 'unmatched'
+        metrics.http_requests.inc(view=view, method=request.method, status=response.status_code)
+        metrics.http_request_duration.observe(duration, view=view, method=request.method)
+        metrics.db_queries_per_request.observe(db_stats[0], view=view)
+        metrics.db_time_per_request.observe(db_stats[1], view=view)
+        if response.status_code == 429:
+            metrics.throttled_requests.inc(view=view)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile a request with cProfile when an Admin asks for it via the
+    ``X-Profile`` header or ``_profile`` query parameter (see monitoring.profiling).
+    Requests without the flag pass straight through. Place after
+    AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.META.get('HTTP_X_PROFILE')
+        if mode is None and '_profile' in request.META.get('QUERY_STRING', ''):
+            mode = request.GET.get('_profile')
+        if mode is None:
+            return self.get_response(request)
+
+        user = self._admin_user(request)
+        if user is None:
+            # Not allowed to profile - serve the request as if the flag were absent
+            return self.get_response(request)
+
+        response, profiler, recorder, seconds = profiling.profile_request(self.get_response, request)
+        if mode == 'save':
+            response['X-Profile-Id'] = profiling.save_profile(request, user, profiler, recorder, seconds)
+            return response
+        report = profiling.render_report(request, profiler, recorder, seconds)
+        return HttpResponse(report, content_type='text/plain; charset=utf-8')
+
+    def _admin_user(self, request):
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            try:
+                authenticated = JWTAuthentication().authenticate(request)
+            except (AuthenticationFailed, InvalidToken):
+                return None
+            if authenticated is None:
+                return None
+            user = authenticated[0]
+        if not user.groups.filter(name='Admin').exists():
+            return None
+        return user
+
+
+class SlowQueryLogMiddleware:
+    """Make the current view name available to the slow-query log"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = slow_queries.current_view.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            slow_queries.current_view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        slow_queries.current_view.set(match.view_name or match._func_path)
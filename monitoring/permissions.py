@@ -0,0 +1,15 @@
+from rest_framework import permissions
+
+
+class AdminOnlyPermission(permissions.BasePermission):
+    """
+    Permission for operational endpoints (profiles, reports):
+    - Admin: full access
+    - Analyst and other authenticated users: no access
+    """
+
+    def has_permission(self, request, view):
+        """Check if user has permission for the view action"""
+        if not request.user or not request.user.is_authenticated:
+            return False
+        return request.user.groups.filter(name='Admin').exists()
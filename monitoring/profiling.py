@@ -0,0 +1,101 @@
+"""
+Per-request profiling for Admin users.
+
+A request is profiled when it carries the ``X-Profile`` header or the
+``_profile`` query parameter and the caller is in the Admin group. The value
+selects the output:
+
+- ``text`` (default): the response is replaced by a plain-text report - the
+  pstats summary followed by every SQL statement with its timing and call site.
+- ``save``: the normal response is returned with an ``X-Profile-Id`` header;
+  the raw profile and the SQL capture are written to settings.PROFILES_DIR and
+  can be downloaded from ``/api/profiles/<id>/``.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.db import connection
+
+from .stack import application_stack, format_frame
+
+PROFILE_ID_RE = re.compile(r'^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$')
+
+
+class SQLRecorder:
+    """Execute wrapper that keeps every statement with its duration and call site"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+                'many': many,
+                'stack': [format_frame(frame) for frame in application_stack(limit=8)],
+            })
+
+
+def profile_request(get_response, request):
+    """Run ``get_response(request)`` under cProfile, returning (response, profiler, recorder, seconds)"""
+    recorder = SQLRecorder()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    with connection.execute_wrapper(recorder):
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+    return response, profiler, recorder, time.perf_counter() - start
+
+
+def render_report(request, profiler, recorder, seconds):
+    limit = getattr(settings, 'PROFILING_TOP_FUNCTIONS', 40)
+    out = io.StringIO()
+    sql_ms = sum(query['duration_ms'] for query in recorder.queries)
+    out.write(f'{request.method} {request.get_full_path()}\n')
+    out.write(f'Total: {seconds * 1000:.1f} ms, SQL: {len(recorder.queries)} queries in {sql_ms:.1f} ms\n\n')
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    out.write('SQL statements (slowest first)\n\n')
+    for query in sorted(recorder.queries, key=lambda q: q['duration_ms'], reverse=True):
+        out.write(f"{query['duration_ms']:9.3f} ms  {query['sql']}\n")
+        for frame in query['stack']:
+            out.write(f'              at {frame}\n')
+    return out.getvalue()
+
+
+def save_profile(request, user, profiler, recorder, seconds):
+    """Write ``<id>.prof`` (pstats) and ``<id>.json`` (SQL capture); returns the id"""
+    directory = settings.PROFILES_DIR
+    os.makedirs(directory, exist_ok=True)
+    profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    profiler.dump_stats(os.path.join(directory, f'{profile_id}.prof'))
+    with open(os.path.join(directory, f'{profile_id}.json'), 'w') as fh:
+        json.dump({
+            'method': request.method,
+            'path': request.get_full_path(),
+            'user': user.username,
+            'duration_ms': round(seconds * 1000, 3),
+            'queries': recorder.queries,
+        }, fh, indent=2)
+    return profile_id
+
+
+def profile_path(profile_id, extension):
+    """Return the file path for a saved profile, or None if the id is malformed"""
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    return os.path.join(settings.PROFILES_DIR, f'{profile_id}.{extension}')
@@ -0,0 +1,199 @@
+"""
+Fixed-size streaming summaries: Space-Saving for heavy hitters,
+HyperLogLog for distinct counts and Bloom filters for set membership.
+
+Space-Saving and HyperLogLog summaries are mergeable: two summaries of
+separate streams (other processes, other time windows) combine into a
+summary of the union with the same guarantees, so they can be kept per
+process and per window and merged when read. Bloom filters are not merged;
+each process keeps its own.
+
+- ``SpaceSaving(capacity)`` keeps at most ``capacity`` counters. Counts are
+  never under-estimated and over-estimated by at most N / capacity for a
+  stream of N items (each counter also carries its own, usually tighter,
+  error bound); every item seen more than N / capacity times is kept.
+- ``HyperLogLog(precision)`` uses 2**precision one-byte registers; the
+  relative standard error of the estimate is 1.04 / sqrt(2**precision)
+  (about 2.3% at precision 11).
+- ``BloomFilter(capacity, error_rate)`` answers "maybe seen" or "certainly
+  not seen"; with up to ``capacity`` items added, an unseen item is
+  reported as maybe seen with probability ``error_rate``.
+
+Items are hashed with BLAKE2b rather than ``hash()``, which differs between
+processes, so that HyperLogLog registers built by different processes can be
+merged.
+"""
+import functools
+import hashlib
+import math
+
+
+class SpaceSaving:
+    __slots__ = ('capacity', 'counts', 'errors', '_low', '_low_count')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        # Items that had the least count when it was last looked up. Counts
+        # only grow and newcomers enter above it, so any of them still at
+        # that count is still a least counted item: evictions take them in
+        # turn and scan the counters only once they are used up.
+        self._low = []
+        self._low_count = 0
+
+    def add(self, item, count=1):
+        counts = self.counts
+        if item in counts:
+            counts[item] += count
+        elif len(counts) < self.capacity:
+            counts[item] = count
+            self.errors[item] = 0
+        else:
+            # The least counted item makes room; its count is the newcomer's error bound
+            victim = self._least()
+            floor = counts.pop(victim)
+            del self.errors[victim]
+            counts[item] = floor + count
+            self.errors[item] = floor
+
+    def _least(self):
+        counts, low = self.counts, self._low
+        while low:
+            item = low.pop()
+            if counts.get(item) == self._low_count:
+                return item
+        self._low_count = floor = min(counts.values())
+        low.extend(item for item, count in counts.items() if count == floor)
+        return low.pop()
+
+    def floor(self):
+        """Upper bound of the count of any item not kept"""
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def top(self, limit):
+        """``(item, count, error)`` for the most counted items, most first"""
+        items = sorted(self.counts.items(), key=lambda pair: (-pair[1], pair[0]))[:limit]
+        return [(item, count, self.errors[item]) for item, count in items]
+
+    def merge(self, other):
+        """Summary of both streams (the mergeable-summaries rule: an absent item counts as the floor)"""
+        merged = SpaceSaving(max(self.capacity, other.capacity))
+        floor, other_floor = self.floor(), other.floor()
+        for item in self.counts.keys() | other.counts.keys():
+            merged.counts[item] = self.counts.get(item, floor) + other.counts.get(item, other_floor)
+            merged.errors[item] = self.errors.get(item, floor) + other.errors.get(item, other_floor)
+        if len(merged.counts) > merged.capacity:
+            kept = sorted(merged.counts, key=merged.counts.get, reverse=True)[:merged.capacity]
+            merged.counts = {item: merged.counts[item] for item in kept}
+            merged.errors = {item: merged.errors[item] for item in kept}
+        return merged
+
+    def to_list(self):
+        return [[item, count, self.errors[item]] for item, count in self.counts.items()]
+
+    @classmethod
+    def from_list(cls, capacity, entries):
+        summary = cls(capacity)
+        for item, count, error in entries:
+            summary.counts[item] = count
+            summary.errors[item] = error
+        return summary
+
+    def copy(self):
+        summary = SpaceSaving(self.capacity)
+        summary.counts = dict(self.counts)
+        summary.errors = dict(self.errors)
+        return summary
+
+
+@functools.lru_cache(maxsize=65536)
+def hash64(item):
+    return int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), 'big')
+
+
+_POWERS = [2.0 ** -rank for rank in range(66)]
+
+
+@functools.lru_cache(maxsize=None)
+def _high_bits(size):
+    return int.from_bytes(b'\x80' * size, 'big')
+
+
+class HyperLogLog:
+    __slots__ = ('precision', 'registers')
+
+    def __init__(self, precision, registers=None):
+        self.precision = precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(1 << precision)
+
+    def add(self, item):
+        value = hash64(item)
+        bits = 64 - self.precision
+        index = value >> bits
+        rank = bits - (value & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        # Register-wise max, all registers at once on the registers read as one
+        # integer: ranks stay below 0x80, so setting each byte's high bit and
+        # subtracting borrows nothing from the next byte, and the high bit
+        # left tells where this register is the larger one
+        size = len(self.registers)
+        high = _high_bits(size)
+        mine = int.from_bytes(self.registers, 'big')
+        theirs = int.from_bytes(other.registers, 'big')
+        keep = (((mine | high) - theirs) & high) >> 7
+        keep *= 0xFF
+        merged = (mine & keep) | (theirs & ~keep)
+        return HyperLogLog(self.precision, merged.to_bytes(size, 'big'))
+
+    def copy(self):
+        return HyperLogLog(self.precision, self.registers)
+
+    def count(self):
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(map(_POWERS.__getitem__, self.registers))
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            estimate = size * math.log(size / zeros)  # Linear counting for small cardinalities
+        return round(estimate)
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+
+class BloomFilter:
+    __slots__ = ('capacity', 'size', 'hashes', 'bits', 'count')
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        # Optimal sizes: m = -n ln p / (ln 2)^2 bits and k = m / n ln 2 hashes
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing (Kirsch-Mitzenmacher): k positions from one 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        size = self.size
+        return [(first + index * second) % size for index in range(self.hashes)]
+
+    def add(self, item):
+        bits = self.bits
+        for position in self._positions(item):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
@@ -0,0 +1,73 @@
+"""
+Slow-query log.
+
+Every database connection gets an execute wrapper (installed on
+``connection_created``) that times each statement. Statements slower than
+settings.SLOW_QUERY_THRESHOLD_MS are logged to the ``slow_queries`` logger
+with the SQL, redacted parameters, duration, the view being served and the
+application frames that issued the query. ``manage.py slow_query_report``
+aggregates the resulting log.
+"""
+import contextvars
+import logging
+import time
+
+from django.conf import settings
+
+from .stack import application_stack, format_frame
+
+logger = logging.getLogger('slow_queries')
+
+# URL name of the view being served, set by SlowQueryLogMiddleware
+current_view = contextvars.ContextVar('current_view', default=None)
+
+
+def redact_params(params, many=False):
+    """Replace parameter values with their type names; values may hold user data"""
+    if params is None:
+        return None
+    if many:
+        return f'<{len(params)} parameter sets>' if hasattr(params, '__len__') else '<parameter sets>'
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+class SlowQueryLogger:
+    """Execute wrapper that logs statements slower than ``threshold_ms``"""
+
+    def __init__(self, threshold_ms):
+        self.threshold = threshold_ms / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold:
+                self.log(sql, params, many, context, duration)
+
+    def log(self, sql, params, many, context, duration):
+        stack = application_stack(limit=5)
+        logger.warning(
+            'Slow query',
+            extra={
+                'sql': sql,
+                'params': redact_params(params, many),
+                'duration_ms': round(duration * 1000, 3),
+                'database': context['connection'].alias,
+                'view': current_view.get(),
+                'frame': format_frame(stack[0]) if stack else None,
+                'stack': [format_frame(frame) for frame in stack],
+            },
+        )
+
+
+def install(sender, connection, **kwargs):
+    """connection_created receiver: attach the slow-query wrapper to the new connection"""
+    threshold_ms = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+    if threshold_ms is None:
+        return
+    if not any(isinstance(wrapper, SlowQueryLogger) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.append(SlowQueryLogger(threshold_ms))
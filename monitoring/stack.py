@@ -0,0 +1,47 @@
+"""
+Call-site attribution: find the project frames (views, serializers, signals)
+on the current stack, skipping Django/DRF internals and this app itself.
+"""
+import os
+import sys
+
+from django.conf import settings
+
+_PROJECT_ROOT = str(settings.BASE_DIR) + os.sep
+_MONITORING_ROOT = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+
+def _is_application_file(filename):
+    return (
+        filename.startswith(_PROJECT_ROOT)
+        and not filename.startswith(_MONITORING_ROOT)
+        and 'site-packages' not in filename
+    )
+
+
+def _qualname(code):
+    # co_qualname (Python 3.11+) gives "AlertViewSet.get_queryset" instead of "get_queryset"
+    return getattr(code, 'co_qualname', code.co_name)
+
+
+def application_stack(limit=None):
+    """
+    Return the application frames of the caller's stack, innermost first,
+    as ``{'file', 'line', 'function'}`` dicts with project-relative paths.
+    """
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and (limit is None or len(frames) < limit):
+        code = frame.f_code
+        if _is_application_file(code.co_filename):
+            frames.append({
+                'file': code.co_filename[len(_PROJECT_ROOT):],
+                'line': frame.f_lineno,
+                'function': _qualname(code),
+            })
+        frame = frame.f_back
+    return frames
+
+
+def format_frame(frame):
+    return f"{frame['file']}:{frame['line']} in {frame['function']}"
@@ -0,0 +1,16 @@
+import math
+
+
+def percentile(values, pct):
+    """
+    Return the ``pct`` percentile (0-100) of ``values`` using linear
+    interpolation between closest ranks. ``values`` must be sorted.
+    """
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    rank = (len(values) - 1) * pct / 100
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
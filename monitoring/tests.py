@@ -0,0 +1,434 @@
+import json
+import logging
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User, Group
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import metrics
+from .benchmarks import compare
+from .log import JSONFormatter, QueueListenerHandler, RateLimitFilter
+from .management.commands.slow_query_report import normalize_sql
+from .slow_queries import SlowQueryLogger, redact_params
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _record(msg='Event ingestion failed', level=logging.WARNING, **extra):
+    record = logging.LogRecord('events', level, __file__, 1, msg, (), None)
+    record.__dict__.update(extra)
+    return record
+
+
+class JSONFormatterTest(SimpleTestCase):
+    """Test structured JSON log records"""
+
+    def test_extra_fields_are_included(self):
+        """Test that fields passed through extra appear as top-level keys"""
+        line = JSONFormatter().format(_record('Event ingested', logging.INFO, event_id=7, user='admin'))
+        payload = json.loads(line)
+        self.assertEqual(payload['message'], 'Event ingested')
+        self.assertEqual(payload['level'], 'INFO')
+        self.assertEqual(payload['logger'], 'events')
+        self.assertEqual(payload['event_id'], 7)
+        self.assertEqual(payload['user'], 'admin')
+
+    def test_unserializable_values_are_stringified(self):
+        """Test that values json cannot encode are rendered with str()"""
+        payload = json.loads(JSONFormatter().format(_record(error=ValueError('boom'))))
+        self.assertEqual(payload['error'], 'boom')
+
+
+class RateLimitFilterTest(SimpleTestCase):
+    """Test rate limiting of repeated warnings"""
+
+    def test_repeated_warnings_are_limited_and_sampled(self):
+        """Test that only `rate` records pass, then one per `sample`"""
+        rate_filter = RateLimitFilter(rate=3, period=60, sample=5)
+        passed = [rate_filter.filter(_record()) for _ in range(13)]
+        # 3 pass, then the 5th and 10th of the overflow
+        self.assertEqual(passed.count(True), 5)
+        self.assertTrue(all(passed[:3]))
+
+    def test_suppressed_count_is_reported(self):
+        """Test that the next record after a suppressed run carries the count"""
+        rate_filter = RateLimitFilter(rate=1, period=60, sample=0)
+        for _ in range(4):
+            rate_filter.filter(_record())
+        with mock.patch('monitoring.log.time.monotonic', return_value=10 ** 9):
+            record = _record()
+            self.assertTrue(rate_filter.filter(record))
+        self.assertEqual(record.suppressed, 3)
+
+    def test_info_records_are_not_limited(self):
+        """Test that records below the configured level always pass"""
+        rate_filter = RateLimitFilter(rate=1, period=60, sample=0)
+        self.assertTrue(all(rate_filter.filter(_record(level=logging.INFO)) for _ in range(20)))
+
+
+class QueueListenerHandlerTest(SimpleTestCase):
+    """Test the background writer handler"""
+
+    def test_records_are_written_by_listener(self):
+        """Test that records reach the target handler after flush"""
+        target = ListHandler()
+        handler = QueueListenerHandler([target])
+        handler.handle(_record('Event ingested', logging.INFO))
+        handler.flush()
+        self.assertEqual(len(target.records), 1)
+        self.assertEqual(target.records[0].getMessage(), 'Event ingested')
+        handler.close()
+
+    def test_full_queue_drops_records(self):
+        """Test that a full queue drops instead of blocking the caller"""
+        handler = QueueListenerHandler([ListHandler()], queue_size=1)
+        with mock.patch.object(handler, '_start_listener'):
+            handler.handle(_record())
+            handler.handle(_record())
+        self.assertEqual(handler.dropped, 1)
+
+
+class MetricsRenderTest(SimpleTestCase):
+    """Test the text exposition format and cross-process merging"""
+
+    def setUp(self):
+        metrics.REGISTRY.clear()
+
+    def test_counter_and_histogram_exposition(self):
+        """Test that counters and cumulative histogram buckets are rendered"""
+        metrics.events_ingested.inc(severity='HIGH')
+        metrics.events_ingested.inc(severity='HIGH')
+        metrics.http_request_duration.observe(0.02, view='alert-list', method='GET')
+        text = metrics.REGISTRY.render()
+        self.assertIn('# TYPE threat_monitor_events_ingested_total counter', text)
+        self.assertIn('threat_monitor_events_ingested_total{severity="HIGH"} 2', text)
+        self.assertIn(
+            'threat_monitor_http_request_duration_seconds_bucket{view="alert-list",method="GET",le="0.01"} 0', text
+        )
+        self.assertIn(
+            'threat_monitor_http_request_duration_seconds_bucket{view="alert-list",method="GET",le="0.025"} 1', text
+        )
+        self.assertIn('threat_monitor_http_request_duration_seconds_count{view="alert-list",method="GET"} 1', text)
+
+    def test_snapshots_from_other_processes_are_summed(self):
+        """Test that snapshots of other workers are summed and those of dead workers archived, not dropped"""
+        metrics.events_ingested.inc(severity='LOW')
+        with tempfile.TemporaryDirectory() as directory:
+            for name, count in (('a' * 32, 4), ('b' * 32, 2)):
+                with open(os.path.join(directory, f'metrics-{name}.json'), 'w') as fh:
+                    json.dump({
+                        'threat_monitor_events_ingested_total': {
+                            'type': 'counter', 'help': 'Events ingested', 'labelnames': ['severity'],
+                            'samples': [[['LOW'], count]],
+                        },
+                    }, fh)
+            # Not rewritten for longer than METRICS_STALE_AFTER: the process was killed
+            os.utime(os.path.join(directory, f'metrics-{"b" * 32}.json'), (0, 0))
+            with override_settings(METRICS_DIR=directory, METRICS_STALE_AFTER=60):
+                first = metrics.REGISTRY.render()
+                second = metrics.REGISTRY.render()
+            self.assertEqual(sorted(name for name in os.listdir(directory) if name.endswith('.json')),
+                             ['archive.json', f'metrics-{"a" * 32}.json'])
+        self.assertIn('threat_monitor_events_ingested_total{severity="LOW"} 7', first)
+        self.assertIn('threat_monitor_events_ingested_total{severity="LOW"} 7', second)
+
+    def test_archived_samples_are_counted_once(self):
+        """Test that samples archived at exit or while a process stalled are not counted again"""
+        metrics.events_ingested.inc(severity='LOW', amount=3)
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            metrics.REGISTRY.write_snapshot(directory)
+            own_path = next(path for path in os.listdir(directory) if path.startswith('metrics-'))
+            # A scrape in another process archives the snapshot of this (stalled) process
+            os.replace(os.path.join(directory, own_path), os.path.join(directory, 'archive.json'))
+            metrics.events_ingested.inc(severity='LOW')
+            self.assertIn('threat_monitor_events_ingested_total{severity="LOW"} 4', metrics.REGISTRY.render())
+            metrics.REGISTRY.write_snapshot(directory)
+            with open(os.path.join(directory, own_path)) as fh:
+                self.assertEqual(json.load(fh)['threat_monitor_events_ingested_total']['samples'], [[['LOW'], 1]])
+
+            metrics.REGISTRY.archive_snapshot(directory)
+            self.assertNotIn(own_path, os.listdir(directory))
+            self.assertIn('threat_monitor_events_ingested_total{severity="LOW"} 4', metrics.REGISTRY.render())
+
+
+class MetricsEndpointTest(TestCase):
+    """Test request instrumentation and the /metrics endpoint"""
+
+    def setUp(self):
+        metrics.REGISTRY.clear()
+        admin_group, _ = Group.objects.get_or_create(name='Admin')
+        self.admin_user = User.objects.create_user(username='admin', password='adminpass123')
+        self.admin_user.groups.add(admin_group)
+        self.client = APIClient()
+        token = str(RefreshToken.for_user(self.admin_user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_ingestion_is_counted_and_timed(self):
+        """Test that event ingestion updates application and per-view metrics"""
+        self.client.post('/api/events/', {
+            'source_name': 'Firewall', 'event_type': 'Intrusion Attempt',
+            'severity': 'HIGH', 'description': 'Unauthorized access attempt',
+        }, format='json')
+        self.client.post('/api/events/', {'severity': 'BOGUS'}, format='json')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('threat_monitor_events_ingested_total{severity="HIGH"} 1', text)
+        self.assertIn('threat_monitor_alerts_created_total{severity="HIGH"} 1', text)
+        self.assertIn('threat_monitor_event_validation_rejects_total 1', text)
+        self.assertIn('threat_monitor_http_requests_total{view="create_event",method="POST",status="201"} 1', text)
+        self.assertIn('threat_monitor_db_queries_per_request_count{view="create_event"} 2', text)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_token_is_required_when_configured(self):
+        """Test that /metrics rejects scrapes without the configured token"""
+        scraper = APIClient()
+        self.assertEqual(scraper.get('/metrics').status_code, 403)
+        response = scraper.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_only_localhost_without_token(self):
+        """Test that without METRICS_TOKEN only loopback scrapes are answered"""
+        scraper = APIClient()
+        self.assertEqual(scraper.get('/metrics').status_code, 200)
+        self.assertEqual(scraper.get('/metrics', REMOTE_ADDR='::1').status_code, 200)
+        self.assertEqual(scraper.get('/metrics', REMOTE_ADDR='10.0.0.7').status_code, 403)
+
+
+class ProfilingMiddlewareTest(TestCase):
+    """Test opt-in request profiling"""
+
+    def setUp(self):
+        admin_group, _ = Group.objects.get_or_create(name='Admin')
+        analyst_group, _ = Group.objects.get_or_create(name='Analyst')
+        self.admin_user = User.objects.create_user(username='admin', password='adminpass123')
+        self.admin_user.groups.add(admin_group)
+        self.analyst_user = User.objects.create_user(username='analyst', password='analystpass123')
+        self.analyst_user.groups.add(analyst_group)
+        self.admin_client = APIClient()
+        self.analyst_client = APIClient()
+        self.admin_client.credentials(HTTP_AUTHORIZATION=f'Bearer {self._get_token(self.admin_user)}')
+        self.analyst_client.credentials(HTTP_AUTHORIZATION=f'Bearer {self._get_token(self.analyst_user)}')
+
+    def _get_token(self, user):
+        """Helper method to get JWT token for user"""
+        return str(RefreshToken.for_user(user).access_token)
+
+    def test_admin_gets_text_report(self):
+        """Test that the flag returns a pstats summary with SQL call sites"""
+        response = self.admin_client.get('/api/alerts/', HTTP_X_PROFILE='text')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        report = response.content.decode()
+        self.assertIn('cumulative', report)
+        self.assertIn('SQL statements', report)
+        self.assertIn('in AlertViewSet.list', report)
+
+    def test_analyst_flag_is_ignored(self):
+        """Test that non-Admin users get the normal response"""
+        response = self.analyst_client.get('/api/alerts/?_profile=text')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('results', response.json())
+
+    def test_saved_profile_can_be_downloaded(self):
+        """Test that save mode writes the profile and the download endpoint serves it"""
+        with tempfile.TemporaryDirectory() as directory, override_settings(PROFILES_DIR=directory):
+            response = self.admin_client.get('/api/alerts/?_profile=save')
+            self.assertEqual(response.status_code, 200)
+            profile_id = response['X-Profile-Id']
+
+            download = self.admin_client.get(f'/api/profiles/{profile_id}/?kind=sql')
+            self.assertEqual(download.status_code, 200)
+            capture = json.loads(b''.join(download.streaming_content))
+            self.assertEqual(capture['user'], 'admin')
+            self.assertTrue(capture['queries'])
+
+            self.assertEqual(self.analyst_client.get(f'/api/profiles/{profile_id}/').status_code, 403)
+            self.assertEqual(self.admin_client.get('/api/profiles/..%2Fsecret/').status_code, 404)
+
+
+class SlowQueryLogTest(TestCase):
+    """Test slow-query logging and the report command"""
+
+    def setUp(self):
+        analyst_group, _ = Group.objects.get_or_create(name='Analyst')
+        user = User.objects.create_user(username='analyst', password='analystpass123')
+        user.groups.add(analyst_group)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    def test_slow_query_is_attributed_to_view_and_frame(self):
+        """Test that entries carry the view name and application frame"""
+        with connection.execute_wrapper(SlowQueryLogger(threshold_ms=0)), \
+                self.assertLogs('slow_queries', 'WARNING') as logs:
+            self.client.get('/api/alerts/?status=OPEN')
+        alert_queries = [record for record in logs.records if 'alerts_alert' in record.sql]
+        self.assertTrue(alert_queries)
+        for record in alert_queries:
+            self.assertEqual(record.view, 'alert-list')
+            self.assertIn('AlertViewSet.list', record.frame)
+            self.assertIn('str', record.params)
+            self.assertNotIn('OPEN', json.dumps(record.params))
+
+    def test_redact_params(self):
+        """Test that parameter values are replaced by type names"""
+        self.assertEqual(redact_params(('secret', 3)), ['str', 'int'])
+        self.assertEqual(redact_params([(1,), (2,)], many=True), '<2 parameter sets>')
+
+    def test_report_groups_by_query_shape(self):
+        """Test that statements differing only in literals are grouped with total and p95"""
+        self.assertEqual(
+            normalize_sql('SELECT * FROM t WHERE id IN (%s, %s, %s) AND x = 5'),
+            'SELECT * FROM t WHERE id IN (...) AND x = ?',
+        )
+        entries = [
+            {'sql': 'SELECT 1 FROM alerts_alert WHERE id = %s', 'duration_ms': ms,
+             'frame': 'alerts/views.py:1 in AlertViewSet.list', 'view': 'alert-list'}
+            for ms in range(1, 101)
+        ] + [{'sql': 'UPDATE alerts_alert SET status = %s', 'duration_ms': 500, 'frame': None, 'view': None}]
+        with tempfile.NamedTemporaryFile('w', suffix='.log', delete=False) as fh:
+            fh.write('\n'.join(json.dumps(entry) for entry in entries) + '\nnot json\n')
+        try:
+            out = StringIO()
+            call_command('slow_query_report', log=fh.name, json=True, stdout=out)
+        finally:
+            os.unlink(fh.name)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report[0]['query'], 'SELECT ? FROM alerts_alert WHERE id = ?')
+        self.assertEqual(report[0]['count'], 100)
+        self.assertEqual(report[0]['total_ms'], 5050)
+        self.assertAlmostEqual(report[0]['p95_ms'], 95.05)
+        self.assertEqual(report[1]['count'], 1)
+
+
+class LoadTestCommandTest(LiveServerTestCase):
+    """Test the HTTP load generator against a live server"""
+
+    def test_report_contains_percentiles_per_operation(self):
+        """Test that the JSON report covers both operations with latency percentiles"""
+        call_command('create_test_users', stdout=StringIO())
+        for msgpack in (False, True):
+            with self.subTest(msgpack=msgpack):
+                out = StringIO()
+                call_command(
+                    'loadtest', url=self.live_server_url, requests=20, concurrency=1, seed=1,
+                    write_ratio=0.5, msgpack=msgpack, stdout=out,
+                )
+                report = json.loads(out.getvalue())
+                self.assertEqual(report['overall']['requests'], 20)
+                self.assertEqual(set(report['operations']), {'create_event', 'list_alerts'})
+                for summary in report['operations'].values():
+                    self.assertLessEqual(summary['p50_ms'], summary['p99_ms'])
+                    self.assertEqual(summary['error_rate'], 0)
+
+
+class BenchmarkCommandTest(TestCase):
+    """Test the micro-benchmark runner"""
+
+    def test_results_report_throughput_and_queries(self):
+        """Test that each benchmark reports ops/sec and queries per op"""
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            call_command(
+                'run_benchmarks', only='permissions', min_time=0.01, json=True,
+                baseline=os.path.join(directory, 'missing.json'), stdout=out,
+            )
+        output = json.loads(out.getvalue())
+        self.assertEqual(set(output['results']), {'permissions.alert', 'permissions.event'})
+        for result in output['results'].values():
+            self.assertGreater(result['ops_per_sec'], 0)
+            self.assertEqual(result['queries_per_op'], 1.0)
+        self.assertEqual(output['regressions'], [])
+
+    def test_regression_beyond_tolerance_fails(self):
+        """Test that a throughput drop or extra query against the baseline is an error"""
+        baseline = {'permissions.alert': {'ops_per_sec': 10 ** 9, 'queries_per_op': 0.0}}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            with open(path, 'w') as fh:
+                json.dump({'benchmarks': baseline}, fh)
+            with self.assertRaises(CommandError):
+                call_command(
+                    'run_benchmarks', only='permissions.alert', min_time=0.01, baseline=path,
+                    stdout=StringIO(), stderr=StringIO(),
+                )
+
+    def test_compare_within_tolerance(self):
+        """Test that a drop smaller than the tolerance is not a regression"""
+        baseline = {'x': {'ops_per_sec': 100.0, 'queries_per_op': 2.0}}
+        self.assertEqual(compare({'x': {'ops_per_sec': 80.0, 'queries_per_op': 2.0}}, baseline, 0.25), [])
+        self.assertEqual(len(compare({'x': {'ops_per_sec': 70.0, 'queries_per_op': 3.0}}, baseline, 0.25)), 2)
+
+
+class SketchTest(SimpleTestCase):
+    """Test the accuracy bounds and merging of the streaming sketches"""
+
+    def _stream(self, seed, count):
+        import random
+        rng = random.Random(seed)
+        # Zipf-like: a few heavy sources and a long tail
+        return [f'source-{min(int(rng.paretovariate(1.2)), 5000)}' for _ in range(count)]
+
+    def test_space_saving_bounds(self):
+        """Test that counts are over-estimated by at most N / capacity and heavy hitters are kept"""
+        from collections import Counter
+        from .sketches import SpaceSaving
+        stream = self._stream(1, 20000)
+        exact = Counter(stream)
+        summary = SpaceSaving(50)
+        for item in stream:
+            summary.add(item)
+
+        bound = len(stream) // 50
+        for item, count, error in summary.top(50):
+            self.assertGreaterEqual(count, exact[item])
+            self.assertLessEqual(count - exact[item], min(error, bound))
+        kept = {item for item, *_ in summary.top(50)}
+        self.assertTrue({item for item, count in exact.items() if count > bound} <= kept)
+        self.assertEqual([item for item, *_ in summary.top(3)], [item for item, _ in exact.most_common(3)])
+
+    def test_space_saving_merge(self):
+        """Test that merged summaries keep the bounds over both streams"""
+        from collections import Counter
+        from .sketches import SpaceSaving
+        first, second = self._stream(2, 10000), self._stream(3, 10000)
+        summaries = [SpaceSaving(50), SpaceSaving(50)]
+        for summary, stream in zip(summaries, (first, second)):
+            for item in stream:
+                summary.add(item)
+        merged = summaries[0].merge(summaries[1])
+        exact = Counter(first + second)
+        for item, count, error in merged.top(50):
+            self.assertGreaterEqual(count, exact[item])
+            self.assertLessEqual(count - exact[item], error)
+            self.assertLessEqual(error, len(first + second) // 50)
+
+    def test_hyperloglog(self):
+        """Test that distinct counts are within three standard errors, also after merging"""
+        from .sketches import HyperLogLog
+        first, second = HyperLogLog(11), HyperLogLog(11)
+        for index in range(20000):
+            first.add(f'host-{index}')
+            second.add(f'host-{index + 10000}')
+        for sketch, expected in ((first, 20000), (first.merge(second), 30000), (HyperLogLog(11), 0)):
+            self.assertLessEqual(abs(sketch.count() - expected), 3 * first.relative_error * expected)
+        self.assertEqual(first.merge(second).registers, bytearray(map(max, first.registers, second.registers)))
+        small = HyperLogLog(11)
+        for index in range(100):
+            small.add(f'host-{index % 10}')
+        self.assertEqual(small.count(), 10)
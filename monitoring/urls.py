@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import metrics_view, profile_download
+
+urlpatterns = [
+    path('metrics', metrics_view, name='metrics'),
+    path('api/profiles/<str:profile_id>/', profile_download, name='profile_download'),
+]
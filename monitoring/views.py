@@ -0,0 +1,60 @@
+import ipaddress
+import os
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from rest_framework.decorators import api_view, permission_classes
+
+from .metrics import REGISTRY
+from .permissions import AdminOnlyPermission
+from .profiling import profile_path
+
+
+@require_GET
+def metrics_view(request):
+    """
+    GET /metrics - Prometheus text exposition of all metrics.
+    Requires ``Authorization: Bearer <settings.METRICS_TOKEN>``; without a
+    configured token, only scrapes from the loopback interface are answered.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        supplied = request.META.get('HTTP_AUTHORIZATION', '').removeprefix('Bearer ')
+        if not constant_time_compare(supplied, token):
+            return HttpResponseForbidden()
+    elif not _is_loopback(request.META.get('REMOTE_ADDR', '')):
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _is_loopback(address):
+    try:
+        return ipaddress.ip_address(address).is_loopback
+    except ValueError:
+        return False
+
+
+@extend_schema(
+    summary='Download a saved request profile',
+    description='Download a profile saved with `X-Profile: save`. Admin-only access.',
+    parameters=[
+        OpenApiParameter('kind', description='prof (cProfile data, default) or sql (JSON SQL capture)', required=False, type=str),
+    ],
+    responses={200: None, 403: None, 404: None},
+    tags=['Monitoring'],
+)
+@api_view(['GET'])
+@permission_classes([AdminOnlyPermission])
+def profile_download(request, profile_id):
+    """
+    GET endpoint to download a saved profile.
+    Admin-only access. Analyst receives 403 Forbidden.
+    """
+    extension = 'json' if request.query_params.get('kind') == 'sql' else 'prof'
+    path = profile_path(profile_id, extension)
+    if path is None or not os.path.exists(path):
+        raise Http404
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=os.path.basename(path))
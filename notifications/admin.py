@@ -0,0 +1,19 @@
+from django.contrib import admin
+from .models import Notification, WebhookDestination
+
+
+@admin.register(WebhookDestination)
+class WebhookDestinationAdmin(admin.ModelAdmin):
+    list_display = ['name', 'url', 'is_active', 'batch_size', 'max_concurrency', 'created_at']
+    list_filter = ['is_active']
+    search_fields = ['name', 'url']
+    readonly_fields = ['created_at']
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ['alert', 'destination', 'status', 'attempts', 'next_attempt_at', 'delivered_at']
+    list_filter = ['status', 'destination']
+    readonly_fields = ['payload', 'attempts', 'lease_token', 'last_error', 'created_at', 'delivered_at']
+    raw_id_fields = ['alert']
+    show_full_result_count = False
@@ -0,0 +1,234 @@
+"""
+Webhook delivery for the notification outbox.
+
+``Deliverer.run_once`` claims due notifications, splits them per
+destination into batches of up to ``batch_size`` alerts (one request
+carries ``{"text": ..., "alerts": [...]}``) and sends the batches from a
+thread pool, with at most ``max_concurrency`` requests in flight per
+destination. HTTP connections are kept alive and reused across requests
+and rounds. Only the calling thread touches the database.
+
+A 2xx response delivers the batch. Connection errors, timeouts, 408, 429
+and 5xx are retried with exponential backoff and jitter (or after a
+Retry-After in seconds) up to settings.NOTIFICATION_MAX_ATTEMPTS; any other
+response fails the batch at once. Claims are leases: rows claimed by a
+worker that dies are due again after settings.NOTIFICATION_LEASE seconds.
+Delivery is at least once; receivers can deduplicate on the alert ``id``.
+"""
+import collections
+import http.client
+import json
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from monitoring import metrics
+
+from .models import Notification
+
+USER_AGENT = 'threat-monitor-webhooks/1.0'
+TEXT_LINES = 10  # Alerts listed in the "text" summary of a batch
+_RETRY_STATUSES = {408, 429}
+
+
+class ConnectionPool:
+    """Idle keep-alive connections per (scheme, host, port)"""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._idle = collections.defaultdict(list)
+        self._lock = threading.Lock()
+
+    def _acquire(self, origin):
+        with self._lock:
+            if self._idle[origin]:
+                return self._idle[origin].pop(), True
+        scheme, host, port = origin
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return connection_class(host, port, timeout=self.timeout), False
+
+    def _release(self, origin, connection):
+        with self._lock:
+            self._idle[origin].append(connection)
+
+    def post(self, url, body):
+        """POST ``body`` as JSON; returns ``(status, headers)``. Raises OSError/HTTPException"""
+        parts = urlsplit(url)
+        origin = (parts.scheme, parts.hostname, parts.port)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        headers = {'Content-Type': 'application/json', 'User-Agent': USER_AGENT}
+        while True:
+            connection, reused = self._acquire(origin)
+            try:
+                connection.request('POST', path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()  # Drain, so the connection can carry the next request
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                if reused:
+                    continue  # The server closed the idle connection; retry on a new one
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(origin, connection)
+            return response.status, response.headers
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, collections.defaultdict(list)
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+def batch_body(notifications):
+    alerts = [notification.payload for notification in notifications]
+    lines = [
+        f'[{alert["severity"]}] {alert["title"]}' + (f' ({alert["source_name"]})' if alert.get('source_name') else '')
+        for alert in alerts[:TEXT_LINES]
+    ]
+    if len(alerts) > TEXT_LINES:
+        lines.append(f'... and {len(alerts) - TEXT_LINES} more')
+    text = lines[0] if len(alerts) == 1 else f'{len(alerts)} new alerts\n' + '\n'.join(lines)
+    return json.dumps({'text': text, 'alerts': alerts}).encode('utf-8')
+
+
+def retry_delay(attempts, retry_after=None):
+    """Seconds before attempt ``attempts + 1``: Retry-After, or exponential backoff with jitter"""
+    if retry_after is not None:
+        return min(retry_after, settings.NOTIFICATION_BACKOFF_MAX)
+    delay = min(settings.NOTIFICATION_BACKOFF_MAX, settings.NOTIFICATION_BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _retry_after(headers):
+    try:
+        return max(int(headers.get('Retry-After', '')), 0)
+    except ValueError:
+        return None  # Absent, or an HTTP date
+
+
+class Deliverer:
+    def __init__(self, threads=None, timeout=None, lease=None, max_attempts=None):
+        self.lease = lease if lease is not None else settings.NOTIFICATION_LEASE
+        self.max_attempts = max_attempts if max_attempts is not None else settings.NOTIFICATION_MAX_ATTEMPTS
+        self.pool = ConnectionPool(timeout if timeout is not None else settings.NOTIFICATION_TIMEOUT)
+        self.executor = ThreadPoolExecutor(
+            threads if threads is not None else settings.NOTIFICATION_THREADS, thread_name_prefix='webhook',
+        )
+
+    def close(self):
+        self.executor.shutdown()
+        self.pool.close()
+
+    def claim_due(self, limit):
+        """Lease up to ``limit`` due notifications to this worker, oldest first"""
+        now = timezone.now()
+        candidates = list(
+            Notification.objects.filter(status='PENDING', next_attempt_at__lte=now, destination__is_active=True)
+            .order_by('next_attempt_at', 'id').values_list('pk', flat=True)[:limit]
+        )
+        if not candidates:
+            return []
+        token = uuid.uuid4().hex
+        # Rows another worker leased in the meantime no longer match next_attempt_at <= now
+        Notification.objects.filter(pk__in=candidates, status='PENDING', next_attempt_at__lte=now).update(
+            lease_token=token, next_attempt_at=now + timedelta(seconds=self.lease),
+        )
+        return list(
+            Notification.objects.filter(pk__in=candidates, lease_token=token)
+            .select_related('destination').order_by('id')
+        )
+
+    def run_once(self, limit=500):
+        """Deliver one round of due notifications; returns counts by outcome"""
+        counts = collections.Counter()
+        claimed = self.claim_due(limit)
+        counts['claimed'] = len(claimed)
+        queues, destinations = collections.defaultdict(collections.deque), {}
+        by_destination = collections.defaultdict(list)
+        for notification in claimed:
+            by_destination[notification.destination_id].append(notification)
+        for destination_id, notifications in by_destination.items():
+            destination = destinations[destination_id] = notifications[0].destination
+            size = max(destination.batch_size, 1)
+            queues[destination_id].extend(
+                notifications[start:start + size] for start in range(0, len(notifications), size)
+            )
+
+        in_flight, active = {}, collections.Counter()
+
+        def submit_ready():
+            for destination_id, queue in queues.items():
+                concurrency = max(destinations[destination_id].max_concurrency, 1)
+                while queue and active[destination_id] < concurrency:
+                    batch = queue.popleft()
+                    future = self.executor.submit(self._send, destinations[destination_id], batch)
+                    in_flight[future] = batch
+                    active[destination_id] += 1
+
+        submit_ready()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = in_flight.pop(future)
+                active[batch[0].destination_id] -= 1
+                counts.update(self._record(batch, *future.result()))
+            submit_ready()
+        return counts
+
+    def _send(self, destination, batch):
+        """Runs on a pool thread: returns (outcome, error, retry_after)"""
+        started = time.perf_counter()
+        try:
+            status, headers = self.pool.post(destination.url, batch_body(batch))
+        except (OSError, http.client.HTTPException) as exc:
+            return 'retry', f'{type(exc).__name__}: {exc}', None
+        except Exception as exc:
+            # E.g. a malformed destination URL: retrying will not help, and raising
+            # would abort the round with the other batches still leased
+            return 'failed', f'{type(exc).__name__}: {exc}', None
+        finally:
+            metrics.webhook_request_duration.observe(time.perf_counter() - started, destination=destination.name)
+        if 200 <= status < 300:
+            return 'delivered', '', None
+        error = f'HTTP {status}'
+        if status >= 500 or status in _RETRY_STATUSES:
+            return 'retry', error, _retry_after(headers)
+        return 'failed', error, None
+
+    def _record(self, batch, outcome, error, retry_after):
+        now = timezone.now()
+        token = batch[0].lease_token
+        counts = collections.Counter()
+        if outcome == 'delivered':
+            Notification.objects.filter(pk__in=[n.pk for n in batch], lease_token=token).update(
+                status='DELIVERED', delivered_at=now, attempts=F('attempts') + 1, lease_token='', last_error='',
+            )
+            counts['delivered'] = len(batch)
+        else:
+            # Rows of a batch can be on different attempts; update each group once
+            groups = collections.defaultdict(list)
+            for notification in batch:
+                groups[notification.attempts + 1].append(notification.pk)
+            for attempts, ids in groups.items():
+                changes = {'attempts': attempts, 'lease_token': '', 'last_error': error}
+                if outcome == 'failed' or attempts >= self.max_attempts:
+                    changes['status'] = 'FAILED'
+                    counts['failed'] += len(ids)
+                else:
+                    changes['next_attempt_at'] = now + timedelta(seconds=retry_delay(attempts, retry_after))
+                    counts['retry'] += len(ids)
+                Notification.objects.filter(pk__in=ids, lease_token=token).update(**changes)
+        for result, count in counts.items():
+            metrics.notifications_sent.inc(count, result=result)
+        return counts
@@ -0,0 +1,72 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from monitoring import metrics
+from notifications.delivery import Deliverer
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued alert notifications to the webhook destinations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Deliver the notifications that are due now, then exit',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.NOTIFICATION_POLL_INTERVAL,
+            help=f'Seconds between polls when the outbox is empty (default: {settings.NOTIFICATION_POLL_INTERVAL})',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=settings.NOTIFICATION_THREADS,
+            help=f'Concurrent requests over all destinations (default: {settings.NOTIFICATION_THREADS})',
+        )
+        parser.add_argument(
+            '--claim-limit',
+            type=int,
+            default=500,
+            help='Notifications claimed per round (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['claim_limit'] < 1 or options['poll_interval'] <= 0:
+            raise CommandError('--threads, --claim-limit and --poll-interval must be positive')
+
+        stop = threading.Event()
+        if not options['once']:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *args: stop.set())
+            # Counters reach /metrics when METRICS_DIR is shared with the web workers
+            metrics.REGISTRY.ensure_flusher()
+            self.stdout.write('Delivering notifications (Ctrl+C to stop)...')
+
+        deliverer = Deliverer(threads=options['threads'])
+        totals = {'delivered': 0, 'retry': 0, 'failed': 0}
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                counts = deliverer.run_once(options['claim_limit'])
+                if counts['claimed']:
+                    for key in totals:
+                        totals[key] += counts[key]
+                    self.stdout.write(
+                        f'  {counts["delivered"]} delivered, {counts["retry"]} to retry, {counts["failed"]} failed'
+                    )
+                if options['once'] and counts['claimed'] < options['claim_limit']:
+                    break
+                if not counts['claimed']:
+                    stop.wait(options['poll_interval'])
+        finally:
+            deliverer.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Delivered {totals["delivered"]} notifications ({totals["retry"]} to retry, {totals["failed"]} failed)'
+        ))
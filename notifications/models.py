@@ -0,0 +1,49 @@
+from django.db import models
+from django.utils import timezone
+
+
+class WebhookDestination(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    url = models.URLField(max_length=500)
+    is_active = models.BooleanField(default=True)
+    batch_size = models.PositiveIntegerField(default=20, help_text='Alerts per request when several are pending')
+    max_concurrency = models.PositiveIntegerField(default=2, help_text='Requests in flight at once (per worker)')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Notification(models.Model):
+    """Outbox row: one alert to deliver to one destination"""
+
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('DELIVERED', 'Delivered'),
+        ('FAILED', 'Failed'),
+    ]
+
+    destination = models.ForeignKey(WebhookDestination, on_delete=models.CASCADE, related_name='notifications')
+    alert = models.ForeignKey('alerts.Alert', on_delete=models.CASCADE, related_name='notifications')
+    # Alert as it was when created, so a delivery does not read the alert again
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Set by the worker that claimed the row; the claim expires at next_attempt_at
+    lease_token = models.CharField(max_length=32, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['destination', 'alert'], name='unique_notification_per_destination'),
+        ]
+        # The worker polls for due rows: status = PENDING AND next_attempt_at <= now
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='notification_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.alert_id} -> {self.destination_id} ({self.status})'
@@ -0,0 +1,68 @@
+"""
+Notification outbox.
+
+Alerts are queued for delivery in the transaction that creates them, so a
+notification exists exactly when its alert does and ingestion never waits
+on a webhook; ``manage.py notification_worker`` delivers them. The ids of
+the active destinations are cached per process for
+settings.NOTIFICATION_DESTINATION_CACHE_TTL seconds (and dropped when a
+destination is saved or deleted here), so with no destinations configured
+creating an alert runs no extra query.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Notification, WebhookDestination
+
+_cache_lock = threading.Lock()
+_cache = {'ids': None, 'expires': 0.0}
+
+
+def active_destination_ids():
+    now = time.monotonic()
+    with _cache_lock:
+        if _cache['ids'] is not None and now < _cache['expires']:
+            return _cache['ids']
+    ids = list(WebhookDestination.objects.filter(is_active=True).values_list('pk', flat=True))
+    with _cache_lock:
+        _cache['ids'] = ids
+        _cache['expires'] = now + settings.NOTIFICATION_DESTINATION_CACHE_TTL
+    return ids
+
+
+def clear_destination_cache():
+    with _cache_lock:
+        _cache['ids'] = None
+
+
+def alert_payload(alert):
+    event = alert.event
+    return {
+        'id': alert.id,
+        'title': alert.title,
+        'severity': alert.severity,
+        'status': alert.status,
+        'description': alert.description,
+        'event_id': alert.event_id,
+        'event_type': event.event_type if event else None,
+        'source_name': event.source_name if event else None,
+        'created_at': alert.created_at.isoformat(),
+    }
+
+
+def enqueue_alerts(alerts):
+    """
+    Queue ``alerts`` (with their events loaded) for every active destination.
+    Alerts already queued for a destination are skipped.
+    """
+    destination_ids = active_destination_ids()
+    if not destination_ids:
+        return
+    notifications = [
+        Notification(destination_id=destination_id, alert=alert, payload=payload)
+        for alert, payload in ((alert, alert_payload(alert)) for alert in alerts)
+        for destination_id in destination_ids
+    ]
+    Notification.objects.bulk_create(notifications, ignore_conflicts=True)
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .outbox import clear_destination_cache
+
+
+@receiver(post_save, sender='notifications.WebhookDestination')
+@receiver(post_delete, sender='notifications.WebhookDestination')
+def refresh_destination_cache(sender, **kwargs):
+    """Let the next alert see added, changed or removed destinations"""
+    clear_destination_cache()
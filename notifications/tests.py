@@ -0,0 +1,208 @@
+import collections
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from alerts.models import Alert
+from events.models import Event
+from .delivery import Deliverer
+from .models import Notification, WebhookDestination
+from .outbox import clear_destination_cache
+
+
+class WebhookStandIn:
+    """Local HTTP/1.1 server recording webhook requests"""
+
+    def __init__(self, statuses=(), delay=0, headers=None):
+        self.statuses = collections.deque(statuses)
+        self.delay = delay
+        self.headers = headers or {}
+        self.requests = []
+        self.in_flight = self.max_in_flight = 0
+        self.lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with stand_in.lock:
+                    stand_in.in_flight += 1
+                    stand_in.max_in_flight = max(stand_in.max_in_flight, stand_in.in_flight)
+                    stand_in.requests.append((self.client_address[1], body))
+                    status = stand_in.statuses.popleft() if stand_in.statuses else 200
+                time.sleep(stand_in.delay)
+                with stand_in.lock:
+                    stand_in.in_flight -= 1
+                self.send_response(status)
+                for name, value in stand_in.headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/hooks/alerts?team=soc'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class NotificationTestCase(TestCase):
+    def setUp(self):
+        clear_destination_cache()
+        self.addCleanup(clear_destination_cache)
+
+    def _stand_in(self, **kwargs):
+        stand_in = WebhookStandIn(**kwargs)
+        self.addCleanup(stand_in.close)
+        return stand_in
+
+    def _deliverer(self, **kwargs):
+        deliverer = Deliverer(**kwargs)
+        self.addCleanup(deliverer.close)
+        return deliverer
+
+    def _alerts(self, count, severity='HIGH'):
+        for index in range(count):
+            Event.objects.create(
+                source_name=f'fw-{index}', event_type='Intrusion Attempt', severity=severity, description='x',
+            )
+
+
+class NotificationOutboxTest(NotificationTestCase):
+    """Test that new alerts are queued in the outbox"""
+
+    def test_alerts_are_queued_for_active_destinations(self):
+        """Test that each new alert gets one notification per active destination"""
+        self._alerts(1)
+        self.assertFalse(Notification.objects.exists())
+
+        active = WebhookDestination.objects.create(name='chat', url='http://127.0.0.1:9/')
+        WebhookDestination.objects.create(name='old', url='http://127.0.0.1:9/', is_active=False)
+        self._alerts(1, severity='CRITICAL')
+        self._alerts(1, severity='LOW')
+
+        notification = Notification.objects.get()
+        alert = Alert.objects.get(severity='CRITICAL')
+        self.assertEqual(notification.destination, active)
+        self.assertEqual(notification.status, 'PENDING')
+        self.assertEqual(notification.payload, {
+            'id': alert.id, 'title': 'Alert: Intrusion Attempt', 'severity': 'CRITICAL', 'status': 'OPEN',
+            'description': 'x', 'event_id': alert.event_id, 'event_type': 'Intrusion Attempt',
+            'source_name': 'fw-0', 'created_at': alert.created_at.isoformat(),
+        })
+
+
+class NotificationDeliveryTest(NotificationTestCase):
+    """Test webhook delivery against a local stand-in server"""
+
+    def test_batches_per_destination_on_one_connection(self):
+        """Test that pending alerts are batched and sent over one keep-alive connection"""
+        stand_in = self._stand_in()
+        WebhookDestination.objects.create(name='chat', url=stand_in.url, batch_size=3, max_concurrency=1)
+        self._alerts(7)
+
+        counts = self._deliverer().run_once()
+
+        self.assertEqual(counts['delivered'], 7)
+        self.assertEqual([len(body['alerts']) for _, body in stand_in.requests], [3, 3, 1])
+        self.assertEqual(len({port for port, _ in stand_in.requests}), 1)
+        self.assertTrue(stand_in.requests[0][1]['text'].startswith('3 new alerts\n[HIGH] Alert: Intrusion Attempt'))
+        self.assertEqual(stand_in.requests[2][1]['text'], '[HIGH] Alert: Intrusion Attempt (fw-6)')
+        self.assertFalse(Notification.objects.exclude(status='DELIVERED').exists())
+        self.assertEqual(set(Notification.objects.values_list('attempts', flat=True)), {1})
+
+    def test_concurrency_is_limited_per_destination(self):
+        """Test that no more than max_concurrency requests are in flight for a destination"""
+        stand_in = self._stand_in(delay=0.1)
+        WebhookDestination.objects.create(name='chat', url=stand_in.url, batch_size=1, max_concurrency=2)
+        self._alerts(6)
+
+        self._deliverer(threads=8).run_once()
+
+        self.assertEqual(len(stand_in.requests), 6)
+        self.assertEqual(stand_in.max_in_flight, 2)
+
+    def test_retries_with_backoff(self):
+        """Test that server errors are retried later and client errors fail at once"""
+        stand_in = self._stand_in(statuses=[503, 200, 400])
+        destination = WebhookDestination.objects.create(name='chat', url=stand_in.url)
+        self._alerts(1)
+        deliverer = self._deliverer()
+
+        before = timezone.now()
+        self.assertEqual(deliverer.run_once()['retry'], 1)
+        notification = Notification.objects.get()
+        self.assertEqual((notification.status, notification.attempts, notification.last_error),
+                         ('PENDING', 1, 'HTTP 503'))
+        # First retry after NOTIFICATION_BACKOFF_BASE (5s) with jitter
+        self.assertGreaterEqual(notification.next_attempt_at, before + timedelta(seconds=2.5))
+        self.assertLessEqual(notification.next_attempt_at, timezone.now() + timedelta(seconds=5))
+        self.assertEqual(deliverer.run_once()['claimed'], 0)  # Not due yet
+
+        Notification.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(deliverer.run_once()['delivered'], 1)
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts, notification.last_error),
+                         ('DELIVERED', 2, ''))
+
+        Notification.objects.create(destination=destination, alert=Alert.objects.create(
+            title='Manual', severity='HIGH'), payload={'title': 'Manual', 'severity': 'HIGH'})
+        self.assertEqual(deliverer.run_once()['failed'], 1)
+        self.assertEqual(Notification.objects.get(status='FAILED').last_error, 'HTTP 400')
+
+    @override_settings(NOTIFICATION_MAX_ATTEMPTS=2)
+    def test_gives_up_after_max_attempts(self):
+        """Test that unreachable destinations are retried, then failed after the last attempt"""
+        stand_in = self._stand_in()
+        url = stand_in.url
+        stand_in.close()  # Nothing listens on the port any more
+        WebhookDestination.objects.create(name='chat', url=url)
+        self._alerts(1)
+        deliverer = self._deliverer()
+
+        self.assertEqual(deliverer.run_once()['retry'], 1)
+        self.assertIn('ConnectionRefusedError', Notification.objects.get().last_error)
+        Notification.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(deliverer.run_once()['failed'], 1)
+        self.assertEqual(Notification.objects.get().status, 'FAILED')
+
+    def test_unexpected_errors_fail_only_their_batch(self):
+        """Test that an error other than a connection error fails its batch and the round goes on"""
+        stand_in = self._stand_in()
+        WebhookDestination.objects.create(name='chat', url=stand_in.url)
+        WebhookDestination.objects.create(name='broken', url='http://127.0.0.1:port/')
+        self._alerts(1)
+
+        counts = self._deliverer().run_once()
+
+        self.assertEqual((counts['delivered'], counts['failed']), (1, 1))
+        failed = Notification.objects.get(status='FAILED')
+        self.assertEqual(failed.destination.name, 'broken')
+        self.assertTrue(failed.last_error.startswith('ValueError: '))
+
+    def test_worker_command_once(self):
+        """Test that --once delivers what is due and exits"""
+        stand_in = self._stand_in(statuses=[429], headers={'Retry-After': '120'})
+        WebhookDestination.objects.create(name='chat', url=stand_in.url)
+        self._alerts(2)
+
+        out = StringIO()
+        call_command('notification_worker', once=True, stdout=out)
+
+        self.assertIn('Delivered 0 notifications (2 to retry, 0 failed)', out.getvalue())
+        retry_at = Notification.objects.values_list('next_attempt_at', flat=True).first()
+        self.assertGreater(retry_at, timezone.now() + timedelta(seconds=100))
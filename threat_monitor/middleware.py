@@ -0,0 +1,159 @@
+"""
+HTTP body compression.
+
+``RequestDecompressionMiddleware`` accepts ``Content-Encoding: gzip`` or
+``deflate`` request bodies on the ingestion paths
+(settings.REQUEST_DECOMPRESSION_PATHS), for JSON and MessagePack bodies
+only. The body is decompressed
+incrementally as the parser reads it, so an oversized or bomb-like body is
+rejected after at most one chunk past the limit, never fully inflated in
+memory. Limits are settings.REQUEST_DECOMPRESSION_MAX_SIZE (decompressed
+bytes) and REQUEST_DECOMPRESSION_MAX_RATIO (decompressed/compressed).
+
+``SelectiveGZipMiddleware`` gzips responses only on the paths in
+settings.GZIP_RESPONSE_PATHS (large alert pages, metrics) and only above
+settings.GZIP_MIN_RESPONSE_SIZE. Responses that echo credentials, like the
+token endpoints, stay uncompressed (BREACH).
+"""
+import zlib
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.middleware.gzip import GZipMiddleware
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
+
+# Ratios are only enforced past this much output, so small repetitive bodies pass
+RATIO_CHECK_AFTER = 64 * 1024
+_GZIP_ENCODINGS = {'gzip', 'x-gzip'}
+# Parsed by reading the stream to its end. Form and multipart parsers read
+# CONTENT_LENGTH bytes, the compressed size, so they would truncate the body.
+DECOMPRESSED_CONTENT_TYPES = {'application/json', 'application/msgpack'}
+
+
+class RequestBodyTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Decompressed request body is too large.'
+    default_code = 'request_too_large'
+
+
+class DecompressingStream:
+    """File-like view of a gzip/deflate stream that inflates on ``read``"""
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, stream, encoding, max_size, max_ratio):
+        self.stream = stream
+        self.encoding = encoding
+        self.max_size = max_size
+        self.max_ratio = max_ratio
+        self._decompressor = None
+        self._buffer = bytearray()
+        self._compressed = 0
+        self._decompressed = 0
+        self._done = False
+
+    def read(self, size=-1):
+        while not self._done and (size is None or size < 0 or len(self._buffer) < size):
+            self._fill()
+        if size is None or size < 0:
+            size = len(self._buffer)
+        chunk = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return chunk
+
+    def _read_input(self):
+        data = self.stream.read(self.chunk_size)
+        self._compressed += len(data)
+        return data
+
+    def _start(self, data):
+        if self.encoding in _GZIP_ENCODINGS:
+            wbits = 16 + zlib.MAX_WBITS
+        elif len(data) >= 2 and data[0] & 0x0f == 8 and int.from_bytes(data[:2], 'big') % 31 == 0:
+            wbits = zlib.MAX_WBITS  # zlib-wrapped deflate, as RFC 9110 specifies
+        else:
+            wbits = -zlib.MAX_WBITS  # Raw deflate, which some clients send instead
+        self._decompressor = zlib.decompressobj(wbits)
+
+    def _fill(self):
+        decompressor = self._decompressor
+        if decompressor is not None and decompressor.eof:
+            if decompressor.unused_data or self._read_input():
+                raise ParseError('Unexpected data after the compressed request body.')
+            self._done = True
+            return
+
+        data = decompressor.unconsumed_tail if decompressor is not None else b''
+        if not data:
+            data = self._read_input()
+            if not data:
+                if decompressor is None:
+                    self._done = True  # Empty body
+                    return
+                raise ParseError('Compressed request body is truncated.')
+        if decompressor is None:
+            self._start(data)
+            decompressor = self._decompressor
+
+        try:
+            # max_length bounds each step's output, whatever the input ratio
+            output = decompressor.decompress(data, self.chunk_size)
+        except zlib.error as exc:
+            raise ParseError(f'Invalid {self.encoding} request body: {exc}')
+        self._decompressed += len(output)
+        if self._decompressed > self.max_size:
+            raise RequestBodyTooLarge()
+        if self._decompressed > RATIO_CHECK_AFTER and self._decompressed > self._compressed * self.max_ratio:
+            raise RequestBodyTooLarge(
+                f'Request body compression ratio exceeds {self.max_ratio}:1.'
+            )
+        self._buffer += output
+
+
+def _path_matches(path, prefixes):
+    return any(path.startswith(prefix) for prefix in prefixes)
+
+
+class RequestDecompressionMiddleware:
+    """
+    Inflate gzip/deflate JSON and MessagePack request bodies on the ingestion
+    paths. Other paths, content types and encodings get 415. Errors found while the body is read are
+    raised as DRF exceptions (413/400) from the parser.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        encoding = request.META.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if not encoding or encoding == 'identity':
+            return self.get_response(request)
+        supported = encoding in _GZIP_ENCODINGS or encoding == 'deflate'
+        if not supported or not _path_matches(request.path_info, settings.REQUEST_DECOMPRESSION_PATHS):
+            return JsonResponse(
+                {'detail': f'Unsupported Content-Encoding "{encoding}".'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        content_type = request.META.get('CONTENT_TYPE', '').split(';')[0].strip().lower()
+        if content_type not in DECOMPRESSED_CONTENT_TYPES:
+            return JsonResponse(
+                {'detail': f'Content-Encoding "{encoding}" is only supported for JSON and MessagePack bodies.'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        request._stream = DecompressingStream(
+            request._stream, encoding,
+            settings.REQUEST_DECOMPRESSION_MAX_SIZE, settings.REQUEST_DECOMPRESSION_MAX_RATIO,
+        )
+        return self.get_response(request)
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware restricted to settings.GZIP_RESPONSE_PATHS and large bodies"""
+
+    def process_response(self, request, response):
+        if not _path_matches(request.path_info, settings.GZIP_RESPONSE_PATHS):
+            return response
+        if not response.streaming and len(response.content) < settings.GZIP_MIN_RESPONSE_SIZE:
+            return response
+        return super().process_response(request, response)
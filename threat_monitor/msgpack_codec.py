@@ -0,0 +1,175 @@
+"""
+MessagePack encoding and decoding for the binary ingestion format.
+
+Uses the ``msgpack`` package when it is installed. Otherwise a pure-Python
+codec handles the types an event payload needs: nil, booleans, integers,
+floats, str, bin, arrays and maps. Extension types (including timestamps)
+are rejected. Both ``unpackb`` paths only accept str/bytes map keys and
+raise ValueError on malformed input.
+"""
+import struct
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - depends on the environment
+    msgpack = None
+
+MAX_DEPTH = 64
+
+
+class _Reader:
+    __slots__ = ('data', 'pos')
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def take(self, size):
+        end = self.pos + size
+        if end > len(self.data):
+            raise ValueError('Unexpected end of MessagePack data')
+        chunk = self.data[self.pos:end]
+        self.pos = end
+        return chunk
+
+    def unpack(self, fmt):
+        return struct.unpack(fmt, self.take(struct.calcsize(fmt)))[0]
+
+
+# Fixed-size headers: first byte -> (struct format of the payload/length, kind)
+_HEADERS = {
+    0xc4: ('>B', 'bin'), 0xc5: ('>H', 'bin'), 0xc6: ('>I', 'bin'),
+    0xca: ('>f', 'value'), 0xcb: ('>d', 'value'),
+    0xcc: ('>B', 'value'), 0xcd: ('>H', 'value'), 0xce: ('>I', 'value'), 0xcf: ('>Q', 'value'),
+    0xd0: ('>b', 'value'), 0xd1: ('>h', 'value'), 0xd2: ('>i', 'value'), 0xd3: ('>q', 'value'),
+    0xd9: ('>B', 'str'), 0xda: ('>H', 'str'), 0xdb: ('>I', 'str'),
+    0xdc: ('>H', 'array'), 0xdd: ('>I', 'array'),
+    0xde: ('>H', 'map'), 0xdf: ('>I', 'map'),
+}
+_EXT_TYPES = {0xc7, 0xc8, 0xc9, 0xd4, 0xd5, 0xd6, 0xd7, 0xd8}
+
+
+def _decode(reader, depth):
+    if depth > MAX_DEPTH:
+        raise ValueError('MessagePack data is nested too deeply')
+    byte = reader.take(1)[0]
+    if byte <= 0x7f:
+        return byte
+    if byte >= 0xe0:
+        return byte - 0x100
+    if 0xa0 <= byte <= 0xbf:
+        kind, size = 'str', byte & 0x1f
+    elif 0x90 <= byte <= 0x9f:
+        kind, size = 'array', byte & 0x0f
+    elif 0x80 <= byte <= 0x8f:
+        kind, size = 'map', byte & 0x0f
+    elif byte == 0xc0:
+        return None
+    elif byte == 0xc2:
+        return False
+    elif byte == 0xc3:
+        return True
+    elif byte in _EXT_TYPES:
+        raise ValueError('MessagePack extension types are not supported')
+    elif byte in _HEADERS:
+        fmt, kind = _HEADERS[byte]
+        size = reader.unpack(fmt)
+        if kind == 'value':
+            return size
+    else:
+        raise ValueError(f'Invalid MessagePack type byte 0x{byte:02x}')
+
+    if kind == 'str':
+        try:
+            return str(reader.take(size), 'utf-8')
+        except UnicodeDecodeError as exc:
+            raise ValueError(f'Invalid UTF-8 in MessagePack string: {exc}')
+    if kind == 'bin':
+        return bytes(reader.take(size))
+    if kind == 'array':
+        # Elements are read one by one, so a bogus length fails when the data runs out
+        return [_decode(reader, depth + 1) for _ in range(size)]
+    result = {}
+    for _ in range(size):
+        key = _decode(reader, depth + 1)
+        if not isinstance(key, (str, bytes)):
+            raise ValueError(f'MessagePack map keys must be str or bytes, not {type(key).__name__}')
+        result[key] = _decode(reader, depth + 1)
+    return result
+
+
+def _unpackb_python(data):
+    reader = _Reader(memoryview(data))
+    value = _decode(reader, 0)
+    if reader.pos != len(data):
+        raise ValueError('Extra data after the MessagePack object')
+    return value
+
+
+def _reject_ext(code, data):
+    raise ValueError('MessagePack extension types are not supported')
+
+
+def unpackb(data):
+    """Decode one MessagePack object from ``data``; ValueError if it is malformed"""
+    if msgpack is None:
+        return _unpackb_python(data)
+    try:
+        return msgpack.unpackb(data, raw=False, strict_map_key=True, ext_hook=_reject_ext)
+    except (msgpack.UnpackException, TypeError) as exc:
+        raise ValueError(str(exc) or type(exc).__name__)
+
+
+def _encode(obj, out):
+    if obj is None:
+        out.append(b'\xc0')
+    elif obj is True:
+        out.append(b'\xc3')
+    elif obj is False:
+        out.append(b'\xc2')
+    elif isinstance(obj, int):
+        if 0 <= obj <= 0x7f or -32 <= obj < 0:
+            out.append(struct.pack('>b' if obj < 0 else '>B', obj))
+        elif obj >= 0:
+            out.append(b'\xcf' + struct.pack('>Q', obj))
+        else:
+            out.append(b'\xd3' + struct.pack('>q', obj))
+    elif isinstance(obj, float):
+        out.append(b'\xcb' + struct.pack('>d', obj))
+    elif isinstance(obj, str):
+        encoded = obj.encode('utf-8')
+        out.append(_length_header(len(encoded), 0xa0, 31, b'\xd9', b'\xda', b'\xdb'))
+        out.append(encoded)
+    elif isinstance(obj, (bytes, bytearray)):
+        out.append(_length_header(len(obj), None, 0, b'\xc4', b'\xc5', b'\xc6'))
+        out.append(bytes(obj))
+    elif isinstance(obj, (list, tuple)):
+        out.append(_length_header(len(obj), 0x90, 15, None, b'\xdc', b'\xdd'))
+        for item in obj:
+            _encode(item, out)
+    elif isinstance(obj, dict):
+        out.append(_length_header(len(obj), 0x80, 15, None, b'\xde', b'\xdf'))
+        for key, value in obj.items():
+            _encode(key, out)
+            _encode(value, out)
+    else:
+        raise TypeError(f'Cannot encode {type(obj).__name__} as MessagePack')
+
+
+def _length_header(length, fix_base, fix_max, marker8, marker16, marker32):
+    if fix_base is not None and length <= fix_max:
+        return bytes([fix_base | length])
+    if marker8 is not None and length <= 0xff:
+        return marker8 + struct.pack('>B', length)
+    if length <= 0xffff:
+        return marker16 + struct.pack('>H', length)
+    return marker32 + struct.pack('>I', length)
+
+
+def packb(obj):
+    """Encode ``obj`` (None, bool, int, float, str, bytes, list/tuple, dict) as MessagePack"""
+    if msgpack is not None:
+        return msgpack.packb(obj, use_bin_type=True)
+    out = []
+    _encode(obj, out)
+    return b''.join(out)
@@ -0,0 +1,38 @@
+"""
+Request parsers: orjson-backed JSON and MessagePack.
+
+``FastJSONParser`` accepts exactly what DRF's strict ``JSONParser`` accepts
+(NaN/Infinity literals are refused) and falls back to it without orjson or
+for request bodies that are not UTF-8. ``MessagePackParser`` decodes
+``application/msgpack`` bodies for high-volume clients; it is enabled per
+view (see ``events.views.create_event``).
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+from .msgpack_codec import unpackb
+from .renderers import orjson
+
+_UTF8 = {'utf-8', 'utf8'}
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or encoding.lower() not in _UTF8:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return unpackb(stream.read())
+        except ValueError as exc:
+            raise ParseError('MessagePack parse error - %s' % str(exc))
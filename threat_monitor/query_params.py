@@ -0,0 +1,28 @@
+"""
+Query parameter parsing shared by the API views.
+
+Invalid values raise ``ValidationError`` keyed by the parameter name, so
+clients get a 400 naming the offending parameter.
+"""
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+
+def datetime_param(request, name):
+    """Return query parameter ``name`` as an aware datetime, or None if absent.
+
+    Naive values are taken to be in the current time zone.
+    """
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: [f'Expected an ISO 8601 datetime. Received: "{value}".']})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
@@ -0,0 +1,43 @@
+"""
+JSON rendering with orjson when it is installed.
+
+``FastJSONRenderer`` produces the same compact output as DRF's
+``JSONRenderer`` (datetimes, Decimals, lazy strings and other non-native
+values still go through DRF's encoder), several times faster on large alert
+pages. Indented output (``; indent=N`` or the browsable API) and
+environments without orjson use the stdlib path. One difference: orjson
+writes NaN/Infinity as ``null`` instead of refusing them.
+"""
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+_LINE_SEPARATORS = (b'\xe2\x80\xa8', b'\xe2\x80\xa9')  # U+2028, U+2029 in UTF-8
+
+
+class FastJSONRenderer(JSONRenderer):
+    options = orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=JSONEncoder().default, option=self.options)
+        except orjson.JSONEncodeError:
+            # Non-str dict keys or integers beyond 64 bits: the stdlib path handles them
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same as JSONRenderer: keep the output a strict JavaScript subset. The
+        # one-byte lead check (memchr) spares a substring search on most pages.
+        if b'\xe2' in ret and (_LINE_SEPARATORS[0] in ret or _LINE_SEPARATORS[1] in ret):
+            ret = ret.replace(_LINE_SEPARATORS[0], b'\\u2028').replace(_LINE_SEPARATORS[1], b'\\u2029')
+        return ret
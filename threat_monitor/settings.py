@@ -48,16 +48,24 @@ INSTALLED_APPS = [
     'accounts',
     'events',
     'alerts',
+    'monitoring',
+    'notifications',
+    'indicators',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.MetricsMiddleware',  # First, so latency covers the whole stack
     'django.middleware.security.SecurityMiddleware',
+    'threat_monitor.middleware.SelectiveGZipMiddleware',
+    'threat_monitor.middleware.RequestDecompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'monitoring.middleware.ProfilingMiddleware',  # Opt-in, Admin-only (X-Profile header)
+    'monitoring.middleware.SlowQueryLogMiddleware',
 ]
 
 ROOT_URLCONF = 'threat_monitor.urls'
@@ -141,6 +149,15 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'threat_monitor.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'threat_monitor.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 100,
     'DEFAULT_THROTTLE_CLASSES': [
@@ -169,9 +186,114 @@ SPECTACULAR_SETTINGS = {
     'DESCRIPTION': 'API for monitoring security events and alerts',
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
+    # One component for every field holding an alert status
+    'ENUM_NAME_OVERRIDES': {
+        'AlertStatusEnum': 'alerts.models.Alert.STATUS_CHOICES',
+    },
 }
 
+# Metrics (GET /metrics)
+# With several worker processes, point METRICS_DIR at a directory shared by
+# the workers so that each scrape reports the sum over all of them.
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = 5  # Seconds between per-process snapshot writes
+# Seconds without a snapshot write after which a process is taken to be gone
+# and its totals are archived (see monitoring/metrics.py)
+METRICS_STALE_AFTER = 60
+# Bearer token required to scrape /metrics; when unset, only scrapes from
+# localhost are answered
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
+# Per-request profiling (X-Profile: text|save)
+PROFILES_DIR = LOGS_DIR / 'profiles'
+PROFILING_TOP_FUNCTIONS = 40  # Functions shown in the text report
+
+# Slow-query log: statements slower than this are logged with their call site
+# to SLOW_QUERY_LOG (None disables; set the variable to "off" or leave it empty).
+# Summarise with `manage.py slow_query_report`.
+SLOW_QUERY_THRESHOLD_MS = os.environ.get('SLOW_QUERY_THRESHOLD_MS', '100').strip()
+SLOW_QUERY_THRESHOLD_MS = (
+    None if SLOW_QUERY_THRESHOLD_MS.lower() in ('', 'off')
+    else float(SLOW_QUERY_THRESHOLD_MS)
+)
+SLOW_QUERY_LOG = LOGS_DIR / 'slow_queries.log'
+
+# Compressed request bodies (Content-Encoding: gzip/deflate) on ingestion paths
+REQUEST_DECOMPRESSION_PATHS = ['/api/events/']
+REQUEST_DECOMPRESSION_MAX_SIZE = 10 * 1024 * 1024  # Decompressed bytes
+REQUEST_DECOMPRESSION_MAX_RATIO = 100  # Decompressed/compressed size
+
+# Gzipped responses (for clients sending Accept-Encoding: gzip)
+GZIP_RESPONSE_PATHS = ['/api/alerts/', '/metrics']
+GZIP_MIN_RESPONSE_SIZE = 8 * 1024  # Bytes; smaller bodies are not worth the CPU
+
+# Event descriptions (and alert description overrides) of at least this many
+# UTF-8 bytes are stored zlib-compressed; None stores everything uncompressed
+TEXT_COMPRESSION_MIN_BYTES = 256
+
+# Streaming event statistics (GET /api/events/stats/), see events/stats.py.
+# As with METRICS_DIR, a directory shared by the worker processes lets every
+# process report the totals of all of them, and keeps them across restarts.
+EVENT_STATS_DIR = os.environ.get('EVENT_STATS_DIR') or None
+EVENT_STATS_FLUSH_INTERVAL = 10  # Seconds between per-process snapshot writes
+EVENT_STATS_WINDOW = 300  # Seconds per window
+EVENT_STATS_WINDOWS = 12  # Windows kept: one hour
+EVENT_STATS_TOP_K = 200  # Space-Saving counters per window (count error <= events / 200)
+EVENT_STATS_HLL_PRECISION = 11  # 2048 registers per HyperLogLog (about 2.3% error)
+EVENT_STATS_MAX_EVENT_TYPES = 200  # Event types with a distinct-source count per window
+
+# Source health (last seen and counts per source, GET /api/events/sources/silent/),
+# see events/health.py: each process writes its batched updates every this many seconds
+SOURCE_HEALTH_FLUSH_INTERVAL = 5
+
+# Idempotent event ingestion (Idempotency-Key header), see events/idempotency.py
+IDEMPOTENCY_CACHE_SIZE = 10000  # Responses kept per process for retries
+IDEMPOTENCY_FILTER_CAPACITY = 1000000  # Keys per Bloom filter generation (about 1.2 MB each)
+IDEMPOTENCY_FILTER_ERROR_RATE = 0.01  # New keys looked up needlessly
+
+# Syslog listener (`manage.py syslog_listener`); rules map messages to event
+# fields, see events/syslog.py
+SYSLOG_HOST = os.environ.get('SYSLOG_HOST', '127.0.0.1')
+SYSLOG_UDP_PORT = 5514
+SYSLOG_TCP_PORT = 5514
+SYSLOG_RULES = []
+SYSLOG_BATCH_SIZE = 500  # Events per insert transaction
+SYSLOG_FLUSH_INTERVAL = 1.0  # Seconds a partial batch may wait
+SYSLOG_QUEUE_SIZE = 20000  # Messages buffered; UDP drops beyond, TCP pushes back
+SYSLOG_MAX_MESSAGE_SIZE = 8192  # Bytes
+
+# Alert rules are compiled once per process; changes made by other processes
+# are picked up within this many seconds
+ALERT_RULES_CACHE_TTL = 30
+# Threshold rules count events in sliding windows of this many buckets, kept
+# in the database and shared by all processes (see alerts/thresholds.py)
+ALERT_THRESHOLD_BUCKETS = 12
+# Alerts changed per POST /api/alerts/bulk-status/ (also kept under the
+# database's query parameter limit)
+ALERT_BULK_UPDATE_MAX = 500
+
+# Watchlist indicators are matched per process; changes made by other
+# processes (e.g. `manage.py load_indicators`) are picked up within this many
+# seconds, by a background reload
+INDICATOR_CACHE_TTL = 60
+
+# Webhook notifications for new alerts (`manage.py notification_worker`)
+NOTIFICATION_POLL_INTERVAL = 1.0  # Seconds between outbox polls when idle
+NOTIFICATION_THREADS = 8  # Concurrent requests per worker, over all destinations
+NOTIFICATION_TIMEOUT = 10  # Seconds per webhook request
+NOTIFICATION_MAX_ATTEMPTS = 8
+NOTIFICATION_BACKOFF_BASE = 5  # Seconds before the first retry, doubled per attempt
+NOTIFICATION_BACKOFF_MAX = 3600
+NOTIFICATION_LEASE = 300  # Seconds before notifications claimed by a dead worker are retried
+NOTIFICATION_DESTINATION_CACHE_TTL = 30  # Seconds other processes may miss a destination change
+
+# Micro-benchmark baseline (`manage.py run_benchmarks --update-baseline`)
+BENCHMARK_BASELINE = BASE_DIR / 'monitoring' / 'benchmark_baseline.json'
+
 # Logging Configuration
+# The events/alerts loggers write through a queue: the request thread only
+# enqueues the record, and a background thread formats it as JSON and writes
+# it to the file and console handlers. Repeated warnings are rate limited.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -180,28 +302,59 @@ LOGGING = {
             'format': '{levelname} {asctime} {module} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'monitoring.log.JSONFormatter',
+        },
+    },
+    'filters': {
+        'rate_limit': {
+            '()': 'monitoring.log.RateLimitFilter',
+            'rate': 10,  # Records per message template per period
+            'period': 60,  # Seconds
+            'sample': 100,  # Then keep 1 in 100
+        },
     },
     'handlers': {
         'file': {
             'level': 'INFO',
             'class': 'logging.FileHandler',
             'filename': LOGS_DIR / 'threat_monitor.log',
-            'formatter': 'verbose',
+            'formatter': 'json',
         },
         'console': {
             'level': 'INFO',
             'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            'formatter': 'json',
+        },
+        'queue': {
+            'class': 'monitoring.log.QueueListenerHandler',
+            'handlers': ['cfg://handlers.console', 'cfg://handlers.file'],
+            'filters': ['rate_limit'],
+        },
+        'slow_query_file': {
+            'level': 'INFO',
+            'class': 'logging.FileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'formatter': 'json',
+        },
+        'slow_query_queue': {
+            'class': 'monitoring.log.QueueListenerHandler',
+            'handlers': ['cfg://handlers.slow_query_file'],
         },
     },
     'loggers': {
         'events': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': False,
         },
         'alerts': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'slow_queries': {
+            'handlers': ['slow_query_queue'],
             'level': 'INFO',
             'propagate': False,
         },